@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Resident backup agent.
+
+Agent keeps storage clients (with their connection pools and tokens)
+alive between commands and serves commands forwarded by `main.py` over
+Unix domain socket. Every connection carries one command:
+
+    client -> {"args": {...parsed CLI arguments...}}
+    agent  -> {"out": "..."}      output of the command
+    agent  -> {"read": true}      command waits for line from user
+    client -> {"line": "..."}     line typed by user
+    client -> {"interrupt": true} user pressed Ctrl-C
+    agent  -> {"exit": 0}         command completed with exit code
+
+Messages are JSON objects separated by newlines. Command is interrupted
+by KeyboardInterrupt raised in its thread if client sends "interrupt" or
+disconnects before command completes. Client side is `agent_client`.
+"""
+import argparse
+import contextvars
+import ctypes
+import errno
+import io
+import json
+import os
+import queue
+import socket
+import socketserver
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from arg_parser import positive_int
+from wrappers.defaults import ABORTED_MSG, AGENT_SOCKET_PATH, AGENT_WORKERS
+
+_channel = contextvars.ContextVar("channel", default=None)
+
+
+class _Channel:
+    """
+    Connection with client of one command. After arguments are received,
+    messages of client are read by its own thread, so disconnect or
+    interrupt is noticed while command runs.
+    """
+
+    def __init__(self, rfile, wfile):
+        self._rfile = rfile
+        self._wfile = wfile
+        self._lock = threading.Lock()
+        self._lines = queue.Queue()
+        self._command_thread = None
+        self._done = False
+
+    def send(self, **message):
+        with self._lock:
+            self._wfile.write(json.dumps(message).encode() + b"\n")
+            self._wfile.flush()
+
+    def receive_args(self) -> dict:
+        line = self._rfile.readline()
+        if not line:
+            raise ConnectionError("Client disconnected.")
+        return json.loads(line)["args"]
+
+    def receive(self) -> dict:
+        message = self._lines.get()
+        if message is None:
+            raise ConnectionError("Client disconnected.")
+        return message
+
+    def watch(self) -> None:
+        """
+        Starts reading messages of client on behalf of calling thread,
+        which executes command.
+        """
+        self._command_thread = threading.get_ident()
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        try:
+            for line in self._rfile:
+                message = json.loads(line)
+                if "interrupt" in message:
+                    break
+                self._lines.put(message)
+        except (OSError, ValueError):
+            pass
+        self._interrupt()
+        # wakes command waiting for line typed by user
+        self._lines.put(None)
+
+    def _interrupt(self):
+        with self._lock:
+            if self._done:
+                return
+            self._done = True
+            ctypes.pythonapi.PyThreadState_SetAsyncExc(
+                ctypes.c_ulong(self._command_thread),
+                ctypes.py_object(KeyboardInterrupt))
+
+    def complete(self):
+        """
+        Marks command as completed, it isn't interrupted after that.
+        """
+        with self._lock:
+            self._done = True
+
+
+class _ChannelStdout(io.TextIOBase):
+    """
+    Sends output of command to its client, output of agent itself
+    goes to real stdout.
+    """
+
+    def __init__(self, stdout):
+        self._stdout = stdout
+
+    def write(self, text):
+        channel = _channel.get()
+        if channel is None:
+            return self._stdout.write(text)
+        channel.send(out=text)
+        return len(text)
+
+    def flush(self):
+        if _channel.get() is None:
+            self._stdout.flush()
+
+
+class _ChannelStdin(io.TextIOBase):
+    """
+    Asks client for line typed by user (used by `input`).
+    """
+
+    def __init__(self, stdin):
+        self._stdin = stdin
+
+    def readline(self, size=-1):
+        channel = _channel.get()
+        if channel is None:
+            return self._stdin.readline(size)
+        channel.send(read=True)
+        return channel.receive()["line"]
+
+
+class _CommandHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        channel = _Channel(self.rfile, self.wfile)
+        try:
+            args = argparse.Namespace(**channel.receive_args())
+        except (ValueError, TypeError, KeyError, ConnectionError):
+            return
+        _channel.set(channel)
+        channel.watch()
+        try:
+            try:
+                exit_code = self.server.execute(args)
+            finally:
+                channel.complete()
+        except (KeyboardInterrupt, ConnectionError):
+            # client disconnected or interrupt arrived after command
+            # handled its own KeyboardInterrupt
+            exit_code = 1
+        except EOFError:
+            # input of client ended while command waited for answer
+            print(ABORTED_MSG)
+            exit_code = 1
+        finally:
+            _channel.set(None)
+        try:
+            channel.send(exit=exit_code)
+        except OSError:
+            pass
+
+
+class Agent(socketserver.UnixStreamServer):
+    """
+    Unix socket server executing every command in its own thread taken
+    from bounded pool. Wrappers keep no state of commands and their HTTP
+    sessions are shared by worker threads of concurrent commands anyway,
+    so one wrapper of every storage is created on first use and serves
+    all commands, keeping connections and tokens warm between them.
+    """
+
+    def __init__(self, socket_path=AGENT_SOCKET_PATH, workers=AGENT_WORKERS):
+        """
+        Raises:
+            OSError: if another agent is listening on `socket_path`.
+        """
+        self._socket_path = Path(socket_path)
+        self._remove_stale_socket()
+        super().__init__(str(self._socket_path), _CommandHandler)
+        self._pool = ThreadPoolExecutor(workers)
+        self._wrappers = {}
+        self._wrappers_lock = threading.Lock()
+
+    def _remove_stale_socket(self):
+        """
+        Removes socket left by agent which didn't stop cleanly, socket
+        of running agent is left untouched.
+        """
+        if not self._socket_path.exists():
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(str(self._socket_path))
+        except ConnectionRefusedError:
+            self._socket_path.unlink()
+            return
+        except FileNotFoundError:
+            return
+        finally:
+            probe.close()
+        raise OSError(
+            errno.EADDRINUSE, "Backup agent is already running",
+            str(self._socket_path))
+
+    def server_bind(self):
+        # socket is accessible only by owner from the moment it appears
+        umask = os.umask(0o077)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(umask)
+
+    def _wrapper(self, storage):
+        from main import make_wrapper
+        with self._wrappers_lock:
+            if storage not in self._wrappers:
+                self._wrappers[storage] = make_wrapper(storage)
+            return self._wrappers[storage]
+
+    def execute(self, args) -> int:
+        from main import execute
+        # both sides of cp and mirrored upload reuse wrappers of agent
+        return execute(args, get_wrapper=self._wrapper)
+
+    def process_request(self, request, client_address):
+        self._pool.submit(
+            contextvars.Context().run,
+            self._process,
+            request,
+            client_address
+        )
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False)
+        if self._socket_path.exists():
+            self._socket_path.unlink()
+
+
+def serve(socket_path=AGENT_SOCKET_PATH, workers=AGENT_WORKERS):
+    sys.stdout = _ChannelStdout(sys.stdout)
+    sys.stdin = _ChannelStdin(sys.stdin)
+    try:
+        agent = Agent(socket_path, workers)
+    except OSError as e:
+        print(e)
+        sys.exit(1)
+    with agent:
+        print(f"Backup agent is listening on {socket_path}")
+        try:
+            agent.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resident backup agent.")
+    parser.add_argument(
+        "-s", "--socket",
+        default=AGENT_SOCKET_PATH,
+        help=f"path to Unix socket (default: {AGENT_SOCKET_PATH})")
+    parser.add_argument(
+        "-w", "--workers",
+        type=positive_int,
+        default=AGENT_WORKERS,
+        help=f"number of commands executed concurrently"
+             f" (default: {AGENT_WORKERS})")
+    args = parser.parse_args()
+    serve(args.socket, args.workers)
+
+
+if __name__ == "__main__":
+    main()
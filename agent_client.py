@@ -0,0 +1,75 @@
+"""
+Client of resident backup agent (see `agent`), used by `main.py` on
+every run, so it imports nothing but socket and json.
+"""
+import json
+import socket
+import sys
+from pathlib import Path
+
+from wrappers.defaults import AGENT_SOCKET_PATH
+
+# arguments which are local paths and must be resolved by client
+LOCAL_PATH_ARGS = {
+    "dl": ("destination", "key_file"),
+    "ul": ("local_file", "key_file"),
+    "diff": ("local_file",),
+    "sync": ("local_file",),
+    "verify": ("local_file",),
+    "snapshot": ("local_file",),
+    "restore": ("destination",),
+    "unpack": ("destination",),
+    "chunk-backup": ("local_file",),
+    "chunk-restore": ("destination",),
+}
+
+
+def forward(args, socket_path=AGENT_SOCKET_PATH):
+    """
+    Forward parsed command to running agent and relay its output and
+    user input.
+
+    Returns:
+        Exit code of command or None if agent isn't running.
+    """
+    message = dict(vars(args))
+    for name in LOCAL_PATH_ARGS.get(args.operation, ()):
+        message[name] = str(Path(message[name]).absolute())
+    try:
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(str(socket_path))
+    except (FileNotFoundError, ConnectionRefusedError, AttributeError):
+        return None
+    with client, client.makefile("rwb") as stream:
+        def send(**reply):
+            stream.write(json.dumps(reply).encode() + b"\n")
+            stream.flush()
+
+        send(args=message)
+        interrupted = False
+        while True:
+            try:
+                return _relay(stream, send)
+            except KeyboardInterrupt:
+                # second Ctrl-C doesn't wait for agent to stop command
+                if interrupted:
+                    return 1
+                interrupted = True
+                send(interrupt=True)
+
+
+def _relay(stream, send):
+    """
+    Relays messages of agent until command completes, returns its exit
+    code.
+    """
+    for line in stream:
+        reply = json.loads(line)
+        if "out" in reply:
+            sys.stdout.write(reply["out"])
+            sys.stdout.flush()
+        elif "read" in reply:
+            send(line=sys.stdin.readline())
+        elif "exit" in reply:
+            return reply["exit"]
+    return 1
@@ -1,11 +1,34 @@
 import argparse
+import importlib.util
 
+from cloudbackup._defaults import ENCRYPTION_KEY_PATH, PACK_SIZE
+from wrappers.defaults import DEFAULT_JOBS
 
-def parse_args():
+
+def non_negative_int(value: str) -> int:
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"{value} is negative")
+    return number
+
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"{value} isn't positive")
+    return number
+
+
+def parse_args(args=None):
     parser = argparse.ArgumentParser(
         description=("""Tool for operate with your files on
          Google Drive or YandexDisk storage."""),
         epilog="""Author: Dmitry Podaruev <ddqof.vvv@gmail.com>""")
+    parser.add_argument(
+        "--no-agent",
+        action="store_true",
+        help="execute command in this process even if backup agent"
+             " is running")
     parser.add_argument(
         "storage",
         help="remote storage name",
@@ -44,6 +67,13 @@ def parse_args():
              " Also 'folder' (will show folders first) for GDrive only and"
              " 'path' (will sort by path) for YaDisk only. To sort in"
              " reversed order add previx 'rev'. For example: 'rev_name'.")
+    ls_parser.add_argument(
+        "-t", "--top",
+        type=positive_int,
+        metavar="N",
+        help="print only N first files according to sort key without"
+             " paging. For example: '-o rev_size -t 50' prints 50"
+             " largest files.")
 
     dl_parser = subparsers.add_parser(
         "dl",
@@ -56,6 +86,14 @@ def parse_args():
         "-ov", "--overwrite",
         action="store_true",
         help="overwrite if file already exists")
+    dl_parser.add_argument(
+        "-r", "--resume",
+        action="store_true",
+        help="continue interrupted download from its journal")
+    dl_parser.add_argument(
+        "--key-file",
+        default=str(ENCRYPTION_KEY_PATH),
+        help="key of encrypted files (default: %(default)s)")
 
     ul_parser = subparsers.add_parser(
         "ul",
@@ -66,14 +104,358 @@ def parse_args():
     ul_parser.add_argument(
         "destination",
         help="pass destination at remote storage")
+    ul_parser.add_argument(
+        "-r", "--resume",
+        action="store_true",
+        help="continue interrupted upload from its journal")
+    ul_mode = ul_parser.add_mutually_exclusive_group()
+    ul_mode.add_argument(
+        "-m", "--mirror",
+        metavar="DESTINATION",
+        help="also upload to DESTINATION at the other storage reading"
+             " every file once (such upload isn't journaled)")
+    ul_mode.add_argument(
+        "--pack",
+        action="store_true",
+        help="pack files up to 1 MiB into tar archives uploaded as single"
+             " objects (such upload isn't journaled)")
+    ul_parser.add_argument(
+        "--pack-size",
+        type=positive_int,
+        default=PACK_SIZE // 1024 // 1024,
+        metavar="MIB",
+        help="target size of archives in MiB (default: %(default)s)")
+    ul_parser.add_argument(
+        "-j", "--jobs",
+        type=positive_int,
+        default=DEFAULT_JOBS,
+        help="number of concurrent transfers of packed upload"
+             f" (default: {DEFAULT_JOBS})")
+    ul_parser.add_argument(
+        "-d", "--dedup",
+        action="store_true",
+        help="copy files whose content is already stored on server"
+             " instead of uploading them")
+    ul_parser.add_argument(
+        "-z", "--compress",
+        action="store_true",
+        help="store compressible files compressed, `dl` decompresses them")
+    ul_parser.add_argument(
+        "--codec",
+        choices=["zstd", "gzip"],
+        help="compression format (default: zstd if `zstandard` package is"
+             " installed, gzip otherwise)")
+    ul_parser.add_argument(
+        "-e", "--encrypt",
+        action="store_true",
+        help="store files encrypted by AES-256-GCM, `dl` decrypts them")
+    ul_parser.add_argument(
+        "--key-file",
+        default=str(ENCRYPTION_KEY_PATH),
+        help="encryption key, it's generated if it doesn't exist"
+             " (default: %(default)s)")
+
+    cp_parser = subparsers.add_parser(
+        "cp",
+        help="copy a file or directory to the other storage",
+        parents=[remote_file_parser])
+    cp_parser.add_argument(
+        "destination",
+        help="pass destination directory at the other storage: directory"
+             " id if copy to GDrive, directory path if copy to YaDisk")
+    cp_parser.add_argument(
+        "-j", "--jobs",
+        type=positive_int,
+        default=DEFAULT_JOBS,
+        help=f"number of files copied concurrently (default: {DEFAULT_JOBS})")
 
     rm_parser = subparsers.add_parser(
         "rm",
-        help="remove a file",
-        parents=[remote_file_parser])
+        help="remove files")
+    rm_parser.add_argument(
+        "remote_file",
+        nargs="+",
+        help="If work with GDrive pass file (directory) ids. If work with"
+             " YaDisk pass file (directory) paths. Last part of target may"
+             " be glob pattern, e.g. 'disk:/logs/*.log' or '<folder id>/*'.")
     rm_parser.add_argument(
         "-p", "--permanently",
         action="store_true",
         help="permanently delete file skipping the trash")
+    rm_parser.add_argument(
+        "-j", "--jobs",
+        type=positive_int,
+        default=DEFAULT_JOBS,
+        help=f"number of files removed concurrently (default: {DEFAULT_JOBS})")
+
+    du_parser = subparsers.add_parser(
+        "du",
+        help="summarize disk usage of remote folders")
+    du_parser.add_argument(
+        "remote_file",
+        nargs="?",
+        help="If work with GDrive pass directory id. If work with YaDisk"
+             " pass directory path. If not specified summarizes"
+             " entire storage.")
+    du_parser.add_argument(
+        "-d", "--depth",
+        type=non_negative_int,
+        help="print total only for folders `depth` levels below"
+             " the target folder")
+    du_parser.add_argument(
+        "-t", "--top",
+        type=positive_int,
+        metavar="N",
+        help="print only N largest folders")
+
+    diff_parser = subparsers.add_parser(
+        "diff",
+        help="show differences between local and remote directories")
+    diff_parser.add_argument(
+        "local_file",
+        help="pass local directory")
+    diff_parser.add_argument(
+        "remote_file",
+        help="If work with GDrive pass directory id. If work with YaDisk"
+             " pass directory path.")
+    diff_parser.add_argument(
+        "-c", "--checksum",
+        action="store_true",
+        help="compare md5 checksums of files with the same size instead"
+             " of modification times")
+
+    verify_parser = subparsers.add_parser(
+        "verify",
+        help="check that remote directory matches local directory by"
+             " checksums")
+    verify_parser.add_argument(
+        "local_file",
+        help="pass local directory")
+    verify_parser.add_argument(
+        "remote_file",
+        help="If work with GDrive pass directory id. If work with YaDisk"
+             " pass directory path.")
+    verify_parser.add_argument(
+        "-j", "--jobs",
+        type=positive_int,
+        default=DEFAULT_JOBS,
+        help=f"number of files hashed concurrently (default: {DEFAULT_JOBS})")
+
+    sync_parser = subparsers.add_parser(
+        "sync",
+        help="make remote directory equal to local directory")
+    sync_parser.add_argument(
+        "local_file",
+        help="pass local directory")
+    sync_parser.add_argument(
+        "remote_file",
+        help="If work with GDrive pass directory id. If work with YaDisk"
+             " pass directory path.")
+    sync_parser.add_argument(
+        "-n", "--dry-run",
+        action="store_true",
+        help="only print what would be transferred and deleted")
+    sync_parser.add_argument(
+        "-c", "--checksum",
+        action="store_true",
+        help="compare md5 checksums of files with the same size instead"
+             " of modification times")
+    sync_parser.add_argument(
+        "-p", "--permanently",
+        action="store_true",
+        help="permanently delete remote files skipping the trash")
+    sync_parser.add_argument(
+        "-d", "--dedup",
+        action="store_true",
+        help="copy new files whose content is already stored on server"
+             " instead of uploading them")
+    sync_parser.add_argument(
+        "-j", "--jobs",
+        type=positive_int,
+        default=DEFAULT_JOBS,
+        help=f"number of concurrent transfers (default: {DEFAULT_JOBS})")
+
+    snapshot_parser = subparsers.add_parser(
+        "snapshot",
+        help="make dated snapshot of local directory")
+    snapshot_parser.add_argument(
+        "local_file",
+        help="pass local directory")
+    snapshot_parser.add_argument(
+        "remote_file",
+        help="If work with GDrive pass id of snapshots folder. If work with"
+             " YaDisk pass path of snapshots folder.")
+    snapshot_parser.add_argument(
+        "-n", "--name",
+        help="snapshot folder name (default: today's date)")
+    snapshot_parser.add_argument(
+        "-j", "--jobs",
+        type=positive_int,
+        default=DEFAULT_JOBS,
+        help=f"number of concurrent transfers (default: {DEFAULT_JOBS})")
+
+    snapshots_parser = subparsers.add_parser(
+        "snapshots",
+        help="list snapshots from local catalog")
+    snapshots_parser.add_argument(
+        "remote_file",
+        help="If work with GDrive pass id of snapshots folder. If work with"
+             " YaDisk pass path of snapshots folder.")
+
+    restore_parser = subparsers.add_parser(
+        "restore",
+        help="download snapshot or its file")
+    restore_parser.add_argument(
+        "remote_file",
+        help="If work with GDrive pass id of snapshots folder. If work with"
+             " YaDisk pass path of snapshots folder.")
+    restore_parser.add_argument(
+        "name",
+        help="pass snapshot name")
+    restore_parser.add_argument(
+        "destination",
+        help="pass local destination")
+    restore_parser.add_argument(
+        "-f", "--file",
+        help="restore only file with given path relative to snapshot")
+    restore_parser.add_argument(
+        "-ov", "--overwrite",
+        action="store_true",
+        help="overwrite if file already exists")
+
+    unpack_parser = subparsers.add_parser(
+        "unpack",
+        help="restore files from packs of packed upload")
+    unpack_parser.add_argument(
+        "remote_file",
+        help="If work with GDrive pass id of uploaded directory. If work"
+             " with YaDisk pass path of uploaded directory.")
+    unpack_parser.add_argument(
+        "destination",
+        help="pass local destination")
+    unpack_parser.add_argument(
+        "paths",
+        nargs="*",
+        help="restore only files and folders with these paths relative to"
+             " uploaded directory (default: all packed files)")
+    unpack_parser.add_argument(
+        "-ov", "--overwrite",
+        action="store_true",
+        help="overwrite if file already exists")
+    unpack_parser.add_argument(
+        "-j", "--jobs",
+        type=positive_int,
+        default=DEFAULT_JOBS,
+        help=f"number of concurrent requests (default: {DEFAULT_JOBS})")
+
+    chunk_backup_parser = subparsers.add_parser(
+        "chunk-backup",
+        help="back up file or directory into deduplicating chunk store")
+    chunk_backup_parser.add_argument(
+        "local_file",
+        help="pass local file or directory")
+    chunk_backup_parser.add_argument(
+        "remote_file",
+        help="If work with GDrive pass id of repository folder. If work"
+             " with YaDisk pass path of repository folder.")
+    chunk_backup_parser.add_argument(
+        "-n", "--name",
+        help="backup name (default: current time)")
+    chunk_backup_parser.add_argument(
+        "-j", "--jobs",
+        type=positive_int,
+        default=DEFAULT_JOBS,
+        help="number of chunks uploaded concurrently"
+             f" (default: {DEFAULT_JOBS})")
+
+    chunk_list_parser = subparsers.add_parser(
+        "chunk-list",
+        help="list backups of chunk store")
+    chunk_list_parser.add_argument(
+        "remote_file",
+        help="If work with GDrive pass id of repository folder. If work"
+             " with YaDisk pass path of repository folder.")
+
+    chunk_restore_parser = subparsers.add_parser(
+        "chunk-restore",
+        help="restore backup from chunk store")
+    chunk_restore_parser.add_argument(
+        "remote_file",
+        help="If work with GDrive pass id of repository folder. If work"
+             " with YaDisk pass path of repository folder.")
+    chunk_restore_parser.add_argument(
+        "name",
+        help="pass backup name")
+    chunk_restore_parser.add_argument(
+        "destination",
+        help="pass local destination")
+    chunk_restore_parser.add_argument(
+        "paths",
+        nargs="*",
+        help="restore only files and folders with these paths relative to"
+             " backed up directory (default: all files)")
+    chunk_restore_parser.add_argument(
+        "-ov", "--overwrite",
+        action="store_true",
+        help="overwrite if file already exists")
+    chunk_restore_parser.add_argument(
+        "-j", "--jobs",
+        type=positive_int,
+        default=DEFAULT_JOBS,
+        help="number of chunks downloaded ahead concurrently"
+             f" (default: {DEFAULT_JOBS})")
+
+    prune_parser = subparsers.add_parser(
+        "prune",
+        help="remove snapshots expired by retention policy")
+    prune_parser.add_argument(
+        "remote_file",
+        help="If work with GDrive pass id of snapshots folder. If work with"
+             " YaDisk pass path of snapshots folder.")
+    for period in ("last", "daily", "weekly", "monthly"):
+        prune_parser.add_argument(
+            f"--keep-{period}",
+            type=non_negative_int,
+            default=0,
+            metavar="N",
+            help=f"keep N {period} snapshots")
+    prune_parser.add_argument(
+        "-n", "--dry-run",
+        action="store_true",
+        help="only print which snapshots would be kept and removed")
+    prune_parser.add_argument(
+        "-p", "--permanently",
+        action="store_true",
+        help="permanently delete snapshots skipping the trash")
+    prune_parser.add_argument(
+        "-j", "--jobs",
+        type=positive_int,
+        default=DEFAULT_JOBS,
+        help=f"number of concurrent deletions (default: {DEFAULT_JOBS})")
 
-    return parser.parse_args()
+    parsed = parser.parse_args(args)
+    if parsed.operation == "prune" and not any((
+            parsed.keep_last, parsed.keep_daily, parsed.keep_weekly,
+            parsed.keep_monthly)):
+        prune_parser.error("at least one --keep-* option is required")
+    if (parsed.operation == "ul" and (parsed.resume or parsed.dedup)
+            and (parsed.pack or parsed.mirror is not None)):
+        # packed and mirrored uploads are neither journaled nor indexed
+        ul_parser.error("-r/--resume and -d/--dedup can't be combined"
+                        " with --pack or --mirror")
+    if parsed.operation == "ul" and (parsed.compress or parsed.encrypt):
+        if parsed.pack or parsed.mirror is not None:
+            ul_parser.error("-z/--compress and -e/--encrypt can't be"
+                            " combined with --pack or --mirror")
+        if parsed.dedup:
+            # stored content differs from local one, so it can't be
+            # found by md5 of local file
+            ul_parser.error("-z/--compress and -e/--encrypt can't be"
+                            " combined with -d/--dedup")
+        if (parsed.encrypt
+                and importlib.util.find_spec("cryptography") is None):
+            ul_parser.error("encryption requires `cryptography` package")
+        if (parsed.codec == "zstd"
+                and importlib.util.find_spec("zstandard") is None):
+            ul_parser.error("zstd compression requires `zstandard` package")
+    return parsed
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark of upload stages.
+
+Streams generated file through every stage combination the way `ul`
+streams it to storage (read, hash, compress, encrypt) and discards
+output, so only CPU cost of stages is measured. Prints best throughput
+of `-r` runs, size of stored data and overhead relative to plain read.
+
+Usage: ./benchmarks/bench_stages.py [-s SIZE_MIB] [-r RUNS] > bench_output.txt
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from cloudbackup.compression import CODECS, Compressor  # noqa: E402
+from wrappers.stages import Stages  # noqa: E402
+
+
+def make_file(path: Path, size: int) -> None:
+    """
+    Writes half compressible text and half random data.
+    """
+    line = b"2026-10-19 12:00:00 INFO request /api/v1/files 200 15ms\n"
+    with open(path, "wb") as file:
+        text = line * (size // 2 // len(line) + 1)
+        file.write(text[:size // 2])
+        file.write(os.urandom(size - size // 2))
+
+
+def measure(stages: Stages, path: Path, runs: int):
+    name = path.name
+    remote_name = stages.remote_name(path, name)
+    timings = []
+    for _ in range(runs):
+        stored = 0
+        start = time.perf_counter()
+        for chunk in stages.stream(path, name, remote_name):
+            stored += len(chunk)
+        timings.append(time.perf_counter() - start)
+    return min(timings), stored
+
+
+def pipelines(compressor_of):
+    try:
+        from cloudbackup.encryption import Cipher
+        cipher = Cipher(os.urandom(32))
+    except ModuleNotFoundError:
+        cipher = None
+    yield "read", Stages()
+    for codec in CODECS:
+        yield codec, Stages(compressor_of(codec))
+    if cipher is not None:
+        yield "aes-gcm", Stages(cipher=cipher)
+        for codec in CODECS:
+            yield f"{codec}+aes-gcm", Stages(compressor_of(codec), cipher)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-s", "--size", type=int, default=256,
+                        help="size of file, MiB")
+    parser.add_argument("-r", "--runs", type=int, default=3)
+    args = parser.parse_args()
+    compressors = {}
+
+    def compressor_of(codec):
+        if codec not in compressors:
+            compressors[codec] = Compressor(CODECS[codec])
+        return compressors[codec]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp, "sample.log")
+        make_file(path, args.size * 1024 * 1024)
+        size = path.stat().st_size
+        print(f"{'stages':<20}{'MiB/s':>10}{'stored, MiB':>14}"
+              f"{'time, %':>10}")
+        base = None
+        for name, stages in pipelines(compressor_of):
+            elapsed, stored = measure(stages, path, args.runs)
+            base = base or elapsed
+            print(f"{name:<20}{size / elapsed / 2 ** 20:>10.1f}"
+                  f"{stored / 2 ** 20:>14.1f}{elapsed / base * 100:>10.0f}")
+    for compressor in compressors.values():
+        compressor.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark of CLI subcommands.
+
+Every run starts new interpreter which imports `main`, parses arguments
+and constructs wrappers for the storages command works with, i.e. does
+everything command does before its first API request. Prints median and
+best wall time of `-r` runs for every subcommand.
+
+Usage: ./benchmarks/bench_startup.py [-r RUNS] > bench_output.txt
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+COMMANDS = [
+    ["gdrive", "ls", "root"],
+    ["gdrive", "rm", "some_id"],
+    ["gdrive", "dl", "some_id", "."],
+    ["gdrive", "ul", "file.txt", "root"],
+    ["gdrive", "du"],
+    ["gdrive", "diff", ".", "root"],
+    ["gdrive", "sync", ".", "root"],
+    ["gdrive", "verify", ".", "root"],
+    ["gdrive", "snapshot", ".", "root"],
+    ["gdrive", "cp", "some_id", "disk:/"],
+    ["yadisk", "ls", "disk:/"],
+    ["yadisk", "rm", "disk:/file.txt"],
+    ["yadisk", "dl", "disk:/file.txt", "."],
+    ["yadisk", "ul", "file.txt", "/"],
+    ["yadisk", "du"],
+    ["yadisk", "diff", ".", "disk:/"],
+    ["yadisk", "sync", ".", "disk:/"],
+    ["yadisk", "verify", ".", "disk:/"],
+    ["yadisk", "snapshot", ".", "disk:/"],
+    ["yadisk", "cp", "disk:/file.txt", "root"],
+]
+
+SNIPPET = """
+import sys
+import main
+args = main.parse_args(sys.argv[1:])
+main.make_wrapper(args.storage)
+if args.operation == "cp":
+    main.make_wrapper(main.other_storage(args.storage))
+"""
+
+
+def measure(command, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", SNIPPET, *command],
+            cwd=ROOT,
+            check=True
+        )
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-r", "--runs", type=int, default=10)
+    args = parser.parse_args()
+    print(f"{'command':<28}{'median, ms':>12}{'best, ms':>12}")
+    for command in COMMANDS:
+        median, best = measure(command, args.runs)
+        print(f"{' '.join(command):<28}{median * 1000:>12.1f}"
+              f"{best * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,13 @@
+import contextlib
 import datetime
 import json
 import os
 import pickle
 import re
 import socket
+import threading
 import webbrowser
+from pathlib import Path
 from urllib.parse import urlencode
 
 import requests
@@ -21,9 +24,10 @@ from ._defaults import (
     FAILURE_MESSAGE_PATH,
     INACCURACY_SECONDS,
     GDRIVE_OAUTH_LINK,
-    YADISK_OAUTH_LINK
+    YADISK_OAUTH_LINK,
+    TOKEN_REFRESH_MARGIN
 )
-from .exceptions import CredentialsNotFoundException
+from .exceptions import ApiResponseException, CredentialsNotFoundException
 
 
 class Authenticator:
@@ -51,9 +55,30 @@ class Authenticator:
             else:
                 return re.search(r"code=(\S+)[\s&]", response).group(1)
 
+    @staticmethod
+    def _check_token_response(api_response, storage, token_file_path):
+        """
+        Raise ApiResponseException if token endpoint reported an error
+        instead of tokens. Token file whose refresh token was revoked or
+        has expired is removed, so next run asks user for permissions.
+        """
+        if "error" not in api_response:
+            return
+        description = api_response.get(
+            "error_description") or api_response["error"]
+        message = f"{storage} authorization failed: {description}."
+        if api_response["error"] == "invalid_grant":
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(token_file_path)
+            message += " Run command again to grant permissions."
+        # OAuth token endpoints report errors with 400 Bad Request
+        raise ApiResponseException(400, message)
+
     def _dump_token_data(self, api_response, filename):
         """
         Dump token data from API to file using pickle.
+
+        :return: dumped token data
         """
         expire_seconds = datetime.timedelta(0, api_response["expires_in"] -
                                             INACCURACY_SECONDS)
@@ -63,8 +88,10 @@ class Authenticator:
             "expire_time": datetime.datetime.now() + expire_seconds
             # add seconds to current time
         }
+        Path(filename).parent.mkdir(parents=True, exist_ok=True)
         with open(filename, "wb") as file:
             pickle.dump(token_data, file)
+        return token_data
 
     def _send_successful_message(self):
         """
@@ -78,31 +105,30 @@ class Authenticator:
         """
         :return: token to access to Google Drive API
         """
+        return self.gdrive_token_data(token_file_path)["access_token"]
+
+    def _read_gdrive_credentials(self):
         try:
             with open(GOOGLE_CREDENTIALS_PATH) as credentials_file:
-                credentials = json.load(credentials_file)
+                return json.load(credentials_file)
         except FileNotFoundError:
             raise CredentialsNotFoundException("GDrive")
+
+    def gdrive_token_data(self, token_file_path=DEFAULT_GOOGLE_TOKEN_PATH):
+        """
+        Load token data from `token_file_path` refreshing expired access
+        token or ask user for permissions if there is no token file.
+
+        :return: dict with `access_token`, `refresh_token` and `expire_time`
+        """
+        credentials = self._read_gdrive_credentials()
         if os.path.exists(token_file_path):
             with open(token_file_path, "rb") as token_file:
                 token_data = pickle.load(token_file)
             if token_data["expire_time"] < datetime.datetime.now():
-                exchange_keys = {
-                    "client_id": credentials["installed"]["client_id"],
-                    "client_secret": credentials["installed"]["client_secret"],
-                    "grant_type": "refresh_token",
-                    "refresh_token": token_data["refresh_token"]
-                }
-                api_token_response = self._get_gdrive_tokens_from_api(
-                    exchange_keys)
-                token_data["access_token"] = api_token_response["access_token"]
-                expire_seconds = datetime.timedelta(
-                    0, api_token_response["expires_in"] - INACCURACY_SECONDS)
-                token_data["expire_time"] = (
-                        datetime.datetime.now() + expire_seconds)
-                with open(token_file_path, "wb") as token_file:
-                    pickle.dump(token_data, token_file)
-            return token_data["access_token"]
+                token_data = self.refresh_gdrive_token(
+                    token_data, token_file_path)
+            return token_data
         else:
             keys = {"client_id": credentials["installed"]["client_id"],
                     "redirect_uri": f"{REDIRECT_HOST}:{str(REDIRECT_PORT)}",
@@ -121,9 +147,37 @@ class Authenticator:
             }
             api_token_response = self._get_gdrive_tokens_from_api(
                 exchange_keys)
-            self._dump_token_data(api_token_response, token_file_path)
+            self._check_token_response(
+                api_token_response, "GDrive", token_file_path)
+            token_data = self._dump_token_data(
+                api_token_response, token_file_path)
             self._send_successful_message()
-            return api_token_response["access_token"]
+            return token_data
+
+    def refresh_gdrive_token(
+            self,
+            token_data,
+            token_file_path=DEFAULT_GOOGLE_TOKEN_PATH
+    ):
+        """
+        Exchange refresh token for new access token and dump new token data.
+
+        :return: dict with `access_token`, `refresh_token` and `expire_time`
+        """
+        credentials = self._read_gdrive_credentials()
+        exchange_keys = {
+            "client_id": credentials["installed"]["client_id"],
+            "client_secret": credentials["installed"]["client_secret"],
+            "grant_type": "refresh_token",
+            "refresh_token": token_data["refresh_token"]
+        }
+        api_token_response = self._get_gdrive_tokens_from_api(exchange_keys)
+        self._check_token_response(
+            api_token_response, "GDrive", token_file_path)
+        # Google doesn't return new refresh token on refresh
+        api_token_response.setdefault(
+            "refresh_token", token_data["refresh_token"])
+        return self._dump_token_data(api_token_response, token_file_path)
 
     def _get_gdrive_tokens_from_api(self, data):
         """
@@ -147,17 +201,31 @@ class Authenticator:
         Get the access token to YandexDisk API requests
         :return: status message: access token or denied access message
         """
+        return self.yadisk_token_data(token_file_path)["access_token"]
+
+    def _read_yadisk_credentials(self):
+        try:
+            with open(YANDEX_CREDENTIALS_PATH) as credentials_file:
+                return json.load(credentials_file)
+        except FileNotFoundError:
+            raise CredentialsNotFoundException("YaDisk")
+
+    def yadisk_token_data(self, token_file_path=DEFAULT_YANDEX_TOKEN_PATH):
+        """
+        Load token data from `token_file_path` refreshing expired access
+        token or ask user for permissions if there is no token file.
+
+        :return: dict with `access_token`, `refresh_token` and `expire_time`
+        """
         if os.path.exists(token_file_path):
             with open(token_file_path, "rb") as token_file:
                 token_data = pickle.load(token_file)
-                if token_data["expire_time"] > datetime.datetime.now():
-                    return token_data["access_token"]
+            if token_data["expire_time"] < datetime.datetime.now():
+                token_data = self.refresh_yadisk_token(
+                    token_data, token_file_path)
+            return token_data
         else:
-            try:
-                with open(YANDEX_CREDENTIALS_PATH) as credentials_file:
-                    credentials = json.load(credentials_file)
-            except FileNotFoundError:
-                raise CredentialsNotFoundException("YaDisk")
+            credentials = self._read_yadisk_credentials()
             keys = {
                 "response_type": "code",
                 "client_id": credentials["client_id"]
@@ -172,9 +240,37 @@ class Authenticator:
             }
             api_token_response = self._get_yadisk_tokens_from_api(
                 exchange_keys)
-            self._dump_token_data(api_token_response, token_file_path)
+            self._check_token_response(
+                api_token_response, "YaDisk", token_file_path)
+            token_data = self._dump_token_data(
+                api_token_response, token_file_path)
             self._send_successful_message()
-            return api_token_response["access_token"]
+            return token_data
+
+    def refresh_yadisk_token(
+            self,
+            token_data,
+            token_file_path=DEFAULT_YANDEX_TOKEN_PATH
+    ):
+        """
+        Exchange refresh token for new access and refresh tokens and
+        dump new token data.
+
+        :return: dict with `access_token`, `refresh_token` and `expire_time`
+        """
+        credentials = self._read_yadisk_credentials()
+        exchange_keys = {
+            "grant_type": "refresh_token",
+            "refresh_token": token_data["refresh_token"],
+            "client_id": credentials["client_id"],
+            "client_secret": credentials["client_secret"]
+        }
+        api_token_response = self._get_yadisk_tokens_from_api(exchange_keys)
+        self._check_token_response(
+            api_token_response, "YaDisk", token_file_path)
+        api_token_response.setdefault(
+            "refresh_token", token_data["refresh_token"])
+        return self._dump_token_data(api_token_response, token_file_path)
 
     def _get_yadisk_tokens_from_api(self, data):
         """
@@ -192,3 +288,122 @@ class Authenticator:
             "https://oauth.yandex.ru/token",
             data=data
         ).json()
+
+
+class TokenProvider:
+    """
+    Keeps token data of one storage in memory and refreshes access token
+    in background thread `TOKEN_REFRESH_MARGIN` seconds before it expires,
+    so requests never wait for refresh in the middle of long runs.
+
+    Token data is loaded from disk only once per process: use
+    `for_gdrive` and `for_yadisk` to get shared provider. Concurrent
+    refreshes are coalesced: only one thread exchanges refresh token,
+    others wait for it and reuse the new token.
+    """
+
+    _providers = {}
+    _providers_lock = threading.Lock()
+
+    def __init__(self, load, refresh):
+        """
+        Args:
+            load: callable returning token data dict with `access_token`,
+             `refresh_token` and `expire_time` keys.
+            refresh: callable taking current token data and returning
+             refreshed one.
+        """
+        self._load = load
+        self._refresh = refresh
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._token_data = None
+        self._timer = None
+
+    @classmethod
+    def _shared(cls, storage, load, refresh):
+        with cls._providers_lock:
+            if storage not in cls._providers:
+                cls._providers[storage] = cls(load, refresh)
+            return cls._providers[storage]
+
+    @classmethod
+    def for_gdrive(cls, token_file_path=DEFAULT_GOOGLE_TOKEN_PATH):
+        auth = Authenticator()
+        return cls._shared(
+            ("gdrive", token_file_path),
+            lambda: auth.gdrive_token_data(token_file_path),
+            lambda data: auth.refresh_gdrive_token(data, token_file_path)
+        )
+
+    @classmethod
+    def for_yadisk(cls, token_file_path=DEFAULT_YANDEX_TOKEN_PATH):
+        auth = Authenticator()
+        return cls._shared(
+            ("yadisk", token_file_path),
+            lambda: auth.yadisk_token_data(token_file_path),
+            lambda data: auth.refresh_yadisk_token(data, token_file_path)
+        )
+
+    def token(self) -> str:
+        """
+        Returns valid access token. Blocks only if token hasn't been
+        loaded yet or has expired (e.g. background refresh failed).
+        """
+        token_data = self._token_data
+        if token_data is not None and not self._expired(token_data):
+            return token_data["access_token"]
+        with self._refresh_lock:
+            token_data = self._token_data
+            if token_data is None:
+                token_data = self._load()
+            elif self._expired(token_data):
+                token_data = self._refresh(token_data)
+            else:
+                # refreshed by another thread while we were waiting
+                return token_data["access_token"]
+            self._set(token_data)
+            return token_data["access_token"]
+
+    @staticmethod
+    def _expired(token_data):
+        return token_data["expire_time"] < datetime.datetime.now()
+
+    def _set(self, token_data):
+        """
+        Save new token data and schedule its refresh.
+        """
+        with self._lock:
+            self._token_data = token_data
+            if self._timer is not None:
+                self._timer.cancel()
+            remaining = (
+                token_data["expire_time"] - datetime.datetime.now()
+            ).total_seconds()
+            delay = max(remaining - TOKEN_REFRESH_MARGIN, remaining / 2, 1)
+            self._timer = threading.Timer(delay, self._refresh_ahead)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _refresh_ahead(self):
+        """
+        Refresh token in background. Current token stays available for
+        other threads while new one is requested.
+        """
+        with self._refresh_lock:
+            try:
+                token_data = self._refresh(self._token_data)
+            except Exception:
+                # token is still valid for a while, if it expires
+                # `token` method will try to refresh it once again
+                return
+            self._set(token_data)
+
+    def close(self):
+        """
+        Stop background refresh.
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
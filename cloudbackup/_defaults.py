@@ -1,3 +1,4 @@
+import os
 from pathlib import Path, PurePath
 
 DEFAULT_GOOGLE_TOKEN_PATH = Path(
@@ -46,10 +47,32 @@ FAILURE_MESSAGE_PATH = Path(
     "service",
     "failure_message.html"
 )
+# encryption key must outlive reinstall of package, so it's kept in
+# config directory of user
+CONFIG_DIR = Path(
+    os.environ.get("XDG_CONFIG_HOME") or Path.home() / ".config",
+    "cloudbackup"
+)
+ENCRYPTION_KEY_PATH = Path(CONFIG_DIR, "encryption.key")
+LEGACY_ENCRYPTION_KEY_PATH = Path(
+    PurePath(__file__).parent,
+    "service",
+    "encryption.key"
+)
+# journals, caches and catalogs are written while commands run, so they
+# are kept in state directory of user instead of package tree
+STATE_DIR = Path(
+    os.environ.get("XDG_STATE_HOME") or Path.home() / ".local" / "state",
+    "cloudbackup"
+)
+JOURNALS_DIR = Path(STATE_DIR, "journals")
+HASH_CACHE_PATH = Path(STATE_DIR, "hash_cache.sqlite")
+SNAPSHOT_CATALOG_PATH = Path(STATE_DIR, "snapshots.sqlite")
 REDIRECT_HOST = "http://127.0.0.1"
 REDIRECT_PORT = 8000
 GDRIVE_SCOPE = "https://www.googleapis.com/auth/drive"
 INACCURACY_SECONDS = 5
+TOKEN_REFRESH_MARGIN = 300
 GDRIVE_OAUTH_LINK = "https://accounts.google.com/o/oauth2/v2/auth?"
 YADISK_OAUTH_LINK = "https://oauth.yandex.ru/authorize?"
 
@@ -59,3 +82,47 @@ GDRIVE_LIMIT_EXCEEDED = 403
 GDRIVE_FILE_NOT_FOUND = 404
 GDRIVE_TOO_MANY_REQUESTS = 429
 GDRIVE_BACKEND_ERROR = 500
+# max number of requests in one batch request to Drive API
+GDRIVE_BATCH_SIZE = 100
+
+# Minimal sets of fields requested from APIs. Everything else (previews,
+# custom properties, exif, etc.) is never used, so it is not transferred.
+GDRIVE_FILE_FIELDS = ("name", "mimeType", "id")
+YADISK_FILE_FIELDS = ("name", "type", "path")
+ACCEPT_ENCODING = "gzip"
+HTTP_POOL_SIZE = 16
+
+# Files are hashed by big reads into reused buffer, sizes are multiples of
+# page size, so reads stay aligned.
+HASH_BLOCK_SIZE = 4 * 1024 * 1024
+HASH_WORKERS = 4
+HASH_WINDOW = 64
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# chunks buffered between download and upload of cross-cloud copy
+PIPE_MAX_CHUNKS = 8
+# files up to this size are packed into archives of about PACK_SIZE bytes
+PACK_FILE_THRESHOLD = 1024 * 1024
+PACK_SIZE = 64 * 1024 * 1024
+# ranges of pack closer than this are fetched by one request
+RANGE_MAX_GAP = 1024 * 1024
+# files are compressed by independent blocks, so blocks of one file are
+# compressed in parallel
+COMPRESSION_BLOCK_SIZE = 1024 * 1024
+COMPRESSION_WORKERS = 4
+COMPRESSION_MIN_SIZE = 1024
+# compressed content is spooled before upload to send its size, content
+# larger than this is spooled to temporary file instead of memory
+COMPRESSION_SPOOL_SIZE = 16 * 1024 * 1024
+# files whose leading sample has higher entropy (bits per byte) are
+# compressed or encrypted already
+ENTROPY_SAMPLE_SIZE = 64 * 1024
+MAX_SAMPLE_ENTROPY = 7.5
+# plaintext is encrypted by chunks of this size, each grows by 16 bytes
+ENCRYPTED_SUFFIX = ".cb.enc"
+ENCRYPTION_CHUNK_SIZE = 64 * 1024
+# files of chunk store are cut at content defined points found on
+# average every CHUNK_AVERAGE_SIZE bytes after first CHUNK_MIN_SIZE bytes
+# of chunk, chunk which reached CHUNK_MAX_SIZE is cut anyway
+CHUNK_MIN_SIZE = 256 * 1024
+CHUNK_AVERAGE_SIZE = 1024 * 1024
+CHUNK_MAX_SIZE = 4 * 1024 * 1024
@@ -0,0 +1,28 @@
+import requests
+from requests.adapters import HTTPAdapter
+
+from ._defaults import HTTP_POOL_SIZE
+
+
+def http_session() -> requests.Session:
+    """
+    Create session which keeps up to `HTTP_POOL_SIZE` connections to every
+    host alive, so concurrent transfers and long-running processes reuse
+    TCP and TLS connections instead of opening new ones for each request.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_SIZE,
+        pool_maxsize=HTTP_POOL_SIZE
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def range_header(start: int, end: int) -> str:
+    """
+    Value of Range header requesting bytes from `start` up to `end`
+    (exclusive).
+    """
+    return f"bytes={start}-{end - 1}"
@@ -0,0 +1,233 @@
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+
+from ._defaults import SNAPSHOT_CATALOG_PATH
+
+Snapshot = namedtuple(
+    "Snapshot",
+    ["id", "root", "name", "remote_id", "source", "created", "files", "size"]
+)
+CatalogFile = namedtuple(
+    "CatalogFile", ["path", "size", "mtime", "md5", "remote_id"])
+
+
+class SnapshotCatalog:
+    """
+    Local catalog of snapshot backups made to one storage, backed by
+    SQLite.
+
+    For every snapshot the catalog keeps id of its remote folder and
+    size, modification time, md5 and remote id of every file, so
+    snapshots can be listed and files can be found without requests to
+    storage, and unchanged files of next snapshot can be copied from the
+    previous one. Snapshot is used as base of next one only after it's
+    completed.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS snapshots (
+            id INTEGER PRIMARY KEY,
+            storage TEXT NOT NULL,
+            root TEXT NOT NULL,
+            name TEXT NOT NULL,
+            remote_id TEXT NOT NULL,
+            source TEXT NOT NULL,
+            created REAL NOT NULL,
+            complete INTEGER NOT NULL DEFAULT 0,
+            UNIQUE (storage, root, name)
+        );
+        CREATE TABLE IF NOT EXISTS files (
+            snapshot INTEGER NOT NULL REFERENCES snapshots(id),
+            path TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime REAL NOT NULL,
+            md5 TEXT,
+            remote_id TEXT,
+            PRIMARY KEY (snapshot, path)
+        );
+    """
+    _SNAPSHOT_QUERY = """
+        SELECT s.id, s.root, s.name, s.remote_id, s.source, s.created,
+               COUNT(f.path), COALESCE(SUM(f.size), 0)
+        FROM snapshots s LEFT JOIN files f ON f.snapshot = s.id
+        WHERE s.storage = ? AND s.root = ? AND s.complete = 1
+    """
+
+    def __init__(self, storage: str, path=SNAPSHOT_CATALOG_PATH):
+        """
+        Args:
+            storage: name of storage snapshots are made to.
+            path: Optional; catalog file or ":memory:".
+        """
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._storage = storage
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(self._SCHEMA)
+
+    @staticmethod
+    def _path(path: tuple) -> str:
+        return "/".join(path)
+
+    def begin(self, root, name: str, remote_id, source) -> int:
+        """
+        Register new snapshot `name` of local `source` directory made
+        into remote `root` folder. Record of incomplete snapshot with
+        the same name is replaced.
+
+        Returns:
+            Id of snapshot.
+
+        Raises:
+            FileExistsError: if snapshot `name` was already made.
+        """
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT id, complete FROM snapshots WHERE storage = ?"
+                " AND root = ? AND name = ?",
+                (self._storage, str(root), name)
+            ).fetchone()
+            if row is not None:
+                if row[1]:
+                    raise FileExistsError(
+                        f"Snapshot `{name}` of `{root}` already exists.")
+                self._delete(row[0])
+            cursor = self._db.execute(
+                "INSERT INTO snapshots (storage, root, name, remote_id,"
+                " source, created) VALUES (?, ?, ?, ?, ?, ?)",
+                (self._storage, str(root), name, str(remote_id),
+                 str(source), time.time())
+            )
+        return cursor.lastrowid
+
+    def add_file(
+            self,
+            snapshot: int,
+            path: tuple,
+            size: int,
+            mtime: float
+    ) -> None:
+        """
+        Record local file put into snapshot. Records are committed when
+        snapshot is completed.
+        """
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO files (snapshot, path, size, mtime)"
+                " VALUES (?, ?, ?, ?)",
+                (snapshot, self._path(path), size, mtime)
+            )
+
+    def set_remote(self, snapshot: int, path: tuple, remote_id, md5) -> None:
+        """
+        Record remote id and md5 of file stored in snapshot.
+        """
+        with self._lock:
+            self._db.execute(
+                "UPDATE files SET remote_id = ?, md5 = ?"
+                " WHERE snapshot = ? AND path = ?",
+                (str(remote_id), md5, snapshot, self._path(path))
+            )
+
+    def complete(self, snapshot: int) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE snapshots SET complete = 1 WHERE id = ?", (snapshot,))
+
+    def snapshots(self, root) -> list:
+        """
+        Returns completed snapshots made into `root` from oldest one.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                self._SNAPSHOT_QUERY + " GROUP BY s.id ORDER BY s.created",
+                (self._storage, str(root))
+            ).fetchall()
+        return [Snapshot(*row) for row in rows]
+
+    def latest(self, root):
+        """
+        Returns last completed snapshot made into `root` or None.
+        """
+        snapshots = self.snapshots(root)
+        return snapshots[-1] if snapshots else None
+
+    def find(self, root, name: str) -> Snapshot:
+        """
+        Raises:
+            FileNotFoundError: if there is no completed snapshot `name`.
+        """
+        with self._lock:
+            row = self._db.execute(
+                self._SNAPSHOT_QUERY + " AND s.name = ? GROUP BY s.id",
+                (self._storage, str(root), name)
+            ).fetchone()
+        if row is None:
+            raise FileNotFoundError(
+                f"Snapshot `{name}` of `{root}` not found.")
+        return Snapshot(*row)
+
+    def incomplete(self, root, name: str):
+        """
+        Returns remote id of folder of snapshot `name` which was begun
+        but not completed, or None.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT remote_id FROM snapshots WHERE storage = ?"
+                " AND root = ? AND name = ? AND complete = 0",
+                (self._storage, str(root), name)
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def files(self, snapshot: int) -> list:
+        """
+        Returns CatalogFile of every file of snapshot sorted by path.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT path, size, mtime, md5, remote_id FROM files"
+                " WHERE snapshot = ? ORDER BY path",
+                (snapshot,)
+            ).fetchall()
+        return [CatalogFile(*row) for row in rows]
+
+    def file(self, snapshot: int, path: tuple):
+        """
+        Returns CatalogFile of snapshot by its path or None.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT path, size, mtime, md5, remote_id FROM files"
+                " WHERE snapshot = ? AND path = ?",
+                (snapshot, self._path(path))
+            ).fetchone()
+        return None if row is None else CatalogFile(*row)
+
+    def remove(self, snapshot: int) -> None:
+        """
+        Forget snapshot which was removed from storage.
+        """
+        with self._lock, self._db:
+            self._delete(snapshot)
+
+    def _delete(self, snapshot: int) -> None:
+        self._db.execute("DELETE FROM files WHERE snapshot = ?", (snapshot,))
+        self._db.execute("DELETE FROM snapshots WHERE id = ?", (snapshot,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,165 @@
+import gzip
+import hashlib
+import json
+import zlib
+from collections import namedtuple
+from typing import BinaryIO, Iterator
+
+from ._defaults import CHUNK_AVERAGE_SIZE, CHUNK_MAX_SIZE, CHUNK_MIN_SIZE
+
+CHUNKS_DIR_NAME = "chunks"
+MANIFESTS_DIR_NAME = "manifests"
+MANIFEST_SUFFIX = ".jsonl.gz"
+
+# bytes of rolling window, boundary depends only on the window ending
+# at it, so insertion moves only boundaries close to it
+_WINDOW = 32
+# window sums are computed by scans of this size
+_SCAN_SIZE = 1024 * 1024
+# values of bytes summed in window; table is fixed, because boundaries
+# must be the same in every backup
+_TABLE = hashlib.shake_256(b"cloudbackup chunker").digest(256)
+
+ChunkedFile = namedtuple("ChunkedFile", ["path", "size", "mtime", "chunks"])
+ChunkedFile.__doc__ = """
+File recorded in manifest of chunk store backup. `path` is path of file
+relative to backed up directory with '/' separators, `chunks` is list of
+[sha256, length] of its chunks in order.
+"""
+
+
+def _window_sums(data) -> bytes:
+    """
+    Returns bytes whose i-th byte is sum of values of bytes of the
+    window ending at i-th byte of `data` modulo 256, first bytes have
+    incomplete windows. All windows are summed at once by arithmetic of
+    big integer with byte per position, carries leak into next bytes,
+    but they are determined by the same content.
+    """
+    value = int.from_bytes(data.translate(_TABLE), "little")
+    shift = 8
+    while shift < 8 * _WINDOW:
+        value += value << shift
+        shift *= 2
+    return value.to_bytes(len(data) + _WINDOW, "little")[:len(data)]
+
+
+class Chunker:
+    """
+    Content-defined chunking: chunk ends where rolling hash of the last
+    `_WINDOW` bytes has zero bits under mask, so boundaries follow
+    content and change in the middle of file changes only chunks around
+    it. Hash is checked in two steps: bytes with zero window sum are
+    found by `find` in sums of whole scan (one of 256 positions), then
+    crc32 of their window is checked. Both run in C, hash computed per
+    byte in Python would be two orders of magnitude slower.
+    """
+
+    def __init__(
+            self,
+            min_size: int = CHUNK_MIN_SIZE,
+            average_size: int = CHUNK_AVERAGE_SIZE,
+            max_size: int = CHUNK_MAX_SIZE
+    ):
+        """
+        Raises:
+            ValueError: if `average_size` isn't power of two of at
+             least 256 or `min_size` isn't between window and
+             `max_size`.
+        """
+        if average_size < 256 or average_size & (average_size - 1):
+            raise ValueError("Average chunk size must be power of two.")
+        if not _WINDOW <= min_size <= max_size:
+            raise ValueError(
+                f"Minimal chunk size must be between {_WINDOW} bytes and"
+                " maximal size.")
+        self._min_size = min_size
+        self._mask = average_size // 256 - 1
+        self._max_size = max_size
+
+    def split(self, file: BinaryIO) -> Iterator[bytes]:
+        """
+        Yields chunks of content of binary file. At most `max_size`
+        bytes are buffered.
+        """
+        buffer = bytearray()
+        eof = False
+        while True:
+            while not eof and len(buffer) < self._max_size:
+                block = file.read(self._max_size - len(buffer))
+                eof = not block
+                buffer += block
+            if not buffer:
+                return
+            size = self.boundary(buffer)
+            yield bytes(buffer[:size])
+            del buffer[:size]
+
+    def boundary(self, data) -> int:
+        """
+        Returns size of chunk at the beginning of `data`, `data` which
+        fits into one chunk is chunk itself.
+        """
+        end = min(len(data), self._max_size)
+        position = self._min_size
+        while position < end:
+            start = position - _WINDOW
+            scan_end = min(end, position + _SCAN_SIZE)
+            sums = _window_sums(data[start:scan_end])
+            # sum at `i` is of the window ending at `start + i`
+            i = sums.find(0, _WINDOW)
+            while i >= 0:
+                size = start + i + 1
+                if not zlib.crc32(data[size - _WINDOW:size]) & self._mask:
+                    return size
+                i = sums.find(0, i + 1)
+            position = scan_end
+        return end
+
+
+class Manifest:
+    """
+    Files of one backup of chunk store, stored as gzipped JSON lines,
+    one short array per file.
+    """
+
+    def __init__(self, files=()):
+        self._files = {}
+        for file in files:
+            self.add(file)
+
+    def add(self, file: ChunkedFile) -> None:
+        self._files[file.path] = file
+
+    def get(self, path: str):
+        """
+        Returns ChunkedFile with `path` or None.
+        """
+        return self._files.get(path)
+
+    def __len__(self):
+        return len(self._files)
+
+    def __iter__(self):
+        return iter(self._files.values())
+
+    @property
+    def size(self) -> int:
+        """
+        Total size of files.
+        """
+        return sum(file.size for file in self._files.values())
+
+    def dumps(self) -> bytes:
+        lines = (
+            json.dumps(list(file)) + "\n"
+            for file in self._files.values()
+        )
+        return gzip.compress("".join(lines).encode())
+
+    @classmethod
+    def loads(cls, data: bytes) -> "Manifest":
+        return cls(
+            ChunkedFile(*json.loads(line))
+            for line in gzip.decompress(data).decode().splitlines()
+        )
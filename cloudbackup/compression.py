@@ -0,0 +1,204 @@
+import collections
+import gzip
+import math
+import mimetypes
+import zlib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from ._defaults import (
+    COMPRESSION_MIN_SIZE,
+    COMPRESSION_WORKERS,
+    ENTROPY_SAMPLE_SIZE,
+    MAX_SAMPLE_ENTROPY
+)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# errors raised by `decompress` on corrupted or truncated content
+DECOMPRESSION_ERRORS = (EOFError, zlib.error) + (
+    () if zstandard is None else (zstandard.ZstdError,))
+
+Codec = namedtuple("Codec", ["name", "suffix", "compress", "decompressor"])
+Codec.__doc__ = """
+Compression format. `compress(block)` returns complete gzip member or
+zstd frame, concatenated ones are valid stream of the format.
+`decompressor()` returns object with `decompress`, `eof` and
+`unused_data` like `zlib.decompressobj`. Compressed files are stored
+with `suffix` appended to their names.
+"""
+
+GZIP = Codec(
+    "gzip", ".cb.gz",
+    lambda block: gzip.compress(block, compresslevel=6, mtime=0),
+    lambda: zlib.decompressobj(16 + zlib.MAX_WBITS)
+)
+ZSTD = None if zstandard is None else Codec(
+    "zstd", ".cb.zst",
+    lambda block: zstandard.ZstdCompressor(level=3).compress(block),
+    lambda: zstandard.ZstdDecompressor().decompressobj()
+)
+CODECS = {codec.name: codec for codec in (ZSTD, GZIP) if codec is not None}
+
+# types whose content is compressed already
+_COMPRESSED_TYPES = {
+    "application/gzip", "application/x-bzip2", "application/x-xz",
+    "application/zstd", "application/zip", "application/x-7z-compressed",
+    "application/x-rar-compressed", "application/vnd.rar",
+    "application/java-archive", "application/x-compress",
+}
+_COMPRESSED_MEDIA = ("image/", "audio/", "video/")
+_UNCOMPRESSED_MEDIA = {"image/svg+xml", "image/bmp", "audio/x-wav"}
+
+
+def default_codec() -> Codec:
+    """
+    Returns zstd if `zstandard` package is installed, gzip otherwise.
+    """
+    return ZSTD or GZIP
+
+
+def get_codec(name: str = None) -> Codec:
+    """
+    Returns codec by its name or default one if `name` is None.
+
+    Raises:
+        ValueError: if codec isn't available.
+    """
+    if name is None:
+        return default_codec()
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(
+            f"Compression `{name}` isn't available, install `zstandard`"
+            f" package for zstd.") from None
+
+
+def codec_of(name: str):
+    """
+    Returns tuple of original name and codec of file stored compressed
+    or (name, None) if it's stored as is.
+    """
+    for codec in (ZSTD, GZIP):
+        if codec is not None and name.endswith(codec.suffix):
+            return name[:-len(codec.suffix)], codec
+    return name, None
+
+
+def entropy(data: bytes) -> float:
+    """
+    Returns Shannon entropy of data in bits per byte.
+    """
+    if not data:
+        return 0.0
+    size = len(data)
+    return -sum(
+        count / size * math.log2(count / size)
+        for count in collections.Counter(data).values()
+    )
+
+
+def is_compressible(path: Path) -> bool:
+    """
+    Guesses if compression of local file is worth it. Tiny files,
+    files whose type is compressed format and files whose sample looks
+    random (compressed or encrypted content) are stored as is.
+    """
+    mime_type, encoding = mimetypes.guess_type(str(path))
+    if encoding is not None or mime_type in _COMPRESSED_TYPES:
+        return False
+    if (mime_type is not None and mime_type.startswith(_COMPRESSED_MEDIA)
+            and mime_type not in _UNCOMPRESSED_MEDIA):
+        return False
+    with open(path, "rb") as file:
+        sample = file.read(ENTROPY_SAMPLE_SIZE)
+        if len(sample) < COMPRESSION_MIN_SIZE:
+            return False
+    return entropy(sample) <= MAX_SAMPLE_ENTROPY
+
+
+class Compressor:
+    """
+    Compression stage running on its own pool of threads, zlib and zstd
+    release GIL, so blocks are compressed in parallel while previous
+    ones are sent. Every block is compressed independently.
+    """
+
+    def __init__(
+            self,
+            codec: Codec = None,
+            workers: int = COMPRESSION_WORKERS
+    ):
+        self.codec = default_codec() if codec is None else codec
+        self._workers = workers
+        self._pool = ThreadPoolExecutor(workers)
+
+    def remote_name(self, local_path: Path, name: str) -> str:
+        """
+        Returns name file is stored with, compressed files get suffix
+        of codec.
+        """
+        if is_compressible(local_path):
+            return name + self.codec.suffix
+        return name
+
+    def compress(self, blocks: Iterable[bytes]) -> Iterator[bytes]:
+        """
+        Yields compressed `blocks` in their order. At most two blocks
+        per worker are compressed ahead of the one being consumed, so
+        memory use is bounded.
+        """
+        ahead = collections.deque()
+        try:
+            for block in blocks:
+                ahead.append(self._pool.submit(self.codec.compress, block))
+                if len(ahead) > 2 * self._workers:
+                    yield ahead.popleft().result()
+            while ahead:
+                yield ahead.popleft().result()
+        finally:
+            for future in ahead:
+                future.cancel()
+
+    def close(self) -> None:
+        self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def decompress(chunks: Iterable[bytes], codec: Codec) -> Iterator[bytes]:
+    """
+    Yields decompressed content of compressed `chunks`, which may be
+    several concatenated members or frames.
+
+    Raises:
+        EOFError: if compressed content is truncated.
+        zlib.error, zstandard.ZstdError: if compressed content is
+         corrupted (see `DECOMPRESSION_ERRORS`).
+    """
+    decompressor = codec.decompressor()
+    # decompressor was fed with data of member which hasn't ended yet
+    pending = False
+    for chunk in chunks:
+        while chunk:
+            pending = True
+            data = decompressor.decompress(chunk)
+            if data:
+                yield data
+            if not decompressor.eof:
+                break
+            pending = False
+            chunk = decompressor.unused_data
+            decompressor = codec.decompressor()
+    if pending:
+        raise EOFError("Compressed content is truncated.")
@@ -0,0 +1,115 @@
+import os
+from collections import namedtuple
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+from .hashing import hash_file
+
+Entry = namedtuple("Entry", ["path", "type", "size", "modified", "md5", "id"])
+Entry.__doc__ = """
+File or directory in local or remote tree.
+
+`path` is a tuple of names relative to tree root, so trees walked in
+depth-first order with children sorted by name are sorted by `path`.
+`id` is a local path or remote file id (path for YandexDisk).
+"""
+
+Change = namedtuple("Change", ["kind", "path", "local", "remote"])
+
+ADDED = "added"
+REMOVED = "removed"
+CHANGED_SIZE = "size"
+CHANGED_MTIME = "mtime"
+CHANGED_CHECKSUM = "checksum"
+
+
+def md5sum(path: Path) -> str:
+    """
+    Returns hex md5 digest of local file computed by `hash_file`, as
+    files are hashed by upload and HashPool.
+    """
+    return hash_file(path).md5
+
+
+def walk_local(root: Path, prefix: tuple = ()) -> Iterator[Entry]:
+    """
+    Yields entries of local directory tree sorted by path. Only one
+    directory listing is kept in memory on every level of tree.
+
+    Raises:
+        NotADirectoryError: if `root` isn't a directory.
+        FileNotFoundError: if `root` doesn't exist.
+    """
+    with os.scandir(root) as it:
+        children = sorted(it, key=lambda e: e.name)
+    for child in children:
+        path = prefix + (child.name,)
+        if child.is_dir(follow_symlinks=False):
+            yield Entry(path, "dir", None, None, None, Path(child.path))
+            yield from walk_local(Path(child.path), path)
+        elif child.is_file():
+            stat = child.stat()
+            yield Entry(
+                path,
+                "file",
+                stat.st_size,
+                stat.st_mtime,
+                None,
+                Path(child.path)
+            )
+
+
+def diff_trees(
+        local: Iterable[Entry],
+        remote: Iterable[Entry],
+        checksum: bool = False,
+        hasher: Callable[[Path], str] = md5sum
+) -> Iterator[Change]:
+    """
+    Compares two trees by merge join of their sorted entries, so neither
+    tree is held in memory.
+
+    Files are changed if their sizes differ, otherwise if local file is
+    newer than remote one or, if `checksum` is True, if local md5
+    (computed by `hasher`) differs from md5 reported by storage.
+    Entries with the same path but different types are reported as
+    removed and added.
+
+    Yields:
+        |namedtuple| Change("kind", "path", "local", "remote") for every
+         entry that differs, `local` or `remote` is None for added and
+         removed entries.
+    """
+    local = iter(local)
+    remote = iter(remote)
+    loc = next(local, None)
+    rem = next(remote, None)
+    while loc is not None or rem is not None:
+        if rem is None or (loc is not None and loc.path < rem.path):
+            yield Change(ADDED, loc.path, loc, None)
+            loc = next(local, None)
+        elif loc is None or rem.path < loc.path:
+            yield Change(REMOVED, rem.path, None, rem)
+            rem = next(remote, None)
+        else:
+            if loc.type != rem.type:
+                yield Change(REMOVED, rem.path, None, rem)
+                yield Change(ADDED, loc.path, loc, None)
+            elif loc.type == "file":
+                kind = _compare_files(loc, rem, checksum, hasher)
+                if kind is not None:
+                    yield Change(kind, loc.path, loc, rem)
+            loc = next(local, None)
+            rem = next(remote, None)
+
+
+def _compare_files(local, remote, checksum, hasher):
+    if local.size != remote.size:
+        return CHANGED_SIZE
+    if checksum and remote.md5 is not None:
+        if hasher(local.id) != remote.md5:
+            return CHANGED_CHECKSUM
+        return None
+    if remote.modified is not None and local.modified > remote.modified:
+        return CHANGED_MTIME
+    return None
@@ -0,0 +1,167 @@
+import base64
+import os
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from ._defaults import (
+    ENCRYPTED_SUFFIX,
+    ENCRYPTION_CHUNK_SIZE,
+    ENCRYPTION_KEY_PATH
+)
+from .exceptions import DecryptionException, EncryptionKeyException
+
+try:
+    from cryptography.exceptions import InvalidTag
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+except ImportError:
+    AESGCM = None
+
+__all__ = ["ENCRYPTED_SUFFIX", "Cipher", "create_key", "load_key"]
+
+MAGIC = b"CBE\x01"
+KEY_SIZE = 32
+SALT_SIZE = 16
+TAG_SIZE = 16
+# magic, chunk size and salt
+HEADER_SIZE = len(MAGIC) + 4 + SALT_SIZE
+_KEY_INFO = b"cloudbackup chunk encryption"
+
+
+def create_key(path: Path = ENCRYPTION_KEY_PATH) -> None:
+    """
+    Writes new random master key readable only by owner.
+
+    Raises:
+        FileExistsError: if key file already exists.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as file:
+        file.write(base64.urlsafe_b64encode(os.urandom(KEY_SIZE)) + b"\n")
+
+
+def load_key(path: Path = ENCRYPTION_KEY_PATH) -> bytes:
+    """
+    Raises:
+        FileNotFoundError: if there is no key file.
+        EncryptionKeyException: if file doesn't contain key.
+    """
+    try:
+        key = base64.urlsafe_b64decode(path.read_bytes().strip())
+    except ValueError:
+        raise EncryptionKeyException(path) from None
+    if len(key) != KEY_SIZE:
+        raise EncryptionKeyException(path)
+    return key
+
+
+def _nonce(index: int, last: bool) -> bytes:
+    # every file is encrypted by its own key, so nonce is just position
+    # of chunk, last chunk is marked to detect truncation
+    return index.to_bytes(11, "big") + (b"\x01" if last else b"\x00")
+
+
+def _rechunk(chunks: Iterable[bytes], size: int) -> Iterator[tuple]:
+    """
+    Yields (chunk, last) with chunks of `size` bytes, the last one may
+    be shorter or empty. Chunk is held back until it's known if it's
+    the last one. Chunks are views of received data, only remainder of
+    previous data is copied.
+    """
+    pending = b""
+    for chunk in chunks:
+        if pending:
+            chunk = pending + chunk
+        view = memoryview(chunk)
+        while len(view) > size:
+            yield view[:size], False
+            view = view[size:]
+        pending = bytes(view)
+    yield pending, True
+
+
+class Cipher:
+    """
+    Chunked authenticated encryption of streams by AES-256-GCM.
+
+    Stream is header (magic, chunk size and random salt) followed by
+    plaintext chunks of `chunk_size` bytes encrypted independently,
+    every chunk grows by 16 bytes of tag. Key of stream is derived from
+    master key and salt by HKDF, so nonces are positions of chunks and
+    never repeat under one key. Size of stored file is known in advance
+    (see `encrypted_size`). Only one chunk is buffered.
+    """
+
+    def __init__(self, key: bytes, chunk_size: int = ENCRYPTION_CHUNK_SIZE):
+        """
+        Raises:
+            ModuleNotFoundError: if `cryptography` package isn't
+             installed.
+        """
+        if AESGCM is None:
+            raise ModuleNotFoundError(
+                "Encryption requires `cryptography` package.")
+        self._key = key
+        self._chunk_size = chunk_size
+
+    def _aead(self, salt: bytes):
+        return AESGCM(HKDF(
+            algorithm=hashes.SHA256(),
+            length=KEY_SIZE,
+            salt=salt,
+            info=_KEY_INFO
+        ).derive(self._key))
+
+    def encrypted_size(self, size: int) -> int:
+        """
+        Returns size of stored file with plaintext of `size` bytes.
+        """
+        chunks = max(1, -(-size // self._chunk_size))
+        return HEADER_SIZE + size + chunks * TAG_SIZE
+
+    def encrypt(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        header = (MAGIC + self._chunk_size.to_bytes(4, "big")
+                  + os.urandom(SALT_SIZE))
+        aead = self._aead(header[-SALT_SIZE:])
+        yield header
+        for index, (chunk, last) in enumerate(
+                _rechunk(chunks, self._chunk_size)):
+            yield aead.encrypt(_nonce(index, last), chunk, header)
+
+    @staticmethod
+    def _chunk_size_of(header: bytes) -> int:
+        if len(header) != HEADER_SIZE or not header.startswith(MAGIC):
+            raise DecryptionException()
+        return int.from_bytes(header[len(MAGIC):len(MAGIC) + 4], "big")
+
+    def decrypt(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """
+        Yields plaintext of encrypted stream.
+
+        Raises:
+            DecryptionException: if content is corrupted, truncated or
+             encrypted by another key.
+        """
+        chunks = iter(chunks)
+        buffer = bytearray()
+        while len(buffer) < HEADER_SIZE:
+            chunk = next(chunks, None)
+            if chunk is None:
+                raise DecryptionException()
+            buffer += chunk
+        header = bytes(buffer[:HEADER_SIZE])
+        size = self._chunk_size_of(header) + TAG_SIZE
+        aead = self._aead(header[-SALT_SIZE:])
+        chunks = _prepend(bytes(buffer[HEADER_SIZE:]), chunks)
+        for index, (chunk, last) in enumerate(_rechunk(chunks, size)):
+            try:
+                yield aead.decrypt(_nonce(index, last), chunk, header)
+            except InvalidTag:
+                raise DecryptionException() from None
+
+
+def _prepend(head: bytes, chunks: Iterator[bytes]) -> Iterator[bytes]:
+    yield head
+    yield from chunks
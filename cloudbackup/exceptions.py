@@ -24,3 +24,58 @@ class CredentialsNotFoundException(Exception):
     def __init__(self, storage: str):
         self.message = f"Credentials file not found for {storage}."
         super(CredentialsNotFoundException, self).__init__(self.message)
+
+
+class ChecksumMismatchException(Exception):
+
+    def __init__(self, file, local_md5: str, remote_md5: str):
+        """
+        :param file: file path or file id
+        """
+        self.message = (f"Checksum mismatch for `{file}`: "
+                        f"local md5 {local_md5}, remote md5 {remote_md5}.")
+        self.local_md5 = local_md5
+        self.remote_md5 = remote_md5
+        super().__init__(self.message)
+
+
+class EncryptionKeyException(Exception):
+
+    def __init__(self, path):
+        self.message = f"`{path}` isn't encryption key."
+        super().__init__(self.message)
+
+
+class DecryptionException(Exception):
+
+    def __init__(self, file=None):
+        """
+        :param file: file path or file id
+        """
+        subject = "content" if file is None else f"content of `{file}`"
+        self.message = (f"Can't decrypt {subject}: it's corrupted or"
+                        f" encrypted by another key.")
+        super().__init__(self.message)
+
+
+class DecompressionException(Exception):
+
+    def __init__(self, file=None):
+        """
+        :param file: file path or file id
+        """
+        subject = "content" if file is None else f"content of `{file}`"
+        self.message = (f"Can't decompress {subject}: it's corrupted or"
+                        f" truncated.")
+        super().__init__(self.message)
+
+
+class UnsafePathException(Exception):
+
+    def __init__(self, path: str):
+        """
+        :param path: path of file recorded in index or manifest
+        """
+        self.message = (f"Recorded path `{path}` isn't relative path inside"
+                        f" destination folder.")
+        super().__init__(self.message)
@@ -1,12 +1,43 @@
+import datetime
+import math
+import sys
+from array import array
+
+
+def _timestamp(iso_time):
+    """
+    Convert RFC 3339 time from API response to POSIX timestamp.
+    """
+    if iso_time is None:
+        return None
+    if iso_time.endswith("Z"):
+        iso_time = iso_time[:-1] + "+00:00"
+    return datetime.datetime.fromisoformat(iso_time).timestamp()
+
+
+def _size(raw_size):
+    """
+    GoogleDrive API returns sizes as strings, YandexDisk API as numbers.
+    """
+    if raw_size is None:
+        return None
+    return int(raw_size)
+
+
 class RemoteFile:
     """
     Class represents base file on any remote storage.
     """
 
-    def __init__(self, name, type, id):
+    __slots__ = ("name", "type", "id", "size", "modified", "md5")
+
+    def __init__(self, name, type, id, size=None, modified=None, md5=None):
         self.name = name
         self.type = type
         self.id = id
+        self.size = size
+        self.modified = modified
+        self.md5 = md5
 
     def str_value(self):
         """
@@ -23,8 +54,37 @@ class RemoteFile:
     def __str__(self):
         return self.str_value()
 
+    def _values(self):
+        """
+        Returns values of all slots declared in class hierarchy.
+        """
+        return tuple(getattr(self, slot) for slot in self._slots())
+
+    @classmethod
+    def _slots(cls):
+        return tuple(
+            slot
+            for klass in reversed(cls.__mro__)
+            for slot in getattr(klass, "__slots__", ())
+        )
+
+    @classmethod
+    def _from_values(cls, values):
+        """
+        Restore file object from values returned by `_values` method.
+        """
+        file = cls.__new__(cls)
+        for slot, value in zip(cls._slots(), values):
+            setattr(file, slot, value)
+        return file
+
     def __eq__(self, other):
-        return self.__dict__ == other.__dict__
+        if type(self) is not type(other):
+            return NotImplemented
+        return self._values() == other._values()
+
+    def __hash__(self):
+        return hash(self._values())
 
 
 class YaDiskFile(RemoteFile):
@@ -32,15 +92,26 @@ class YaDiskFile(RemoteFile):
     Class represents file object on YandexDisk storage
     """
 
+    __slots__ = ()
+
     def __init__(self, meta_inf):
         """
         Create file object from JSON response
 
         Params:
             meta_inf: JSON contains raw file meta-information from
-             YandexDisk API response
+             YandexDisk API response. Only `name`, `type` and `path`
+             are required, `size`, `modified` and `md5` are taken
+             if they were requested.
         """
-        super().__init__(meta_inf["name"], meta_inf["type"], meta_inf["path"])
+        super().__init__(
+            meta_inf["name"],
+            meta_inf["type"],
+            meta_inf["path"],
+            size=_size(meta_inf.get("size")),
+            modified=_timestamp(meta_inf.get("modified")),
+            md5=meta_inf.get("md5")
+        )
 
 
 class GDriveFile(RemoteFile):
@@ -48,13 +119,17 @@ class GDriveFile(RemoteFile):
     Class represents file object on Google Drive storage
     """
 
+    __slots__ = ("mime_type", "parents")
+
     def __init__(self, meta_inf):
         """
         Create file object from JSON response
 
         Args:
             meta_inf: JSON contains raw file meta-information from
-             GoogleDrive API response
+             GoogleDrive API response. Only `name`, `mimeType` and `id`
+             are required, `size`, `modifiedTime`, `md5Checksum` and
+             `parents` are taken if they were requested.
         """
         self.mime_type = meta_inf["mimeType"]
         if self.mime_type == "application/vnd.google-apps.folder":
@@ -63,4 +138,172 @@ class GDriveFile(RemoteFile):
             file_type = "g.suite"
         else:
             file_type = "file"
-        super().__init__(meta_inf["name"], file_type, meta_inf["id"])
+        parents = meta_inf.get("parents")
+        self.parents = tuple(parents) if parents is not None else None
+        super().__init__(
+            meta_inf["name"],
+            file_type,
+            meta_inf["id"],
+            size=_size(meta_inf.get("size")),
+            modified=_timestamp(meta_inf.get("modifiedTime")),
+            md5=meta_inf.get("md5Checksum")
+        )
+
+
+class FileListing:
+    """
+    Compact columnar container for large listings of remote files.
+
+    Instead of keeping one object per file, values are packed into
+    columns: names and ids are stored as utf-8 bytes in shared buffers
+    (ids ending with file name, e.g. YandexDisk paths, keep only interned
+    parent prefix), types are stored as integer codes, sizes,
+    modification times and md5 checksums are packed into arrays.
+    Subclass specific values (GDrive mime types and parents) repeat
+    across many files, so every distinct value is kept once and files
+    keep only its code.
+    File objects are built on the fly while iterating, so listing can
+    be used in the same way as list of files, while consumers holding
+    many listings read columns directly.
+    """
+
+    _TYPES = ("file", "dir", "g.suite")
+    _NO_SIZE = -1
+    _NO_MD5 = bytes(16)
+    _NO_PREFIX = -1
+
+    def __init__(self, files=()):
+        self._file_class = None
+        self._names = bytearray()
+        self._name_ends = array("Q")
+        self._ids = bytearray()
+        self._id_ends = array("Q")
+        self._prefixes = []
+        self._prefix_codes = {}
+        self._id_prefixes = array("l")
+        self._types = array("B")
+        self._sizes = array("q")
+        self._modified = array("d")
+        self._md5 = bytearray()
+        self._extra = {}
+        self.extend(files)
+
+    def append(self, file: RemoteFile) -> None:
+        if self._file_class is None:
+            self._file_class = type(file)
+            self._extra = {
+                slot: ([], {}, array("l")) for slot in self._extra_slots()
+            }
+        elif type(file) is not self._file_class:
+            raise TypeError(
+                f"Listing of {self._file_class.__name__} objects "
+                f"can't hold {type(file).__name__}."
+            )
+        self._names += file.name.encode()
+        self._name_ends.append(len(self._names))
+        if file.name and file.id.endswith(file.name):
+            prefix = file.id[:-len(file.name)]
+            if prefix not in self._prefix_codes:
+                self._prefix_codes[prefix] = len(self._prefixes)
+                self._prefixes.append(prefix)
+            self._id_prefixes.append(self._prefix_codes[prefix])
+        else:
+            self._ids += file.id.encode()
+            self._id_prefixes.append(self._NO_PREFIX)
+        self._id_ends.append(len(self._ids))
+        self._types.append(self._TYPES.index(file.type))
+        self._sizes.append(
+            self._NO_SIZE if file.size is None else file.size)
+        self._modified.append(
+            math.nan if file.modified is None else file.modified)
+        self._md5 += (
+            self._NO_MD5 if file.md5 is None else bytes.fromhex(file.md5))
+        for slot, (values, codes, column) in self._extra.items():
+            value = getattr(file, slot)
+            if value not in codes:
+                codes[value] = len(values)
+                values.append(self._intern(value))
+            column.append(codes[value])
+
+    def extend(self, files) -> None:
+        for file in files:
+            self.append(file)
+
+    def _extra_slots(self):
+        return self._file_class._slots()[len(RemoteFile.__slots__):]
+
+    @staticmethod
+    def _intern(value):
+        """
+        Ids in values (e.g. parents) are shared with other listings and
+        with consumers keyed by them.
+        """
+        if isinstance(value, str):
+            return sys.intern(value)
+        if isinstance(value, tuple):
+            return tuple(sys.intern(v) for v in value)
+        return value
+
+    @staticmethod
+    def _unpack(buffer, ends, index):
+        start = ends[index - 1] if index else 0
+        return buffer[start:ends[index]].decode()
+
+    def name(self, index: int) -> str:
+        """
+        Column accessors (`name`, `type`, `id`, `size`, `modified`,
+        `md5`) return value of file at `index` without building file
+        object, e.g. to sort listing or to read only some of fields.
+        """
+        return self._unpack(self._names, self._name_ends, index)
+
+    def type(self, index: int) -> str:
+        return self._TYPES[self._types[index]]
+
+    def id(self, index: int) -> str:
+        prefix = self._id_prefixes[index]
+        if prefix == self._NO_PREFIX:
+            return self._unpack(self._ids, self._id_ends, index)
+        return self._prefixes[prefix] + self.name(index)
+
+    def size(self, index: int):
+        size = self._sizes[index]
+        return None if size == self._NO_SIZE else size
+
+    def modified(self, index: int):
+        modified = self._modified[index]
+        return None if math.isnan(modified) else modified
+
+    def md5(self, index: int):
+        md5 = bytes(self._md5[index * 16:(index + 1) * 16])
+        return None if md5 == self._NO_MD5 else md5.hex()
+
+    def field(self, slot: str, index: int):
+        """
+        Returns value of subclass specific `slot`, e.g. parents of
+        GDrive file, of file at `index`.
+        """
+        values, _, column = self._extra[slot]
+        return values[column[index]]
+
+    def __len__(self):
+        return len(self._types)
+
+    def __getitem__(self, index: int) -> RemoteFile:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("listing index out of range")
+        values = (
+            self.name(index),
+            self.type(index),
+            self.id(index),
+            self.size(index),
+            self.modified(index),
+            self.md5(index),
+        ) + tuple(self.field(slot, index) for slot in self._extra)
+        return self._file_class._from_values(values)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
@@ -1,10 +1,13 @@
 import json
-import requests
 import mimetypes
+import re
+import uuid
 
 from collections import namedtuple
 from pathlib import Path
-from ._authenticator import Authenticator
+from typing import Iterator, Optional
+from ._authenticator import TokenProvider
+from ._session import http_session, range_header
 from .file_objects import GDriveFile
 from .exceptions import ApiResponseException
 from ._defaults import (GDRIVE_BACKEND_ERROR,
@@ -12,7 +15,10 @@ from ._defaults import (GDRIVE_BACKEND_ERROR,
                         GDRIVE_LIMIT_EXCEEDED,
                         GDRIVE_FILE_NOT_FOUND,
                         GDRIVE_TOO_MANY_REQUESTS,
-                        GDRIVE_BAD_REQUEST)
+                        GDRIVE_BAD_REQUEST,
+                        GDRIVE_FILE_FIELDS,
+                        ACCEPT_ENCODING,
+                        DOWNLOAD_CHUNK_SIZE)
 
 
 class GDrive:
@@ -30,11 +36,36 @@ class GDrive:
             GDRIVE_INVALID_CREDENTIALS
         }
 
-        self._auth_headers = {
+        self._tokens = TokenProvider.for_gdrive()
+        self._session = http_session()
+
+    @property
+    def _auth_headers(self) -> dict:
+        """
+        Headers with current access token. Token is loaded on first
+        request (so constructing client costs no I/O) and then refreshed
+        by provider in background.
+        """
+        return {
             "Content-Type": "application/json",
-            "Authorization": f"Bearer {Authenticator().get_gdrive_token()}"
+            "Accept-Encoding": ACCEPT_ENCODING,
+            "Authorization": f"Bearer {self._tokens.token()}"
         }
 
+    # upload sessions are created with these fields, so response to
+    # upload request includes id and checksum of stored file
+    _UPLOADED_FILE_FIELDS = "id, md5Checksum"
+
+    @staticmethod
+    def _fields(extra_fields: tuple = ()) -> str:
+        """
+        Build file fields selector from minimal fields set and fields
+        explicitly requested by caller.
+        """
+        fields = list(GDRIVE_FILE_FIELDS)
+        fields.extend(f for f in extra_fields if f not in fields)
+        return ", ".join(fields)
+
     def download(self, file_id: str) -> bytes:
         """
         Make request for downloading file from GoogleDrive storage.
@@ -49,7 +80,7 @@ class GDrive:
             ApiResponseException: an error occurred accessing API
         """
         file_data = {"alt": "media"}
-        r = requests.get(
+        r = self._session.get(
             f"https://www.googleapis.com/drive/v3/files/{file_id}",
             params=file_data, headers=self._auth_headers
         )
@@ -58,6 +89,46 @@ class GDrive:
                 r.status_code, r.json()["error"]["message"])
         return r.content
 
+    def download_stream(
+            self,
+            file_id: str,
+            chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+            byte_range: tuple = None
+    ) -> Iterator[bytes]:
+        """
+        Make request for downloading file from GoogleDrive storage and
+        yield its content by chunks as they are received, so file is
+        never held in memory.
+
+        Args:
+            file_id: file id to download
+            chunk_size: Optional; size of yielded chunks
+            byte_range: Optional; (start, end) offsets, only bytes from
+             `start` up to `end` (exclusive) are downloaded
+
+        Raises:
+            ApiResponseException: an error occurred accessing API
+        """
+        headers = self._auth_headers
+        if byte_range is not None:
+            # ranges of compressed representation would be returned
+            headers["Accept-Encoding"] = "identity"
+            headers["Range"] = range_header(*byte_range)
+        r = self._session.get(
+            f"https://www.googleapis.com/drive/v3/files/{file_id}",
+            params={"alt": "media"},
+            headers=headers,
+            stream=True
+        )
+        with r:
+            if r.status_code in self._errors:
+                raise ApiResponseException(
+                    r.status_code, r.json()["error"]["message"])
+            if byte_range is not None and r.status_code != 206:
+                raise ApiResponseException(
+                    r.status_code, "Range of file wasn't returned.")
+            yield from r.iter_content(chunk_size)
+
     def lsdir(
             self,
             dir_id: str = None,
@@ -65,7 +136,8 @@ class GDrive:
             owners: list = None,
             page_size: int = 20,
             page_token: str = None,
-            order_by: str = "modifiedTime"
+            order_by: str = "modifiedTime",
+            extra_fields: tuple = ()
     ) -> namedtuple("Page", ["files", "next_page_token"]):
         """
         Make request to get list of `page_size` size consists of
@@ -84,6 +156,9 @@ class GDrive:
              'recency', 'viewedByMeTime'. Each key sorts ascending by default,
              but may be reversed with the 'desc' modifier.
              For example: 'modifiedTime desc'.
+            extra_fields: Optional; file fields to request in addition
+             to 'name', 'mimeType' and 'id'. For example: ('size',
+             'modifiedTime', 'md5Checksum', 'parents').
 
         Returns:
             |namedtuple| Page("files", "next_page_token").
@@ -110,10 +185,10 @@ class GDrive:
             "q": query,
             "pageSize": page_size,
             "orderBy": order_by,
-            "fields": "files(name, mimeType, id), nextPageToken",
+            "fields": f"files({self._fields(extra_fields)}), nextPageToken",
             "pageToken": page_token,
         }
-        r = requests.get(
+        r = self._session.get(
             "https://www.googleapis.com/drive/v3/files",
             params=flags,
             headers=self._auth_headers
@@ -153,8 +228,9 @@ class GDrive:
             "mimeType": "application/vnd.google-apps.folder",
             "parents": [parent_id] if parent_id else []
         }
-        r = requests.post(
+        r = self._session.post(
             "https://www.googleapis.com/drive/v3/files",
+            params={"fields": "id"},
             headers=self._auth_headers,
             data=json.dumps(metadata)
         )
@@ -176,13 +252,13 @@ class GDrive:
             ApiResponseException: an error occurred accessing API.
         """
         if permanently:
-            r = requests.request(
+            r = self._session.request(
                 "DELETE",
                 f"https://www.googleapis.com/drive/v3/files/{file_id}",
                 headers=self._auth_headers
             )
         else:
-            r = requests.post(
+            r = self._session.post(
                 f"https://www.googleapis.com/drive/v2/files/{file_id}/trash",
                 headers=self._auth_headers
             )
@@ -190,6 +266,108 @@ class GDrive:
             raise ApiResponseException(
                 r.status_code, r.json()["error"]["message"])
 
+    def copy(self, file_id: str, name: str, parent_id: str = None) -> str:
+        """
+        Create copy of file in Google Drive storage. Content is copied by
+        Drive, nothing is transferred.
+
+        Args:
+            file_id: id of file to copy.
+            name: name of created copy.
+            parent_id: Optional; id of folder copy is placed into.
+
+        Returns:
+            Id of created copy.
+
+        Raises:
+            ApiResponseException: an error occurred accessing API.
+        """
+        metadata = {"name": name}
+        if parent_id is not None:
+            metadata["parents"] = [parent_id]
+        r = self._session.post(
+            f"https://www.googleapis.com/drive/v3/files/{file_id}/copy",
+            params={"fields": "id"},
+            headers=self._auth_headers,
+            data=json.dumps(metadata)
+        )
+        if r.status_code in self._errors:
+            raise ApiResponseException(
+                r.status_code, r.json()["error"]["message"])
+        return r.json()["id"]
+
+    def remove_batch(
+            self,
+            file_ids: list,
+            permanently: bool = False
+    ) -> dict:
+        """
+        Remove permanently or move to the trash several files by one
+        batch request. At most GDRIVE_BATCH_SIZE files can be passed.
+
+        Args:
+            file_ids: Ids of files that should be deleted.
+            permanently: Optional; whether to delete files permanently
+             or move them to the trash.
+
+        Returns:
+            ApiResponseException by id of every file which wasn't
+            removed, empty dict if all files were removed.
+
+        Raises:
+            ApiResponseException: an error occurred accessing API.
+        """
+        boundary = f"batch_{uuid.uuid4().hex}"
+        parts = []
+        for i, file_id in enumerate(file_ids):
+            if permanently:
+                request = f"DELETE /drive/v3/files/{file_id} HTTP/1.1\r\n\r\n"
+            else:
+                request = (
+                    f"PATCH /drive/v3/files/{file_id}?fields=id HTTP/1.1\r\n"
+                    "Content-Type: application/json; charset=UTF-8\r\n\r\n"
+                    '{"trashed": true}'
+                )
+            parts.append(
+                f"--{boundary}\r\n"
+                "Content-Type: application/http\r\n"
+                f"Content-ID: <{i}>\r\n\r\n"
+                f"{request}\r\n"
+            )
+        headers = dict(self._auth_headers)
+        headers["Content-Type"] = f"multipart/mixed; boundary={boundary}"
+        r = self._session.post(
+            "https://www.googleapis.com/batch/drive/v3",
+            headers=headers,
+            data="".join(parts) + f"--{boundary}--\r\n"
+        )
+        if r.status_code in self._errors:
+            raise ApiResponseException(
+                r.status_code, r.json()["error"]["message"])
+        failed = {}
+        for content_id, status, body in self._batch_responses(r):
+            if status >= 300:
+                try:
+                    message = json.loads(body)["error"]["message"]
+                except ValueError:
+                    message = body
+                failed[file_ids[content_id]] = ApiResponseException(
+                    status, message)
+        return failed
+
+    @staticmethod
+    def _batch_responses(r):
+        """
+        Yields (Content-ID, status code, body) of every response of
+        multipart batch response.
+        """
+        boundary = r.headers["Content-Type"].split("boundary=")[1]
+        for part in r.text.split(f"--{boundary}")[1:-1]:
+            content_id = re.search(r"Content-ID: <response-(\d+)>", part)
+            status = re.search(r"HTTP/1\.1 (\d{3})", part)
+            body = part.split("\r\n\r\n", 2)[-1].strip()
+            yield int(content_id.group(1)), int(status.group(1)), body
+
     def get_upload_link(self, file_path: Path, parent_id="root") -> str:
         """
         Send request to Google Drive API for getting link for file upload.
@@ -212,9 +390,10 @@ class GDrive:
         if parent_id is not None:
             metadata["parents"] = [parent_id]
         metadata = json.dumps(metadata)
-        r = requests.post(
+        r = self._session.post(
             "https://www.googleapis.com/upload/drive/v3/files?"
             "uploadType=resumable",
+            params={"fields": self._UPLOADED_FILE_FIELDS},
             headers=headers,
             data=metadata
         )
@@ -223,19 +402,63 @@ class GDrive:
                 r.status_code, r.json()["error"]["message"])
         return r.headers["location"]
 
-    def upload_file(self, upload_link: str, file_data: bytes) -> None:
+    def get_update_link(self, file_id: str, file_path: Path) -> str:
+        """
+        Send request to Google Drive API for getting link for replacing
+        content of existing file.
+
+        Args:
+            file_id: id of file which content should be replaced
+            file_path: absolute path to file with new content
+
+        Returns:
+            Link for upload.
+
+        Raises:
+             ApiResponseException: an error occurred accessing API
+        """
+        headers = {
+            "X-Upload-Content-Type": mimetypes.guess_type(file_path)[0]
+        }
+        headers.update(self._auth_headers)
+        r = self._session.patch(
+            f"https://www.googleapis.com/upload/drive/v3/files/{file_id}?"
+            "uploadType=resumable",
+            params={"fields": self._UPLOADED_FILE_FIELDS},
+            headers=headers
+        )
+        if r.status_code in self._errors:
+            raise ApiResponseException(
+                r.status_code, r.json()["error"]["message"])
+        return r.headers["location"]
+
+    def upload_file(self, upload_link: str, file_data) -> Optional[str]:
         """
         Upload full file data to the Google Drive by one single request
         using upload link received from `get_upload_link` method.
 
         Args:
             upload_link: link for uploading file
-            file_data: raw binary file data
+            file_data: raw binary file data, file-like object with
+             `__len__`, which is streamed, or iterable of chunks of
+             unknown total size, which is sent chunked
+
+        Returns:
+            md5 of uploaded content computed by Drive or None if Drive
+            didn't report it.
 
         Raises:
             ApiResponseException: If API response has unsuccessful status code.
         """
-        r = requests.put(
+        return self.upload(upload_link, file_data).get("md5Checksum")
+
+    def upload(self, upload_link: str, file_data) -> dict:
+        """
+        Same as `upload_file`, but returns fields of uploaded file
+        reported by Drive: `id` and `md5Checksum`, empty dict if Drive
+        reported none.
+        """
+        r = self._session.put(
             upload_link,
             data=file_data,
             headers=self._auth_headers
@@ -243,19 +466,28 @@ class GDrive:
         if r.status_code in self._errors:
             raise ApiResponseException(
                 r.status_code, r.json()["error"]["message"])
+        try:
+            return r.json()
+        except ValueError:
+            return {}
 
-    def get_file(self, file_id: str) -> GDriveFile:
+    def get_file(self, file_id: str, extra_fields: tuple = ()) -> GDriveFile:
         """
-        Get file or directory meta-information by file_id.
+        Get file or directory meta-information by file_id. Includes only
+         name, mimeType and id of target file unless other fields are
+         requested explicitly.
 
         Args:
             file_id: id of directory or file to get meta-information about
+            extra_fields: Optional; file fields to request in addition
+             to 'name', 'mimeType' and 'id'.
 
         Raises:
             ApiResponseException: an error occurred accessing API.
         """
-        r = requests.get(
+        r = self._session.get(
             f"https://www.googleapis.com/drive/v3/files/{file_id}",
+            params={"fields": self._fields(extra_fields)},
             headers=self._auth_headers
         )
         if r.status_code in self._errors:
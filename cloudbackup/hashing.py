@@ -0,0 +1,260 @@
+import collections
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from ._defaults import (
+    HASH_BLOCK_SIZE,
+    HASH_CACHE_PATH,
+    HASH_WINDOW,
+    HASH_WORKERS
+)
+
+Digests = namedtuple("Digests", ["md5", "sha256"])
+
+
+def hash_file(path: Path, block_size: int = HASH_BLOCK_SIZE) -> Digests:
+    """
+    Computes hex md5 and sha256 digests of local file by one pass.
+
+    File is read without buffering into one reused buffer, so every
+    chunk is read by single system call and isn't copied. Hashlib
+    releases GIL while it hashes big buffers, so files can be hashed
+    by several threads concurrently.
+    """
+    md5 = hashlib.md5()
+    sha256 = hashlib.sha256()
+    buffer = bytearray(block_size)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as file:
+        while True:
+            n = file.readinto(buffer)
+            if not n:
+                break
+            md5.update(view[:n])
+            sha256.update(view[:n])
+    return Digests(md5.hexdigest(), sha256.hexdigest())
+
+
+class HashingReader:
+    """
+    Read-only file object feeding every byte read from file to md5 and
+    sha256, so file can be streamed to storage and hashed by one pass.
+    `__len__` lets HTTP client send Content-Length instead of chunked
+    body.
+    """
+
+    def __init__(self, path: Path):
+        self._file = open(path, "rb")
+        self._size = os.fstat(self._file.fileno()).st_size
+        self._md5 = hashlib.md5()
+        self._sha256 = hashlib.sha256()
+
+    def __len__(self):
+        return self._size
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._file.read(size)
+        self._md5.update(chunk)
+        self._sha256.update(chunk)
+        return chunk
+
+    def digests(self) -> Digests:
+        """
+        Returns Digests of all data read so far.
+        """
+        return Digests(self._md5.hexdigest(), self._sha256.hexdigest())
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class HashCache:
+    """
+    Persistent cache of file digests keyed by (device, inode, size,
+    modification time). If any of them changes file is hashed again,
+    so unchanged files are never re-read.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS digests (
+            device INTEGER NOT NULL,
+            inode INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            md5 TEXT NOT NULL,
+            sha256 TEXT NOT NULL,
+            PRIMARY KEY (device, inode)
+        )
+    """
+    # digests are committed by batches
+    _COMMIT_EVERY = 256
+
+    def __init__(self, path=HASH_CACHE_PATH):
+        """
+        Args:
+            path: Optional; cache file or ":memory:".
+        """
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(self._SCHEMA)
+        self._uncommitted = 0
+
+    def get(self, stat: os.stat_result):
+        """
+        Returns Digests of file with given stat or None.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT md5, sha256 FROM digests WHERE device = ?"
+                " AND inode = ? AND size = ? AND mtime_ns = ?",
+                (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+            ).fetchone()
+        return None if row is None else Digests(*row)
+
+    def put(self, stat: os.stat_result, digests: Digests) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?, ?)",
+                (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns,
+                 digests.md5, digests.sha256)
+            )
+            self._uncommitted += 1
+            if self._uncommitted >= self._COMMIT_EVERY:
+                self._db.commit()
+                self._uncommitted = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+
+
+class HashPool:
+    """
+    Hashing stage running on its own pool of threads, so hashing doesn't
+    throttle threads which list or transfer files.
+    """
+
+    def __init__(self, workers: int = HASH_WORKERS, cache: HashCache = None):
+        """
+        Args:
+            workers: Optional; number of files hashed concurrently.
+            cache: Optional; HashCache, digests aren't cached if it's None.
+        """
+        self._pool = ThreadPoolExecutor(workers)
+        self._cache = cache
+        self._futures = {}
+        self._futures_lock = threading.Lock()
+
+    def _digests(self, path: Path) -> Digests:
+        stat = os.stat(path)
+        if self._cache is not None:
+            digests = self._cache.get(stat)
+            if digests is not None:
+                return digests
+        digests = hash_file(path)
+        if self._cache is not None:
+            after = os.stat(path)
+            # file modified while it was read mustn't be cached
+            if (after.st_size, after.st_mtime_ns) == (
+                    stat.st_size, stat.st_mtime_ns):
+                self._cache.put(stat, digests)
+        return digests
+
+    def submit(self, path: Path) -> Future:
+        """
+        Starts hashing of file, file submitted several times is hashed
+        once.
+        """
+        with self._futures_lock:
+            future = self._futures.get(path)
+            if future is None:
+                future = self._pool.submit(self._digests, path)
+                self._futures[path] = future
+        return future
+
+    def _forget(self, path: Path) -> None:
+        with self._futures_lock:
+            self._futures.pop(path, None)
+
+    def digests(self, path: Path) -> Digests:
+        """
+        Returns Digests of file waiting for hashing submitted before.
+        """
+        future = self.submit(path)
+        try:
+            return future.result()
+        finally:
+            self._forget(path)
+
+    def md5(self, path: Path) -> str:
+        return self.digests(path).md5
+
+    def prefetch(
+            self,
+            entries: Iterable,
+            window: int = HASH_WINDOW
+    ) -> Iterator:
+        """
+        Passes entries of local tree (see `cloudbackup.diff.Entry`)
+        through, starting hashing of every file `window` entries before
+        it's yielded. Digests of entry must be taken before next entry
+        is requested, otherwise they are only cached.
+        """
+        ahead = collections.deque()
+        for entry in entries:
+            if entry.type == "file":
+                self.submit(entry.id)
+            ahead.append(entry)
+            if len(ahead) > window:
+                entry = ahead.popleft()
+                yield entry
+                self._forget(entry.id)
+        for entry in ahead:
+            yield entry
+            self._forget(entry.id)
+
+    def map(
+            self,
+            paths: Iterable[Path],
+            window: int = HASH_WINDOW
+    ) -> Iterator[tuple]:
+        """
+        Yields (path, Digests) for every path in order of `paths`,
+        at most `window` files are hashed ahead.
+        """
+        ahead = collections.deque()
+        for path in paths:
+            ahead.append((path, self.submit(path)))
+            if len(ahead) > window:
+                path, _ = ahead.popleft()
+                yield path, self.digests(path)
+        for path, _ in ahead:
+            yield path, self.digests(path)
+
+    def close(self) -> None:
+        self._pool.shutdown(cancel_futures=True)
+        if self._cache is not None:
+            self._cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,207 @@
+import hashlib
+import sqlite3
+import threading
+from collections import namedtuple
+from pathlib import Path
+
+from ._defaults import JOURNALS_DIR
+
+Item = namedtuple(
+    "Item",
+    ["id", "kind", "source", "target", "parent", "name", "size", "checksum",
+     "attempts"]
+)
+
+PENDING = "pending"
+IN_FLIGHT = "in_flight"
+DONE = "done"
+
+
+class Journal:
+    """
+    Append-only on-disk journal of transfer job backed by SQLite.
+
+    Job is planned into journal as list of items (directories and files
+    to transfer) before any data is sent. While job runs every item is
+    marked as in flight and then as done together with id of created
+    remote object, so if process dies job can be resumed: done items are
+    skipped and only items which were in flight are redone.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS items (
+            id INTEGER PRIMARY KEY,
+            kind TEXT NOT NULL,
+            source TEXT NOT NULL,
+            target TEXT,
+            parent INTEGER REFERENCES items(id),
+            name TEXT NOT NULL,
+            size INTEGER,
+            checksum TEXT,
+            state TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            remote_id TEXT
+        );
+        CREATE INDEX IF NOT EXISTS items_state ON items(state, id);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    def __init__(self, path=":memory:"):
+        """
+        Args:
+            path: Optional; journal file, by default journal is kept in
+             memory and can't be resumed.
+        """
+        self.path = path
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(self._SCHEMA)
+
+    @classmethod
+    def for_job(cls, *job, resume=False):
+        """
+        Open journal of job identified by `job` values (storage,
+        operation, source, destination). Unless `resume` is True journal
+        of previous run is discarded.
+        """
+        key = hashlib.sha1("\0".join(map(str, job)).encode()).hexdigest()
+        path = Path(JOURNALS_DIR, f"{key}.sqlite")
+        if not resume:
+            for suffix in ("", "-wal", "-shm"):
+                Path(f"{path}{suffix}").unlink(missing_ok=True)
+        return cls(path)
+
+    @property
+    def planned(self) -> bool:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM meta WHERE key = 'planned'").fetchone()
+        return row is not None
+
+    def set_planned(self) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('planned', '1')")
+
+    def clear(self) -> None:
+        """
+        Forget partially planned job.
+        """
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM items")
+            self._db.execute("DELETE FROM meta")
+
+    def add(
+            self,
+            kind: str,
+            source,
+            name: str,
+            parent: int = None,
+            target=None,
+            size: int = None,
+            checksum: str = None
+    ) -> int:
+        """
+        Plan new item. Items are transferred in order they were added,
+        so parent directories must be added before their content.
+
+        Returns:
+            Id of item.
+        """
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                "INSERT INTO items (kind, source, target, parent, name, size,"
+                " checksum) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (kind, str(source), None if target is None else str(target),
+                 parent, name, size, checksum)
+            )
+        return cursor.lastrowid
+
+    def resume(self) -> int:
+        """
+        Return items which were in flight when job was interrupted
+        to pending state.
+
+        Returns:
+            Number of items which will be redone.
+        """
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                "UPDATE items SET state = ? WHERE state = ?",
+                (PENDING, IN_FLIGHT)
+            )
+        return cursor.rowcount
+
+    def pending(self, kind: str = None):
+        """
+        Yields pending items (of `kind` if it's given) in planned order.
+        Items are fetched by small batches, so journal of any size can
+        be iterated.
+        """
+        last_id = 0
+        while True:
+            query = ("SELECT id, kind, source, target, parent, name, size,"
+                     " checksum, attempts FROM items"
+                     " WHERE state = ? AND id > ?")
+            params = [PENDING, last_id]
+            if kind is not None:
+                query += " AND kind = ?"
+                params.append(kind)
+            with self._lock:
+                rows = self._db.execute(
+                    query + " ORDER BY id LIMIT 1000", params).fetchall()
+            if not rows:
+                break
+            for row in rows:
+                yield Item(*row)
+            last_id = rows[-1][0]
+
+    def start(self, item_id: int) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE items SET state = ?, attempts = attempts + 1"
+                " WHERE id = ?",
+                (IN_FLIGHT, item_id)
+            )
+
+    def finish(self, item_id: int, remote_id=None) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE items SET state = ?, remote_id = ? WHERE id = ?",
+                (DONE, None if remote_id is None else str(remote_id),
+                 item_id)
+            )
+
+    def remote_id(self, item_id: int):
+        """
+        Returns id of remote object created for item.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT remote_id FROM items WHERE id = ?", (item_id,)
+            ).fetchone()
+        return row[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """
+        Journal of successfully completed job is removed, journal of
+        failed job is kept for `--resume`.
+        """
+        self.close()
+        if exc_type is None and self.path != ":memory:":
+            for suffix in ("", "-wal", "-shm"):
+                Path(f"{self.path}{suffix}").unlink(missing_ok=True)
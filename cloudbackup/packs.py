@@ -0,0 +1,199 @@
+import gzip
+import json
+import os
+import tarfile
+from collections import namedtuple
+from pathlib import Path
+
+from ._defaults import DOWNLOAD_CHUNK_SIZE, RANGE_MAX_GAP
+from .exceptions import ApiResponseException
+
+PACKS_DIR_NAME = ".packs"
+INDEX_NAME = "index.jsonl.gz"
+
+PackEntry = namedtuple("PackEntry", ["path", "pack", "offset", "length"])
+PackEntry.__doc__ = """
+Location of packed file: its data is `length` bytes at `offset` of pack
+object named `pack`. `path` is path of file relative to packed tree
+with '/' separators.
+"""
+
+
+Span = namedtuple("Span", ["pack", "start", "end", "entries"])
+Span.__doc__ = """
+Range of pack fetched by one request: bytes from `start` up to `end`
+(exclusive) containing data of `entries` sorted by offset.
+"""
+
+
+def _padded(size: int) -> int:
+    return -(-size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+
+
+class Pack:
+    """
+    Tar archive of small files which is uploaded as single object.
+
+    Size of archive and offsets of files in it are computed while files
+    are added, before anything is read, so archive can be streamed to
+    storage with Content-Length and index is known in advance. Archive
+    is plain tar, so it can be extracted by `tar` as well.
+    """
+
+    _FORMAT = tarfile.PAX_FORMAT
+    _ERRORS = "surrogateescape"
+
+    def __init__(self, name: str):
+        self.name = name
+        self._members = []
+        self._members_size = 0
+
+    def add(self, path: str, local_path: Path, stat: os.stat_result):
+        """
+        Returns:
+            PackEntry of added file.
+        """
+        info = tarfile.TarInfo(path)
+        info.size = stat.st_size
+        info.mtime = int(stat.st_mtime)
+        info.mode = stat.st_mode & 0o7777
+        header = len(info.tobuf(self._FORMAT, tarfile.ENCODING, self._ERRORS))
+        entry = PackEntry(
+            path, self.name, self._members_size + header, info.size)
+        self._members.append((info, local_path))
+        self._members_size += header + _padded(info.size)
+        return entry
+
+    @property
+    def content_size(self) -> int:
+        """
+        Size of added files with their headers.
+        """
+        return self._members_size
+
+    def __len__(self):
+        """
+        Size of archive: members, two zero blocks ending archive and
+        padding to whole record.
+        """
+        size = self._members_size + 2 * tarfile.BLOCKSIZE
+        return -(-size // tarfile.RECORDSIZE) * tarfile.RECORDSIZE
+
+    def __bool__(self):
+        return bool(self._members)
+
+    def write(self, fileobj) -> None:
+        """
+        Streams archive into `fileobj` which has only `write` method.
+
+        Raises:
+            OSError: if file became shorter since it was added.
+        """
+        with tarfile.open(
+                fileobj=fileobj,
+                mode="w|",
+                format=self._FORMAT,
+                errors=self._ERRORS,
+                bufsize=DOWNLOAD_CHUNK_SIZE
+        ) as tar:
+            for info, local_path in self._members:
+                with open(local_path, "rb") as file:
+                    tar.addfile(info, file)
+
+
+class PackIndex:
+    """
+    Index mapping paths of packed files to their PackEntry. Index is
+    stored as gzipped JSON lines, one short array per file.
+    """
+
+    def __init__(self, entries=()):
+        self._entries = {}
+        for entry in entries:
+            self.add(entry)
+
+    def add(self, entry: PackEntry) -> None:
+        self._entries[entry.path] = entry
+
+    def get(self, path: str):
+        """
+        Returns PackEntry of file or None if file isn't packed.
+        """
+        return self._entries.get(path)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries.values())
+
+    def dumps(self) -> bytes:
+        lines = (
+            json.dumps(list(entry)) + "\n"
+            for entry in self._entries.values()
+        )
+        return gzip.compress("".join(lines).encode())
+
+    @classmethod
+    def loads(cls, data: bytes) -> "PackIndex":
+        return cls(
+            PackEntry(*json.loads(line))
+            for line in gzip.decompress(data).decode().splitlines()
+        )
+
+
+def coalesce(entries, max_gap: int = RANGE_MAX_GAP) -> list:
+    """
+    Groups packed files into Spans. Files of the same pack which are
+    separated by less than `max_gap` bytes are fetched by one request,
+    bytes between them are skipped.
+    """
+    spans = []
+    by_pack = {}
+    for entry in entries:
+        by_pack.setdefault(entry.pack, []).append(entry)
+    for pack, pack_entries in sorted(by_pack.items()):
+        pack_entries.sort(key=lambda e: e.offset)
+        span = None
+        for entry in pack_entries:
+            end = entry.offset + entry.length
+            if span is not None and entry.offset - span.end <= max_gap:
+                span.entries.append(entry)
+                span = span._replace(end=max(span.end, end))
+                spans[-1] = span
+            else:
+                span = Span(pack, entry.offset, end, [entry])
+                spans.append(span)
+    return spans
+
+
+def extract_span(chunks, span: Span, open_file) -> None:
+    """
+    Writes data of every file of `span` read from `chunks` of span
+    content into file object returned by `open_file(entry)`.
+
+    Raises:
+        ApiResponseException: if range of pack returned by storage is
+         shorter than span.
+    """
+    position = span.start
+    chunks = iter(chunks)
+    view = memoryview(b"")
+    for entry in span.entries:
+        with open_file(entry) as file:
+            end = entry.offset + entry.length
+            while position < end:
+                if not view:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        raise ApiResponseException(
+                            206, f"Range of `{span.pack}` ended before"
+                                 f" `{entry.path}`.")
+                    view = memoryview(chunk)
+                if position < entry.offset:
+                    skip = min(entry.offset - position, len(view))
+                else:
+                    skip = min(end - position, len(view))
+                    file.write(view[:skip])
+                view = view[skip:]
+                position += skip
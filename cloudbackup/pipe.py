@@ -0,0 +1,109 @@
+import hashlib
+import queue
+
+from ._defaults import PIPE_MAX_CHUNKS
+
+
+class Pipe:
+    """
+    Bounded buffer connecting producer of chunks (e.g. download stream)
+    with HTTP client reading request body from file object.
+
+    At most `max_chunks` chunks are buffered, so producer is paused
+    while consumer is slower and nothing is spooled to disk. `__len__`
+    lets HTTP client send Content-Length, so size of streamed data must
+    be known in advance. md5 of data read by consumer is computed on the
+    way.
+    """
+
+    _EOF = object()
+    # how often blocked producer checks if consumer gave up, seconds
+    _POLL_INTERVAL = 0.1
+
+    def __init__(self, size: int, max_chunks: int = PIPE_MAX_CHUNKS):
+        self._size = size
+        self._queue = queue.Queue(max_chunks)
+        self._chunk = memoryview(b"")
+        self._eof = False
+        self._aborted = False
+        self._md5 = hashlib.md5()
+
+    def __len__(self):
+        return self._size
+
+    def write(self, chunk: bytes) -> None:
+        """
+        Puts chunk into buffer waiting while buffer is full.
+
+        Raises:
+            BrokenPipeError: if consumer aborted reading.
+        """
+        self._put(chunk)
+
+    def close(self, error: BaseException = None) -> None:
+        """
+        Signals end of data or, if `error` is given, that producer failed,
+        then `error` is raised to consumer.
+        """
+        try:
+            self._put(self._EOF if error is None else error)
+        except BrokenPipeError:
+            pass
+
+    def _put(self, item) -> None:
+        while True:
+            if self._aborted:
+                raise BrokenPipeError("Consumer stopped reading.")
+            try:
+                self._queue.put(item, timeout=self._POLL_INTERVAL)
+                return
+            except queue.Full:
+                continue
+
+    def pump(self, chunks) -> None:
+        """
+        Writes all `chunks` to pipe and closes it. Intended to be run by
+        producer thread.
+        """
+        try:
+            for chunk in chunks:
+                self.write(chunk)
+        except BaseException as e:
+            self.close(e)
+        else:
+            self.close()
+
+    def abort(self) -> None:
+        """
+        Called by consumer to release producer if it stops reading.
+        """
+        self._aborted = True
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0:
+            return b"".join(iter(lambda: self.read(len(self)), b""))
+        while not self._chunk:
+            if self._eof:
+                return b""
+            item = self._queue.get()
+            if item is self._EOF:
+                self._eof = True
+                return b""
+            if isinstance(item, BaseException):
+                self._eof = True
+                raise item
+            self._chunk = memoryview(item)
+        if size >= len(self._chunk):
+            data = bytes(self._chunk)
+            self._chunk = memoryview(b"")
+        else:
+            data = bytes(self._chunk[:size])
+            self._chunk = self._chunk[size:]
+        self._md5.update(data)
+        return data
+
+    def md5(self) -> str:
+        """
+        Returns md5 of data read so far.
+        """
+        return self._md5.hexdigest()
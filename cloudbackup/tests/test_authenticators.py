@@ -1,16 +1,29 @@
 import datetime
+import threading
+import time
 import pytest
 import pickle
 from callee import Contains
 from cloudbackup._defaults import (TEST_GOOGLE_TOKEN_PATH,
                                    TEST_YANDEX_TOKEN_PATH)
-from cloudbackup._authenticator import Authenticator
+from cloudbackup._authenticator import Authenticator, TokenProvider
+from cloudbackup.exceptions import ApiResponseException
 from pathlib import Path
 from unittest.mock import Mock
 
 
 @pytest.fixture()
-def auth():
+def auth(monkeypatch):
+    """
+    Credentials of OAuth applications aren't kept in repository, so
+    placeholders are read instead.
+    """
+    monkeypatch.setattr(
+        Authenticator, "_read_gdrive_credentials",
+        lambda self: {"installed": {"client_id": "x", "client_secret": "y"}})
+    monkeypatch.setattr(
+        Authenticator, "_read_yadisk_credentials",
+        lambda self: {"client_id": "x", "client_secret": "y"})
     yield Authenticator()
     g_token_path = Path(TEST_GOOGLE_TOKEN_PATH)
     y_token_path = Path(TEST_YANDEX_TOKEN_PATH)
@@ -171,6 +184,115 @@ def test_yadisk_token_extracting_correctly_from_dump(auth):
     assert access_token == token_data_in_file["access_token"]
 
 
+def test_yadisk_token_is_refreshed(auth):
+    expired_token_data = {
+        "access_token": "very_secret_access_token",
+        "refresh_token": "some_refresh_token",
+        "expire_time": datetime.datetime.now() - datetime.timedelta(0, 100)
+    }
+    with open(TEST_YANDEX_TOKEN_PATH, "wb") as f:
+        pickle.dump(expired_token_data, f)
+    updated_token_data = {
+        "access_token": "another_secret_access_token",
+        "refresh_token": "another_refresh_token",
+        "expires_in": 31466940
+    }
+    auth._read_yadisk_credentials = Mock(
+        return_value={"client_id": "id", "client_secret": "secret"})
+    auth._get_yadisk_tokens_from_api = Mock(return_value=updated_token_data)
+    access_token = auth.get_yadisk_token(TEST_YANDEX_TOKEN_PATH)
+    get_tokens_args = auth._get_yadisk_tokens_from_api.call_args.args[0]
+    assert get_tokens_args["grant_type"] == "refresh_token"
+    assert get_tokens_args["refresh_token"] == "some_refresh_token"
+    assert access_token == "another_secret_access_token"
+    check_dump_token_data(updated_token_data, TEST_YANDEX_TOKEN_PATH)
+
+
+def test_revoked_refresh_token_removes_token_file(auth):
+    expired_token_data = {
+        "access_token": "very_secret_access_token",
+        "refresh_token": "revoked_refresh_token",
+        "expire_time": datetime.datetime.now() - datetime.timedelta(0, 100)
+    }
+    with open(TEST_GOOGLE_TOKEN_PATH, "wb") as f:
+        pickle.dump(expired_token_data, f)
+    auth._get_gdrive_tokens_from_api = Mock(return_value={
+        "error": "invalid_grant",
+        "error_description": "Token has been expired or revoked."
+    })
+    with pytest.raises(ApiResponseException) as e:
+        auth.get_gdrive_token(TEST_GOOGLE_TOKEN_PATH)
+    assert "Token has been expired or revoked." in e.value.message
+    assert "Run command again" in e.value.message
+    assert not Path(TEST_GOOGLE_TOKEN_PATH).exists()
+
+
+def test_token_endpoint_error_is_reported(auth):
+    auth._client_socket = Mock()
+    auth._handle_user_prompt = Mock(return_value="7905534")
+    auth._get_yadisk_tokens_from_api = Mock(
+        return_value={"error": "invalid_client"})
+    with pytest.raises(ApiResponseException) as e:
+        auth.get_yadisk_token(TEST_YANDEX_TOKEN_PATH)
+    assert e.value.message == "YaDisk authorization failed: invalid_client."
+    assert not Path(TEST_YANDEX_TOKEN_PATH).exists()
+
+
+def _token_data(access_token, expires_in):
+    return {
+        "access_token": access_token,
+        "refresh_token": "refresh_token",
+        "expire_time": (datetime.datetime.now()
+                        + datetime.timedelta(0, expires_in))
+    }
+
+
+def test_token_provider_loads_token_once():
+    load = Mock(return_value=_token_data("token", 3600))
+    provider = TokenProvider(load, Mock())
+    assert [provider.token() for _ in range(3)] == ["token"] * 3
+    load.assert_called_once_with()
+    provider.close()
+
+
+def test_token_provider_coalesces_concurrent_refreshes():
+    load = Mock(return_value=_token_data("expired", -10))
+
+    def refresh(token_data):
+        time.sleep(0.05)
+        return _token_data("fresh", 3600)
+
+    refresh = Mock(side_effect=refresh)
+    provider = TokenProvider(load, refresh)
+    provider._token_data = load()
+    tokens = []
+    threads = [
+        threading.Thread(target=lambda: tokens.append(provider.token()))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert tokens == ["fresh"] * 5
+    refresh.assert_called_once()
+    provider.close()
+
+
+def test_token_provider_refreshes_token_in_background():
+    refreshed = threading.Event()
+
+    def refresh(token_data):
+        refreshed.set()
+        return _token_data("fresh", 3600)
+
+    provider = TokenProvider(lambda: _token_data("old", 0.5), refresh)
+    assert provider.token() == "old"
+    assert refreshed.wait(5)
+    assert provider.token() == "fresh"
+    provider.close()
+
+
 def check_dump_token_data(test_data, filename):
     with open(filename, "rb") as f:
         actual_data = pickle.load(f)
@@ -0,0 +1,57 @@
+import pytest
+from cloudbackup.catalog import SnapshotCatalog
+
+
+def make_snapshot(catalog, name, complete=True):
+    snapshot = catalog.begin("disk:/backups", name, f"disk:/backups/{name}",
+                             "/home/user")
+    catalog.add_file(snapshot, ("dir", "a.txt"), 5, 1.5)
+    catalog.set_remote(snapshot, ("dir", "a.txt"),
+                       f"disk:/backups/{name}/dir/a.txt", "md5")
+    if complete:
+        catalog.complete(snapshot)
+    return snapshot
+
+
+def test_only_completed_snapshots_are_listed():
+    catalog = SnapshotCatalog("yadisk", ":memory:")
+    assert catalog.latest("disk:/backups") is None
+    make_snapshot(catalog, "2026-10-16")
+    make_snapshot(catalog, "2026-10-17", complete=False)
+    snapshots = catalog.snapshots("disk:/backups")
+    assert [s.name for s in snapshots] == ["2026-10-16"]
+    assert (snapshots[0].files, snapshots[0].size) == (1, 5)
+    assert catalog.latest("disk:/backups").name == "2026-10-16"
+    assert catalog.snapshots("disk:/other") == []
+    with pytest.raises(FileNotFoundError):
+        catalog.find("disk:/backups", "2026-10-17")
+
+
+def test_file_lookup_by_path():
+    catalog = SnapshotCatalog("yadisk", ":memory:")
+    snapshot = make_snapshot(catalog, "2026-10-16")
+    file = catalog.file(snapshot, ("dir", "a.txt"))
+    assert file.remote_id == "disk:/backups/2026-10-16/dir/a.txt"
+    assert (file.size, file.mtime, file.md5) == (5, 1.5, "md5")
+    assert catalog.file(snapshot, ("a.txt",)) is None
+
+
+def test_begin_replaces_incomplete_snapshot_but_not_completed_one():
+    catalog = SnapshotCatalog("yadisk", ":memory:")
+    make_snapshot(catalog, "2026-10-16", complete=False)
+    snapshot = make_snapshot(catalog, "2026-10-16")
+    assert catalog.find("disk:/backups", "2026-10-16").id == snapshot
+    with pytest.raises(FileExistsError):
+        make_snapshot(catalog, "2026-10-16")
+
+
+def test_incomplete_snapshot_and_its_files():
+    catalog = SnapshotCatalog("yadisk", ":memory:")
+    snapshot = make_snapshot(catalog, "2026-10-16", complete=False)
+    catalog.add_file(snapshot, ("b.txt",), 1, 2.0)
+    assert (catalog.incomplete("disk:/backups", "2026-10-16")
+            == "disk:/backups/2026-10-16")
+    assert [f.path for f in catalog.files(snapshot)] == ["b.txt", "dir/a.txt"]
+    catalog.complete(snapshot)
+    assert catalog.incomplete("disk:/backups", "2026-10-16") is None
+    assert catalog.incomplete("disk:/backups", "2026-10-17") is None
@@ -0,0 +1,71 @@
+import hashlib
+import io
+import random
+import pytest
+from cloudbackup.chunking import ChunkedFile, Chunker, Manifest
+
+
+def sample(size, seed=1):
+    return random.Random(seed).randbytes(size)
+
+
+def digests(chunker, data):
+    return [hashlib.sha256(chunk).digest()
+            for chunk in chunker.split(io.BytesIO(data))]
+
+
+def test_chunks_are_between_min_and_max_size():
+    chunker = Chunker(min_size=256, average_size=1024, max_size=4096)
+    data = sample(200000)
+    chunks = list(chunker.split(io.BytesIO(data)))
+    assert b"".join(chunks) == data
+    assert all(256 <= len(chunk) <= 4096 for chunk in chunks[:-1])
+    assert 20 < len(chunks) < 300
+
+
+def test_boundaries_follow_content_after_insertion():
+    chunker = Chunker(min_size=256, average_size=1024, max_size=4096)
+    data = sample(200000)
+    changed = data[:100000] + b"inserted" + data[100000:]
+    before = set(digests(chunker, data))
+    after = digests(chunker, changed)
+    assert len([d for d in after if d not in before]) <= 2
+
+
+def test_text_is_cut_by_content():
+    chunker = Chunker(min_size=256, average_size=1024, max_size=4096)
+    lines = random.Random(2)
+    data = b"".join(
+        b"2026-10-19 INFO request %d done in %d ms\n"
+        % (lines.randrange(10 ** 6), lines.randrange(1000))
+        for _ in range(5000)
+    )
+    chunks = list(chunker.split(io.BytesIO(data)))
+    assert sum(len(chunk) == 4096 for chunk in chunks) < len(chunks) // 10
+
+
+def test_small_and_empty_files():
+    chunker = Chunker(min_size=256, average_size=1024, max_size=4096)
+    assert list(chunker.split(io.BytesIO(b""))) == []
+    assert list(chunker.split(io.BytesIO(b"tiny"))) == [b"tiny"]
+    assert [len(c) for c in chunker.split(io.BytesIO(bytes(9000)))] == [
+        4096, 4096, 808]
+
+
+@pytest.mark.parametrize("sizes", [(256, 1000, 4096), (16, 1024, 4096),
+                                   (8192, 1024, 4096)])
+def test_invalid_sizes(sizes):
+    with pytest.raises(ValueError):
+        Chunker(*sizes)
+
+
+def test_manifest_roundtrip():
+    manifest = Manifest([
+        ChunkedFile("a/b.bin", 7, 1760000000.25, [["ab" * 32, 7]]),
+        ChunkedFile("empty", 0, 1760000000.0, []),
+    ])
+    loaded = Manifest.loads(manifest.dumps())
+    assert list(loaded) == list(manifest)
+    assert loaded.size == 7
+    assert loaded.get("empty").chunks == []
+    assert loaded.get("missing") is None
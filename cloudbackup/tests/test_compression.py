@@ -0,0 +1,61 @@
+import gzip
+import os
+import pytest
+from cloudbackup.compression import (
+    GZIP,
+    Compressor,
+    codec_of,
+    decompress,
+    entropy,
+    is_compressible
+)
+
+
+def test_entropy():
+    assert entropy(b"") == 0
+    assert entropy(b"aaaa") == 0
+    assert entropy(bytes(range(256)) * 4) == 8
+
+
+def test_is_compressible(tmp_path):
+    text = tmp_path / "dump.sql"
+    text.write_bytes(b"INSERT INTO t VALUES (1, 'abc');\n" * 1000)
+    random = tmp_path / "random.bin"
+    random.write_bytes(os.urandom(100000))
+    photo = tmp_path / "photo.jpg"
+    photo.write_bytes(text.read_bytes())
+    archive = tmp_path / "logs.tar.gz"
+    archive.write_bytes(text.read_bytes())
+    tiny = tmp_path / "tiny.txt"
+    tiny.write_bytes(b"abc")
+    assert is_compressible(text)
+    assert not is_compressible(random)
+    assert not is_compressible(photo)
+    assert not is_compressible(archive)
+    assert not is_compressible(tiny)
+
+
+def test_codec_of():
+    assert codec_of("dump.sql.cb.gz") == ("dump.sql", GZIP)
+    assert codec_of("logs.tar.gz") == ("logs.tar.gz", None)
+
+
+def test_blocks_are_compressed_in_parallel_into_valid_stream(tmp_path):
+    content = b"".join(b"line %d\n" % i for i in range(3000))
+    local = tmp_path / "log.txt"
+    local.write_bytes(content)
+    blocks = [content[i:i + 1000] for i in range(0, len(content), 1000)]
+    with Compressor(GZIP, workers=2) as compressor:
+        assert compressor.remote_name(local, "log.txt") == "log.txt.cb.gz"
+        chunks = list(compressor.compress(blocks))
+    compressed = b"".join(chunks)
+    assert len(chunks) == len(blocks)
+    assert gzip.decompress(compressed) == content
+    pieces = [compressed[i:i + 100] for i in range(0, len(compressed), 100)]
+    assert b"".join(decompress(pieces, GZIP)) == content
+
+
+def test_decompress_raises_if_content_is_truncated():
+    compressed = GZIP.compress(b"abc" * 100)
+    with pytest.raises(EOFError):
+        list(decompress([compressed[:-4]], GZIP))
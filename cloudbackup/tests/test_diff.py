@@ -0,0 +1,86 @@
+import hashlib
+import os
+from cloudbackup.diff import (
+    ADDED,
+    CHANGED_CHECKSUM,
+    CHANGED_MTIME,
+    CHANGED_SIZE,
+    REMOVED,
+    Entry,
+    diff_trees,
+    md5sum,
+    walk_local
+)
+
+
+def _file(path, size=1, modified=100.0, md5=None):
+    return Entry(tuple(path.split("/")), "file", size, modified, md5, path)
+
+
+def _dir(path):
+    return Entry(tuple(path.split("/")), "dir", None, None, None, path)
+
+
+def test_walk_local_yields_entries_sorted_by_path(tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "b.txt").write_bytes(b"123")
+    (tmp_path / "a-c.txt").touch()
+    (tmp_path / "0.txt").touch()
+    entries = list(walk_local(tmp_path))
+    assert [e.path for e in entries] == [
+        ("0.txt",), ("a",), ("a", "b.txt"), ("a-c.txt",)
+    ]
+    assert entries == sorted(entries, key=lambda e: e.path)
+    assert entries[2].size == 3
+    assert entries[2].id == tmp_path / "a" / "b.txt"
+
+
+def test_diff_classifies_entries():
+    local = [
+        _dir("a"),
+        _file("a/new.txt"),
+        _file("a/same.txt"),
+        _file("newer.txt", modified=200.0),
+        _file("resized.txt", size=2),
+    ]
+    remote = [
+        _dir("a"),
+        _file("a/same.txt"),
+        _dir("gone"),
+        _file("gone/file.txt"),
+        _file("newer.txt"),
+        _file("resized.txt"),
+    ]
+    changes = [(c.kind, "/".join(c.path)) for c in diff_trees(local, remote)]
+    assert changes == [
+        (ADDED, "a/new.txt"),
+        (REMOVED, "gone"),
+        (REMOVED, "gone/file.txt"),
+        (CHANGED_MTIME, "newer.txt"),
+        (CHANGED_SIZE, "resized.txt"),
+    ]
+
+
+def test_diff_reports_type_change_as_removed_and_added():
+    changes = list(diff_trees([_file("x")], [_dir("x"), _file("x/y")]))
+    assert [(c.kind, c.path) for c in changes] == [
+        (REMOVED, ("x",)), (ADDED, ("x",)), (REMOVED, ("x", "y"))
+    ]
+
+
+def test_diff_with_checksum_ignores_mtime():
+    local = [_file("a", modified=200.0), _file("b", modified=200.0)]
+    remote = [_file("a", md5="a_md5"), _file("b", md5="old_md5")]
+    hashes = {"a": "a_md5", "b": "b_md5"}
+    changes = list(
+        diff_trees(local, remote, checksum=True, hasher=hashes.get))
+    assert [(c.kind, c.path) for c in changes] == [
+        (CHANGED_CHECKSUM, ("b",))
+    ]
+
+
+def test_md5sum(tmp_path):
+    file = tmp_path / "file"
+    data = os.urandom(3 * 1024 * 1024 + 7)
+    file.write_bytes(data)
+    assert md5sum(file) == hashlib.md5(data).hexdigest()
@@ -0,0 +1,65 @@
+import os
+import stat
+import pytest
+from cloudbackup.exceptions import DecryptionException, EncryptionKeyException
+
+pytest.importorskip("cryptography")
+
+from cloudbackup.encryption import (  # noqa: E402
+    HEADER_SIZE,
+    Cipher,
+    create_key,
+    load_key
+)
+
+
+@pytest.fixture()
+def cipher():
+    return Cipher(os.urandom(32), chunk_size=100)
+
+
+def _pieces(data: bytes, size: int) -> list:
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("size", [0, 1, 99, 100, 101, 350])
+def test_round_trip(cipher, size):
+    data = os.urandom(size)
+    encrypted = b"".join(cipher.encrypt(_pieces(data, 7)))
+    assert len(encrypted) == cipher.encrypted_size(size)
+    assert b"".join(cipher.decrypt(_pieces(encrypted, 13))) == data
+
+
+def test_every_stream_has_own_key(cipher):
+    data = b"x" * 150
+    first = b"".join(cipher.encrypt([data]))
+    second = b"".join(cipher.encrypt([data]))
+    assert first[HEADER_SIZE:] != second[HEADER_SIZE:]
+
+
+@pytest.mark.parametrize("cut", [HEADER_SIZE, HEADER_SIZE + 116, -1])
+def test_truncated_stream_is_rejected(cipher, cut):
+    encrypted = b"".join(cipher.encrypt([os.urandom(250)]))
+    with pytest.raises(DecryptionException):
+        list(cipher.decrypt([encrypted[:cut]]))
+
+
+def test_tampered_stream_and_wrong_key_are_rejected(cipher):
+    encrypted = bytearray(b"".join(cipher.encrypt([b"secret" * 10])))
+    with pytest.raises(DecryptionException):
+        list(Cipher(os.urandom(32)).decrypt([bytes(encrypted)]))
+    encrypted[-1] ^= 1
+    with pytest.raises(DecryptionException):
+        list(cipher.decrypt([bytes(encrypted)]))
+
+
+def test_key_file(tmp_path):
+    path = tmp_path / "keys" / "encryption.key"
+    create_key(path)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert len(load_key(path)) == 32
+    with pytest.raises(FileExistsError):
+        create_key(path)
+    path.write_text("not a key")
+    with pytest.raises(EncryptionKeyException):
+        load_key(path)
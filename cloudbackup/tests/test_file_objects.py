@@ -0,0 +1,92 @@
+import tracemalloc
+import pytest
+from cloudbackup.file_objects import FileListing, GDriveFile, YaDiskFile
+from cloudbackup.tests._gdrive_api_responses import FULL_LISTED_LSDIR_RESPONSE
+from cloudbackup.tests._yadisk_api_responses import LIST_FILES_RESPONSE
+
+
+def test_file_objects_have_no_dict():
+    file = GDriveFile(FULL_LISTED_LSDIR_RESPONSE["files"][0])
+    assert not hasattr(file, "__dict__")
+    with pytest.raises(AttributeError):
+        file.unknown_attribute = 1
+
+
+def test_files_are_compared_by_values():
+    meta_inf = LIST_FILES_RESPONSE["items"][0]
+    assert YaDiskFile(meta_inf) == YaDiskFile(meta_inf)
+    assert YaDiskFile(meta_inf) != YaDiskFile(LIST_FILES_RESPONSE["items"][1])
+    assert len({YaDiskFile(meta_inf), YaDiskFile(meta_inf)}) == 1
+
+
+def test_listing_keeps_files_unchanged():
+    files = [YaDiskFile(meta_inf) for meta_inf in LIST_FILES_RESPONSE["items"]]
+    listing = FileListing(files)
+    assert len(listing) == 2
+    assert list(listing) == files
+    assert listing[-1] == files[1]
+    assert listing[0].md5 == "bc35c9315eb5ae423fa92d0b5f0c46b7"
+    assert listing[0].size == 383289
+    assert [listing.name(i) for i in range(len(listing))] == [
+        file.name for file in files]
+    assert [
+        (listing.type(i), listing.id(i), listing.size(i),
+         listing.modified(i), listing.md5(i))
+        for i in range(len(listing))
+    ] == [
+        (file.type, file.id, file.size, file.modified, file.md5)
+        for file in files
+    ]
+
+
+def test_listing_keeps_gdrive_specific_fields():
+    meta_inf = dict(FULL_LISTED_LSDIR_RESPONSE["files"][0])
+    meta_inf["parents"] = ["root"]
+    file = GDriveFile(meta_inf)
+    listing = FileListing([file])
+    assert listing[0] == file
+    assert listing[0].parents == ("root",)
+    assert listing[0].size is None
+
+
+def test_listing_rejects_files_of_different_storages():
+    listing = FileListing(
+        [GDriveFile(FULL_LISTED_LSDIR_RESPONSE["files"][0])]
+    )
+    with pytest.raises(TypeError):
+        listing.append(YaDiskFile(LIST_FILES_RESPONSE["items"][0]))
+
+
+def yadisk_file(index):
+    name = f"file_{index:05}.txt"
+    return YaDiskFile({
+        "name": name, "type": "file", "path": f"disk:/backup/{name}",
+        "size": index, "modified": "2020-01-01T00:00:00+00:00",
+        "md5": "bc35c9315eb5ae423fa92d0b5f0c46b7"
+    })
+
+
+def gdrive_file(index):
+    return GDriveFile({
+        "name": f"file_{index:05}.txt", "mimeType": "text/plain",
+        "id": f"1AbCdEfGhIjKlMnOpQrStUvWxYz{index:06}",
+        "size": str(index), "modifiedTime": "2020-01-01T00:00:00Z",
+        "md5Checksum": "bc35c9315eb5ae423fa92d0b5f0c46b7",
+        "parents": [f"1ParentFolderIdAbCdEfGhIjKlMn{index % 50:03}"]
+    })
+
+
+@pytest.mark.parametrize("make_file, max_entry_size", [
+    (yadisk_file, 96),
+    (gdrive_file, 160),
+])
+def test_listing_entry_size(make_file, max_entry_size):
+    files = [make_file(index) for index in range(10000)]
+    tracemalloc.start()
+    try:
+        listing = FileListing(files)
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    assert size / len(listing) < max_entry_size
+    assert listing[-1] == files[-1]
@@ -12,20 +12,43 @@ from cloudbackup.tests._gdrive_api_responses import (
 )
 from pathlib import Path
 
+UPLOADED_FILE_FIELDS = urlencode({"fields": "id, md5Checksum"})
+
 
 @pytest.fixture()
 def gdrive():
-    with patch("cloudbackup.gdrive.Authenticator") as MockAuth:
-        auth = MockAuth.return_value
-        auth.get_gdrive_token.return_value = Mock()
+    with patch("cloudbackup.gdrive.TokenProvider") as MockProvider:
+        provider = MockProvider.for_gdrive.return_value
+        provider.token.return_value = str(Mock())
         yield GDrive()
 
 
+def test_token_is_not_loaded_until_first_request():
+    with patch("cloudbackup.gdrive.TokenProvider") as MockProvider:
+        GDrive()
+        MockProvider.for_gdrive.return_value.token.assert_not_called()
+
+
 def check_auth_headers(headers):
     assert "Authorization" in headers
     assert "Bearer " in headers["Authorization"]
 
 
+@responses.activate
+def test_copy(gdrive):
+    responses.add(
+        responses.POST,
+        "https://www.googleapis.com/drive/v3/files/file_id/copy?fields=id",
+        json={"id": "copy_id"},
+        match_querystring=True
+    )
+    assert gdrive.copy("file_id", "foo.txt", "folder_id") == "copy_id"
+    check_auth_headers(responses.calls[0].request.headers)
+    assert json.loads(responses.calls[0].request.body) == {
+        "name": "foo.txt", "parents": ["folder_id"]
+    }
+
+
 @responses.activate
 def test_mkdir(gdrive):
     def request_callback(request):
@@ -79,6 +102,37 @@ def test_remove_permanently(gdrive):
     check_auth_headers(responses.calls[0].request.headers)
 
 
+@responses.activate
+def test_remove_batch_returns_errors_of_failed_files(gdrive):
+    body = (
+        "--batch_resp\r\n"
+        "Content-Type: application/http\r\n"
+        "Content-ID: <response-0>\r\n\r\n"
+        "HTTP/1.1 204 No Content\r\n\r\n\r\n"
+        "--batch_resp\r\n"
+        "Content-Type: application/http\r\n"
+        "Content-ID: <response-1>\r\n\r\n"
+        "HTTP/1.1 404 Not Found\r\n"
+        "Content-Type: application/json; charset=UTF-8\r\n\r\n"
+        '{"error": {"code": 404, "message": "File not found: 2."}}\r\n'
+        "--batch_resp--\r\n"
+    )
+    responses.add(
+        responses.POST,
+        "https://www.googleapis.com/batch/drive/v3",
+        body=body,
+        content_type="multipart/mixed; boundary=batch_resp"
+    )
+    failed = gdrive.remove_batch(["1", "2"], permanently=True)
+    assert list(failed) == ["2"]
+    assert failed["2"].status_code == 404
+    request = responses.calls[0].request
+    check_auth_headers(request.headers)
+    assert request.headers["Content-Type"].startswith("multipart/mixed")
+    assert "DELETE /drive/v3/files/1 HTTP/1.1" in request.body
+    assert "DELETE /drive/v3/files/2 HTTP/1.1" in request.body
+
+
 @responses.activate
 def test_non_dir_id_in_lsdir_query(gdrive):
     url_params = {
@@ -220,6 +274,50 @@ def test_lsdir_returns_page(gdrive):
     assert other_page.next_page_token == "some_next_page_token"
 
 
+@responses.activate
+def test_lsdir_requests_extra_fields(gdrive):
+    url_params = {
+        "orderBy": "modifiedTime",
+        "fields": "files(name, mimeType, id, size, md5Checksum),"
+                  " nextPageToken",
+        "pageSize": "20",
+        "q": "trashed=False",
+    }
+    responses.add(
+        responses.GET,
+        url=f"https://www.googleapis.com/drive/v3/files?"
+            f"{urlencode(url_params)}",
+        content_type="application/json",
+        match_querystring=True,
+        body=json.dumps(FULL_LISTED_LSDIR_RESPONSE)
+    )
+    gdrive.lsdir(extra_fields=("size", "md5Checksum", "id"))
+    assert responses.calls[0].request.params == url_params
+    assert responses.calls[0].request.headers["Accept-Encoding"] == "gzip"
+
+
+@responses.activate
+def test_get_file_requests_only_needed_fields(gdrive):
+    responses.add(
+        responses.GET,
+        url="https://www.googleapis.com/drive/v3/files/1",
+        content_type="application/json",
+        json={
+            "id": "1",
+            "name": "first_file.pdf",
+            "mimeType": "application/pdf",
+            "size": "383289",
+            "modifiedTime": "2020-11-29T04:44:54.000Z",
+        }
+    )
+    file = gdrive.get_file("1", extra_fields=("size", "modifiedTime"))
+    assert responses.calls[0].request.params == {
+        "fields": "name, mimeType, id, size, modifiedTime"
+    }
+    assert file.size == 383289
+    assert file.modified == 1606625094.0
+
+
 def _check_namedtuple_instance(obj, fields):
     assert isinstance(obj, tuple)
     assert hasattr(obj, "_fields")
@@ -245,12 +343,27 @@ def test_download(gdrive):
     assert result == responses.calls[0].response.content
 
 
+@responses.activate
+def test_download_stream_yields_chunks(gdrive):
+    responses.add(
+        responses.GET,
+        url="https://www.googleapis.com/drive/v3/files/1?alt=media",
+        match_querystring=True,
+        body="one two three\n",
+    )
+    chunks = list(gdrive.download_stream("1", chunk_size=4))
+    assert len(responses.calls) == 1
+    check_auth_headers(responses.calls[0].request.headers)
+    assert chunks[0] == b"one "
+    assert b"".join(chunks) == b"one two three\n"
+
+
 @responses.activate
 def test_get_upload_link(gdrive):
     responses.add(
         responses.POST,
         url="https://www.googleapis.com/upload/drive/v3/files?"
-            "uploadType=resumable",
+            f"uploadType=resumable&{UPLOADED_FILE_FIELDS}",
         content_type="application/json",
         headers={"Location": "https://www.googleapis.com/upload/drive/v3/"
                              "files?uploadType=resumable&upload_id=some_id"}
@@ -282,3 +395,35 @@ def test_upload_file(gdrive):
     assert len(responses.calls) == 1
     assert responses.calls[0].request.url == upload_link
     assert responses.calls[0].request.body == b"tests"
+
+
+@responses.activate
+def test_upload_file_returns_md5_of_stored_content(gdrive):
+    upload_link = "https://www.googleapis.com/upload/drive/v3/" \
+                  "files?uploadType=resumable&upload_id=1"
+    responses.add(
+        responses.PUT,
+        url=upload_link,
+        json={"id": "1", "md5Checksum": "d41d8cd98f00b204e9800998ecf8427e"}
+    )
+    md5 = gdrive.upload_file(upload_link, b"")
+    assert md5 == "d41d8cd98f00b204e9800998ecf8427e"
+    assert gdrive.upload(upload_link, b"") == {
+        "id": "1", "md5Checksum": "d41d8cd98f00b204e9800998ecf8427e"}
+
+
+@responses.activate
+def test_get_update_link(gdrive):
+    responses.add(
+        responses.PATCH,
+        url="https://www.googleapis.com/upload/drive/v3/files/1?"
+            f"uploadType=resumable&{UPLOADED_FILE_FIELDS}",
+        content_type="application/json",
+        headers={"Location": "https://www.googleapis.com/upload/drive/v3/"
+                             "files/1?uploadType=resumable&upload_id=id"}
+    )
+    link = gdrive.get_update_link("1", Path("_gdrive_api_responses.py"))
+    assert len(responses.calls) == 1
+    check_auth_headers(responses.calls[0].request.headers)
+    assert "X-Upload-Content-Type" in responses.calls[0].request.headers
+    assert link == responses.calls[0].response.headers["Location"]
@@ -0,0 +1,61 @@
+import hashlib
+import os
+from unittest.mock import patch
+from cloudbackup import hashing
+from cloudbackup.diff import Entry
+from cloudbackup.hashing import HashCache, HashPool, hash_file
+
+
+def test_hash_file_computes_md5_and_sha256_by_one_pass(tmp_path):
+    data = os.urandom(3000)
+    path = tmp_path / "file.bin"
+    path.write_bytes(data)
+    digests = hash_file(path, block_size=1024)
+    assert digests.md5 == hashlib.md5(data).hexdigest()
+    assert digests.sha256 == hashlib.sha256(data).hexdigest()
+
+
+def test_cached_files_are_not_read_again(tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_bytes(b"cached")
+    cache = HashCache(tmp_path / "cache.sqlite")
+    with HashPool(cache=cache) as pool:
+        digests = pool.digests(path)
+    with patch.object(hashing, "hash_file") as hash_file_mock:
+        with HashPool(cache=HashCache(tmp_path / "cache.sqlite")) as pool:
+            assert pool.digests(path) == digests
+        hash_file_mock.assert_not_called()
+
+
+def test_modified_files_are_hashed_again(tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_bytes(b"before")
+    with HashPool(cache=HashCache(":memory:")) as pool:
+        pool.digests(path)
+        path.write_bytes(b"after!")
+        os.utime(path, ns=(0, 10 ** 9))
+        assert pool.md5(path) == hashlib.md5(b"after!").hexdigest()
+
+
+def test_map_keeps_order_of_paths(tmp_path):
+    paths = []
+    for i in range(10):
+        paths.append(tmp_path / f"{i}.txt")
+        paths[-1].write_bytes(str(i).encode())
+    with HashPool(workers=3) as pool:
+        result = list(pool.map(paths, window=2))
+    assert [path for path, _ in result] == paths
+    assert [digests.md5 for _, digests in result] == [
+        hashlib.md5(str(i).encode()).hexdigest() for i in range(10)
+    ]
+
+
+def test_prefetch_passes_entries_through(tmp_path):
+    (tmp_path / "a.txt").write_bytes(b"a")
+    entries = [
+        Entry(("a.txt",), "file", 1, 0.0, None, tmp_path / "a.txt"),
+        Entry(("b",), "dir", None, None, None, tmp_path / "b"),
+    ]
+    with HashPool() as pool:
+        assert list(pool.prefetch(entries, window=1)) == entries
+        assert pool.md5(tmp_path / "a.txt") == hashlib.md5(b"a").hexdigest()
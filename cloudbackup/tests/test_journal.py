@@ -0,0 +1,71 @@
+import pytest
+from cloudbackup import journal as journal_module
+from cloudbackup.journal import Journal
+
+
+@pytest.fixture()
+def journals_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(journal_module, "JOURNALS_DIR", tmp_path)
+    return tmp_path
+
+
+def test_pending_items_are_yielded_in_planned_order():
+    journal = Journal()
+    root = journal.add("dir", "/local/dir", "dir")
+    journal.add("file", "/local/dir/b.txt", "b.txt", root, size=2)
+    journal.add("file", "/local/dir/a.txt", "a.txt", root, size=1)
+    journal.set_planned()
+    assert journal.planned
+    assert [item.name for item in journal.pending()] == [
+        "dir", "b.txt", "a.txt"
+    ]
+    assert [item.name for item in journal.pending("file")] == [
+        "b.txt", "a.txt"
+    ]
+
+
+def test_resume_redoes_only_items_in_flight():
+    journal = Journal()
+    done, in_flight, pending = (
+        journal.add("file", f"/{name}", name) for name in "abc"
+    )
+    journal.start(done)
+    journal.finish(done)
+    journal.start(in_flight)
+    assert [item.id for item in journal.pending()] == [pending]
+    assert journal.resume() == 1
+    items = list(journal.pending())
+    assert [item.id for item in items] == [in_flight, pending]
+    assert [item.attempts for item in items] == [1, 0]
+
+
+def test_remote_ids_of_created_folders_are_kept():
+    journal = Journal()
+    folder = journal.add("dir", "/local/dir", "dir")
+    journal.start(folder)
+    journal.finish(folder, "folder id")
+    assert journal.remote_id(folder) == "folder id"
+
+
+def test_journal_survives_failed_job(journals_dir):
+    with pytest.raises(ConnectionError):
+        with Journal.for_job("gdrive", "ul", "/local", "root") as journal:
+            item = journal.add("file", "/local", "local")
+            journal.set_planned()
+            journal.start(item)
+            raise ConnectionError
+    with Journal.for_job(
+            "gdrive", "ul", "/local", "root", resume=True) as journal:
+        assert journal.planned
+        journal.resume()
+        assert [item.source for item in journal.pending()] == ["/local"]
+    assert not list(journals_dir.iterdir())
+
+
+def test_journal_is_discarded_unless_resumed(journals_dir):
+    with pytest.raises(ConnectionError):
+        with Journal.for_job("gdrive", "ul", "/local", "root") as journal:
+            journal.set_planned()
+            raise ConnectionError
+    with Journal.for_job("gdrive", "ul", "/local", "root") as journal:
+        assert not journal.planned
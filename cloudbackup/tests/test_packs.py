@@ -0,0 +1,87 @@
+import io
+import os
+import tarfile
+import pytest
+from cloudbackup.exceptions import ApiResponseException
+from cloudbackup.packs import (
+    Pack,
+    PackEntry,
+    PackIndex,
+    Span,
+    coalesce,
+    extract_span
+)
+
+
+class Sink:
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, chunk):
+        self.data += chunk
+
+
+def test_offsets_and_size_are_known_before_writing(tmp_path):
+    files = {"a.txt": b"hello", "dir/" + "long" * 60: b"x" * 1000,
+             "empty": b"", "я.txt": b"unicode"}
+    pack = Pack("pack-000001.tar")
+    entries = []
+    for name, content in files.items():
+        local = tmp_path / str(len(entries))
+        local.write_bytes(content)
+        entries.append(pack.add(name, local, os.stat(local)))
+    sink = Sink()
+    pack.write(sink)
+    assert len(sink.data) == len(pack)
+    for entry in entries:
+        assert entry.pack == "pack-000001.tar"
+        data = sink.data[entry.offset:entry.offset + entry.length]
+        assert data == files[entry.path]
+    with tarfile.open(fileobj=io.BytesIO(sink.data)) as tar:
+        assert tar.getnames() == list(files)
+
+
+def test_index_round_trip():
+    index = PackIndex([PackEntry("a/b.txt", "pack-000001.tar", 512, 5),
+                       PackEntry("c\td", "pack-000002.tar", 1024, 0)])
+    loaded = PackIndex.loads(index.dumps())
+    assert len(loaded) == 2
+    assert loaded.get("a/b.txt") == ("a/b.txt", "pack-000001.tar", 512, 5)
+    assert loaded.get("c\td").pack == "pack-000002.tar"
+    assert loaded.get("missing") is None
+
+
+def test_coalesce_merges_close_files_of_the_same_pack():
+    entries = [PackEntry("c", "p1", 5000, 100),
+               PackEntry("a", "p1", 512, 100),
+               PackEntry("b", "p1", 1536, 100),
+               PackEntry("d", "p2", 512, 10)]
+    spans = coalesce(entries, max_gap=2048)
+    assert [(s.pack, s.start, s.end) for s in spans] == [
+        ("p1", 512, 1636), ("p1", 5000, 5100), ("p2", 512, 522)]
+    assert [e.path for e in spans[0].entries] == ["a", "b"]
+
+
+class Files(dict):
+    def __call__(self, entry):
+        file = self[entry.path] = io.BytesIO()
+        file.close = lambda: None
+        return file
+
+
+def test_extract_span_skips_gaps_between_files():
+    content = b"..aaa....bb."
+    span = Span("p", 2, 11, [PackEntry("a", "p", 2, 3),
+                             PackEntry("empty", "p", 5, 0),
+                             PackEntry("b", "p", 9, 2)])
+    chunks = [content[i:i + 2] for i in range(2, 11, 2)]
+    files = Files()
+    extract_span(chunks, span, files)
+    assert {path: file.getvalue() for path, file in files.items()} == {
+        "a": b"aaa", "empty": b"", "b": b"bb"}
+
+
+def test_extract_span_raises_if_content_is_short():
+    span = Span("p", 0, 10, [PackEntry("a", "p", 0, 10)])
+    with pytest.raises(ApiResponseException, match="`a`"):
+        extract_span([b"12345"], span, Files())
@@ -0,0 +1,44 @@
+import hashlib
+import threading
+import pytest
+from cloudbackup.pipe import Pipe
+
+
+def test_pipe_passes_chunks_to_reader():
+    chunks = [b"one ", b"two ", b"three"]
+    pipe = Pipe(13, max_chunks=1)
+    producer = threading.Thread(target=pipe.pump, args=(chunks,))
+    producer.start()
+    data = []
+    while True:
+        part = pipe.read(3)
+        if not part:
+            break
+        data.append(part)
+    producer.join()
+    assert len(pipe) == 13
+    assert b"".join(data) == b"one two three"
+    assert max(map(len, data)) == 3
+    assert pipe.md5() == hashlib.md5(b"one two three").hexdigest()
+
+
+def test_pipe_raises_error_of_producer_to_reader():
+    def chunks():
+        yield b"data"
+        raise ConnectionError("download failed")
+
+    pipe = Pipe(8)
+    pipe.pump(chunks())
+    assert pipe.read(4) == b"data"
+    with pytest.raises(ConnectionError):
+        pipe.read()
+
+
+def test_abort_releases_blocked_producer():
+    pipe = Pipe(100, max_chunks=1)
+    producer = threading.Thread(target=pipe.pump, args=([b"1"] * 100,))
+    producer.start()
+    pipe.read()
+    pipe.abort()
+    producer.join(timeout=5)
+    assert not producer.is_alive()
@@ -17,12 +17,17 @@ from cloudbackup.tests._yadisk_api_responses import (
     LIST_FILES_RESPONSE
 )
 
+LSDIR_FIELDS = (
+    "_embedded.items.name,_embedded.items.type,_embedded.items.path"
+)
+LIST_FILES_FIELDS = "items.name,items.type,items.path"
+
 
 @pytest.fixture()
 def yadisk():
-    with patch("cloudbackup.yadisk.Authenticator") as MockAuth:
-        auth = MockAuth.return_value
-        auth.get_yadisk_token.return_value = str(Mock())
+    with patch("cloudbackup.yadisk.TokenProvider") as MockProvider:
+        provider = MockProvider.for_yadisk.return_value
+        provider.token.return_value = str(Mock())
         yield YaDisk()
 
 
@@ -33,6 +38,7 @@ def test_lsdir_def_args(yadisk):
         "sort": "modified",
         "limit": "20",
         "offset": "0",
+        "fields": LSDIR_FIELDS,
     }
     responses.add(
         responses.GET,
@@ -55,6 +61,7 @@ def test_lsdir_diff_args(yadisk):
         "sort": "path",
         "limit": "10",
         "offset": "5",
+        "fields": LSDIR_FIELDS,
     }
     responses.add(
         responses.GET,
@@ -82,6 +89,7 @@ def test_lsdir_returns_page(yadisk):
         "sort": "modified",
         "limit": "20",
         "offset": "0",
+        "fields": LSDIR_FIELDS,
     }
     responses.add(
         responses.GET,
@@ -116,6 +124,7 @@ def test_list_files_def_args(yadisk):
         "sort": "name",
         "limit": "20",
         "offset": "0",
+        "fields": LIST_FILES_FIELDS,
     }
     responses.add(
         responses.GET,
@@ -137,6 +146,7 @@ def test_list_files_diff_args(yadisk):
         "sort": "created",
         "limit": "10",
         "offset": "4",
+        "fields": LIST_FILES_FIELDS,
     }
     responses.add(
         responses.GET,
@@ -162,6 +172,7 @@ def test_list_files_returns_correct_list(yadisk):
         "sort": "name",
         "limit": "20",
         "offset": "0",
+        "fields": LIST_FILES_FIELDS,
     }
     responses.add(
         responses.GET,
@@ -179,6 +190,29 @@ def test_list_files_returns_correct_list(yadisk):
     assert listed_files == test_files
 
 
+@responses.activate
+def test_list_files_requests_extra_fields(yadisk):
+    url_keys = {
+        "sort": "name",
+        "limit": "20",
+        "offset": "0",
+        "fields": LIST_FILES_FIELDS + ",items.size,items.md5",
+    }
+    responses.add(
+        responses.GET,
+        url=f"https://cloud-api.yandex.net/v1/disk/resources/files?"
+            f"{urlencode(url_keys)}",
+        content_type="application/json",
+        match_querystring=True,
+        body=json.dumps(LIST_FILES_RESPONSE)
+    )
+    listed_files = yadisk.list_files(extra_fields=("size", "md5"))
+    assert responses.calls[0].request.params == url_keys
+    assert responses.calls[0].request.headers["Accept-Encoding"] == "gzip"
+    assert listed_files[0].size == 383289
+    assert listed_files[0].md5 == "bc35c9315eb5ae423fa92d0b5f0c46b7"
+
+
 @responses.activate
 def test_get_download_link(yadisk):
     path = "/tests.txt"
@@ -212,6 +246,48 @@ def test_download(yadisk):
     assert responses.calls[0].response.content == file_bytes
 
 
+@responses.activate
+def test_download_stream_yields_chunks(yadisk):
+    download_link = "https://download_link"
+    responses.add(
+        responses.GET,
+        url=download_link,
+        body="raz dva tri\n"
+    )
+    chunks = list(yadisk.download_stream(download_link, chunk_size=4))
+    assert len(responses.calls) == 1
+    assert chunks[0] == b"raz "
+    assert b"".join(chunks) == b"raz dva tri\n"
+
+
+@responses.activate
+def test_download_stream_requests_range(yadisk):
+    download_link = "https://download_link"
+    responses.add(
+        responses.GET,
+        url=download_link,
+        body="dva",
+        status=206
+    )
+    chunks = list(yadisk.download_stream(download_link, byte_range=(4, 7)))
+    request = responses.calls[0].request
+    assert request.headers["Range"] == "bytes=4-6"
+    assert request.headers["Accept-Encoding"] == "identity"
+    assert chunks == [b"dva"]
+
+
+@responses.activate
+def test_download_stream_raises_if_range_is_ignored(yadisk):
+    download_link = "https://download_link"
+    responses.add(
+        responses.GET,
+        url=download_link,
+        body="raz dva tri\n"
+    )
+    with pytest.raises(ApiResponseException):
+        list(yadisk.download_stream(download_link, byte_range=(4, 7)))
+
+
 @responses.activate
 def test_move_to_trash(yadisk):
     path = "/remove.txt"
@@ -254,6 +330,39 @@ def test_remove_permanently(yadisk):
     assert responses.calls[0].request.params == url_keys
 
 
+@responses.activate
+def test_remove_returns_link_of_async_operation(yadisk):
+    operation = "https://cloud-api.yandex.net/v1/disk/operations/1"
+    responses.add(
+        method="DELETE",
+        url="https://cloud-api.yandex.net/v1/disk/resources",
+        status=202,
+        json={"href": operation, "method": "GET", "templated": False},
+    )
+    responses.add(
+        responses.GET,
+        url=operation,
+        json={"status": "in-progress"},
+    )
+    assert yadisk.remove("/big_folder", True) == operation
+    assert yadisk.operation_status(operation) == "in-progress"
+    assert "Authorization" in responses.calls[1].request.headers
+
+
+@responses.activate
+def test_copy(yadisk):
+    responses.add(
+        responses.POST,
+        url="https://cloud-api.yandex.net/v1/disk/resources/copy",
+        status=201,
+        json={"href": "https://cloud-api.yandex.net/v1/disk/resources"},
+    )
+    assert yadisk.copy("disk:/old/foo.txt", "disk:/new/foo.txt") is None
+    request = responses.calls[0].request
+    assert "from=disk%3A%2Fold%2Ffoo.txt" in request.url
+    assert "path=disk%3A%2Fnew%2Ffoo.txt" in request.url
+
+
 @responses.activate
 def test_mkdir(yadisk):
     path = "/test_dir"
@@ -294,6 +403,20 @@ def test_get_upload_link(yadisk):
     assert responses.calls[0].request.params == req_params
 
 
+@responses.activate
+def test_get_upload_link_with_overwrite(yadisk):
+    file_path = Path("_yadisk_api_responses.py")
+    responses.add(
+        responses.GET,
+        url="https://cloud-api.yandex.net/v1/disk/resources/upload",
+        content_type="application/json",
+        json={"href": "some_upload_link"}
+    )
+    yadisk.get_upload_link(file_path, "/file.py", overwrite=True)
+    assert responses.calls[0].request.params["overwrite"] == "true"
+    assert responses.calls[0].request.params["path"] == "/file.py"
+
+
 @responses.activate
 def test_upload_file(yadisk):
     upload_link = "https://cool_upload_link"
@@ -309,6 +432,20 @@ def test_upload_file(yadisk):
     assert responses.calls[0].request.body == b"test_bytes"
 
 
+@responses.activate
+def test_upload_file_returns_etag_as_md5(yadisk):
+    upload_link = "https://cool_upload_link"
+    responses.add(
+        responses.PUT,
+        url=upload_link,
+        body="",
+        status=201,
+        headers={"Etag": '"D41D8CD98F00B204E9800998ECF8427E"'}
+    )
+    md5 = yadisk.upload_file(upload_link, b"")
+    assert md5 == "d41d8cd98f00b204e9800998ecf8427e"
+
+
 @responses.activate
 def test_lsdir_exception(yadisk):
     path = "/tests"
@@ -317,6 +454,7 @@ def test_lsdir_exception(yadisk):
         "sort": "modified",
         "limit": "20",
         "offset": "0",
+        "fields": LSDIR_FIELDS,
     }
     responses.add(
         responses.GET,
@@ -1,14 +1,19 @@
 import json
-from typing import List
+from typing import Iterator, List, Optional
 
-import requests
 import mimetypes
-from cloudbackup._authenticator import Authenticator
+from cloudbackup._authenticator import TokenProvider
+from cloudbackup._session import http_session, range_header
 from cloudbackup.exceptions import (
     ApiResponseException,
     FileIsNotDownloadableException
 )
 from cloudbackup.file_objects import YaDiskFile
+from cloudbackup._defaults import (
+    ACCEPT_ENCODING,
+    DOWNLOAD_CHUNK_SIZE,
+    YADISK_FILE_FIELDS
+)
 from pathlib import Path
 
 
@@ -18,17 +23,45 @@ class YaDisk:
     """
 
     def __init__(self):
-        self._auth_headers = {
+        self._tokens = TokenProvider.for_yadisk()
+        self._session = http_session()
+
+    @property
+    def _auth_headers(self) -> dict:
+        """
+        Headers with current access token. Token is loaded on first
+        request (so constructing client costs no I/O) and then refreshed
+        by provider in background.
+        """
+        return {
             "Content-Type": "application/json",
-            "Authorization": Authenticator().get_yadisk_token()
+            "Accept-Encoding": ACCEPT_ENCODING,
+            "Authorization": self._tokens.token()
         }
 
+    @staticmethod
+    def _fields(extra_fields: tuple = (), prefix: str = "") -> str:
+        """
+        Build resource fields selector from minimal fields set and fields
+        explicitly requested by caller.
+
+        Args:
+            extra_fields: fields to request in addition to
+             'name', 'type' and 'path'.
+            prefix: path to nested resources in response.
+             For example: '_embedded.items.'.
+        """
+        fields = list(YADISK_FILE_FIELDS)
+        fields.extend(f for f in extra_fields if f not in fields)
+        return ",".join(prefix + f for f in fields)
+
     def lsdir(
             self,
             path: str = None,
             sort: str = "modified",
             limit: int = 20,
-            offset: int = 0
+            offset: int = 0,
+            extra_fields: tuple = ()
     ) -> List[YaDiskFile]:
         """
         Make request to get directory or file meta-information.
@@ -43,6 +76,8 @@ class YaDisk:
             offset: Optional; The number of resources from the top of the list
              that should be skipped in the response
              (used for paginated output).
+            extra_fields: Optional; resource fields to request in addition
+             to 'name', 'type' and 'path'. For example: ('size', 'md5').
 
         Returns:
             List of YaDisk files.
@@ -55,8 +90,9 @@ class YaDisk:
             "sort": sort,
             "limit": limit,
             "offset": offset,
+            "fields": self._fields(extra_fields, prefix="_embedded.items."),
         }
-        r = requests.get(
+        r = self._session.get(
             "https://cloud-api.yandex.net/v1/disk/resources/",
             params=keys,
             headers=self._auth_headers
@@ -68,22 +104,25 @@ class YaDisk:
         except KeyError:
             return []
 
-    def get_file(self, path: str):
+    def get_file(self, path: str, extra_fields: tuple = ()):
         """
         Get file or directory meta-information by path. Includes only
-         name, type and path of target file.
+         name, type and path of target file unless other fields are
+         requested explicitly.
 
         Args:
             path: directory or file to get meta-information about
+            extra_fields: Optional; resource fields to request in addition
+             to 'name', 'type' and 'path'.
 
         Raises:
             ApiResponseException: an error occurred accessing API.
         """
         keys = {
             "path": path,
-            "fields": "name, type, path"
+            "fields": self._fields(extra_fields)
         }
-        r = requests.get(
+        r = self._session.get(
             "https://cloud-api.yandex.net/v1/disk/resources/",
             params=keys,
             headers=self._auth_headers
@@ -92,7 +131,13 @@ class YaDisk:
             raise ApiResponseException(r.status_code, r.json()["description"])
         return YaDiskFile(r.json())
 
-    def list_files(self, sort="name", limit=20, offset=0) -> list:
+    def list_files(
+            self,
+            sort="name",
+            limit=20,
+            offset=0,
+            extra_fields: tuple = ()
+    ) -> list:
         """
         Make request to get list of limited size consists of files on
          YandexDisk excluding directories.
@@ -105,6 +150,8 @@ class YaDisk:
              described in the list.
             offset: The number of resources from the top of the list that
             should be skipped in the response (used for paginated output).
+            extra_fields: Optional; resource fields to request in addition
+             to 'name', 'type' and 'path'. For example: ('size', 'md5').
 
         Returns:
             List of 'limit' size consists of YaDiskFileObjects represent each
@@ -114,8 +161,9 @@ class YaDisk:
             "sort": sort,
             "limit": limit,
             "offset": offset,
+            "fields": self._fields(extra_fields, prefix="items."),
         }
-        r = requests.get(
+        r = self._session.get(
             "https://cloud-api.yandex.net/v1/disk/resources/files",
             params=keys,
             headers=self._auth_headers
@@ -137,7 +185,7 @@ class YaDisk:
         Raises:
              ApiResponseException: an error occurred accessing API
         """
-        r = requests.get(
+        r = self._session.get(
             "https://cloud-api.yandex.net/v1/disk/resources/download",
             headers=self._auth_headers,
             params={"path": path}
@@ -164,7 +212,7 @@ class YaDisk:
             FileIsNotDownloadable: an error occurred getting link for file with
              provided `path` argument.
         """
-        r = requests.get(
+        r = self._session.get(
             download_link,
             headers=self._auth_headers
         )
@@ -172,7 +220,50 @@ class YaDisk:
             raise ApiResponseException(r.status_code, r.json()["description"])
         return r.content
 
-    def get_upload_link(self, file_path: Path, destination: str) -> str:
+    def download_stream(
+            self,
+            download_link: str,
+            chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+            byte_range: tuple = None
+    ) -> Iterator[bytes]:
+        """
+        Make a request for downloading file from YaDisk storage and yield
+        its content by chunks as they are received.
+
+        Args:
+            download_link: link from `get_download_link` method.
+            chunk_size: Optional; size of yielded chunks.
+            byte_range: Optional; (start, end) offsets, only bytes from
+             `start` up to `end` (exclusive) are downloaded.
+
+        Raises:
+            ApiResponseException: an error occurred accessing API.
+        """
+        headers = self._auth_headers
+        if byte_range is not None:
+            # ranges of compressed representation would be returned
+            headers["Accept-Encoding"] = "identity"
+            headers["Range"] = range_header(*byte_range)
+        r = self._session.get(
+            download_link,
+            headers=headers,
+            stream=True
+        )
+        with r:
+            if r.status_code not in {200, 206}:
+                raise ApiResponseException(
+                    r.status_code, r.json()["description"])
+            if byte_range is not None and r.status_code != 206:
+                raise ApiResponseException(
+                    r.status_code, "Range of file wasn't returned.")
+            yield from r.iter_content(chunk_size)
+
+    def get_upload_link(
+            self,
+            file_path: Path,
+            destination: str,
+            overwrite: bool = False
+    ) -> str:
         """
         Send initial request to get link for download a file.
 
@@ -180,6 +271,7 @@ class YaDisk:
             file_path: local path of file that needs to be uploaded.
             destination: directory on YandexDisk storage where to
              save uploaded file. For example: '/path/bar'.
+            overwrite: Optional; whether to replace existing file.
 
         Returns:
             URL for the file upload
@@ -191,16 +283,19 @@ class YaDisk:
             "name": file_path.name,
             "mime_type": mimetypes.guess_type(file_path)[0],
         }
-        r = requests.get(
+        params = {"path": destination, "fields": json.dumps(metadata)}
+        if overwrite:
+            params["overwrite"] = "true"
+        r = self._session.get(
             "https://cloud-api.yandex.net/v1/disk/resources/upload",
-            params={"path": destination, "fields": json.dumps(metadata)},
+            params=params,
             headers=self._auth_headers
         )
         if r.status_code != 200:
             raise ApiResponseException(r.status_code, r.json()["description"])
         return r.json()["href"]
 
-    def upload_file(self, upload_link: str, file_data: bytes) -> None:
+    def upload_file(self, upload_link: str, file_data) -> Optional[str]:
         """
         Upload a entire file by one single request. Before use
          this method call `get_upload_link` and provide upload
@@ -208,18 +303,26 @@ class YaDisk:
 
         Args:
             upload_link: link for uploading file
-            file_data: raw binary file data
+            file_data: raw binary file data, file-like object with
+             `__len__`, which is streamed, or iterable of chunks of
+             unknown total size, which is sent chunked
+
+        Returns:
+            md5 of uploaded content reported by upload server in `Etag`
+            header or None if it isn't reported.
 
         Raises:
             ApiResponseException: an error occurred accessing API.
         """
-        r = requests.put(
+        r = self._session.put(
             upload_link,
             data=file_data,
             headers=self._auth_headers
         )
         if r.status_code not in {201, 202}:
             raise ApiResponseException(r.status_code, r.json()["description"])
+        etag = r.headers.get("Etag")
+        return None if etag is None else etag.strip('"').lower()
 
     def mkdir(self, destination: str) -> None:
         """
@@ -233,7 +336,7 @@ class YaDisk:
             ApiResponseException: an error occurred accessing API.
         """
         path = {"path": destination}
-        r = requests.put(
+        r = self._session.put(
             "https://cloud-api.yandex.net/v1/disk/resources",
             params=path,
             headers=self._auth_headers
@@ -241,7 +344,7 @@ class YaDisk:
         if r.status_code != 201:
             raise ApiResponseException(r.status_code, r.json()["description"])
 
-    def remove(self, path, permanently=False) -> None:
+    def remove(self, path, permanently=False) -> Optional[str]:
         """
         Make a request for removing file on YandexDisk storage.
 
@@ -251,6 +354,11 @@ class YaDisk:
             permanently: Optional; whether to delete the file
              permanently or move to the trash.
 
+        Returns:
+            Link for checking status of asynchronous operation if
+            YandexDisk deletes resource (usually big folder) in background
+            or None if resource is already deleted.
+
         Raises:
             ApiResponseException: an error occurred accessing API.
             IncorrectPathException: if path has prohibited chars.
@@ -260,7 +368,7 @@ class YaDisk:
             "path": path,
             "permanently": permanently,
         }
-        r = requests.request(
+        r = self._session.request(
             "DELETE",
             "https://cloud-api.yandex.net/v1/disk/resources",
             params=flags,
@@ -268,3 +376,56 @@ class YaDisk:
         )
         if r.status_code not in {202, 204}:
             raise ApiResponseException(r.status_code, r.json()["description"])
+        if r.status_code == 202:
+            return r.json()["href"]
+        return None
+
+    def copy(self, from_path: str, path: str) -> Optional[str]:
+        """
+        Make a request for copying file on YandexDisk storage. Content
+        is copied by YandexDisk, nothing is transferred.
+
+        Args:
+            from_path: Path to file which needs to be copied.
+            path: Path of created copy, e.g. 'disk:/backup/foo.py'.
+
+        Returns:
+            Link for checking status of asynchronous operation if
+            YandexDisk copies resource in background or None if copy is
+            already created.
+
+        Raises:
+            ApiResponseException: an error occurred accessing API.
+        """
+        flags = {
+            "from": from_path,
+            "path": path,
+        }
+        r = self._session.post(
+            "https://cloud-api.yandex.net/v1/disk/resources/copy",
+            params=flags,
+            headers=self._auth_headers
+        )
+        if r.status_code not in {201, 202}:
+            raise ApiResponseException(r.status_code, r.json()["description"])
+        if r.status_code == 202:
+            return r.json()["href"]
+        return None
+
+    def operation_status(self, link: str) -> str:
+        """
+        Make a request for status of asynchronous operation.
+
+        Args:
+            link: operation link returned by `remove` or `copy` method.
+
+        Returns:
+            'success', 'failed' or 'in-progress'.
+
+        Raises:
+            ApiResponseException: an error occurred accessing API.
+        """
+        r = self._session.get(link, headers=self._auth_headers)
+        if r.status_code != 200:
+            raise ApiResponseException(r.status_code, r.json()["description"])
+        return r.json()["status"]
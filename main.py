@@ -4,48 +4,323 @@ import sys
 from pathlib import Path
 
 from arg_parser import parse_args
-from cloudbackup.exceptions import ApiResponseException, CredentialsNotFoundException
-from wrappers.defaults import (DOWNLOAD_COMPLETED_MSG,
-                               UPLOAD_COMPLETED_MSG)
-from wrappers.gdrive_wrapper import GDriveWrapper
-from wrappers.yadisk_wrapper import YaDiskWrapper
+from cloudbackup.exceptions import (ApiResponseException,
+                                    ChecksumMismatchException,
+                                    CredentialsNotFoundException,
+                                    DecompressionException,
+                                    DecryptionException,
+                                    EncryptionKeyException,
+                                    UnsafePathException)
+from wrappers.cli_msgs import (ChunkBackupResultMessage,
+                               ChunkRestoreResultMessage,
+                               PackResultMessage,
+                               SnapshotResultMessage,
+                               ULResultMessage,
+                               UnpackResultMessage,
+                               VerifyResultMessage,
+                               VerifySummaryMessage)
+from wrappers.defaults import (COPY_COMPLETED_MSG,
+                               DOWNLOAD_COMPLETED_MSG,
+                               UPLOAD_COMPLETED_MSG,
+                               SYNC_COMPLETED_MSG,
+                               PRUNE_COMPLETED_MSG,
+                               KEY_CREATED_MSG,
+                               LEGACY_KEY_MSG,
+                               RESUME_HINT_MSG)
 
 
-def main():
-    exit_msg = None
-    args = parse_args()
+def make_wrapper(storage: str):
+    """
+    Import and construct wrapper only for storage in use: clients and
+    HTTP library are heavy to import, and no token is loaded until
+    first request.
+    """
+    if storage == "gdrive":
+        from wrappers.gdrive_wrapper import GDriveWrapper
+        return GDriveWrapper()
+    else:
+        from wrappers.yadisk_wrapper import YaDiskWrapper
+        return YaDiskWrapper()
+
+
+def other_storage(storage: str) -> str:
+    return "yadisk" if storage == "gdrive" else "gdrive"
+
+
+def open_journal(args, source, destination):
+    """
+    Journal of upload or download job, kept on disk until job completes.
+    """
+    from cloudbackup.journal import Journal
+    return Journal.for_job(
+        args.storage,
+        args.operation,
+        source,
+        destination,
+        resume=args.resume
+    )
+
+
+def open_catalog(storage: str):
+    from cloudbackup.catalog import SnapshotCatalog
+    return SnapshotCatalog(storage)
+
+
+def open_cipher(key_file: Path, create: bool = False):
+    """
+    Cipher with key from `key_file`. If `create` is True and there is no
+    key yet, new key is generated. Otherwise None is returned if there
+    is no key or `cryptography` package, then only encrypted files can't
+    be downloaded. Default key of earlier versions, which was kept inside
+    package, is still used until it's moved.
+    """
+    from cloudbackup._defaults import (ENCRYPTION_KEY_PATH,
+                                       LEGACY_ENCRYPTION_KEY_PATH)
+    if (not key_file.exists() and key_file == ENCRYPTION_KEY_PATH
+            and LEGACY_ENCRYPTION_KEY_PATH.exists()):
+        print(LEGACY_KEY_MSG.format(LEGACY_ENCRYPTION_KEY_PATH, key_file),
+              file=sys.stderr)
+        key_file = LEGACY_ENCRYPTION_KEY_PATH
+    if not key_file.exists():
+        if not create:
+            return None
+        from cloudbackup.encryption import create_key
+        create_key(key_file)
+        print(KEY_CREATED_MSG.format(key_file), file=sys.stderr)
+    from cloudbackup.encryption import Cipher, load_key
     try:
-        if args.storage == "gdrive":
-            wrapper = GDriveWrapper()
-        else:
-            wrapper = YaDiskWrapper()
-        if args.operation == "ls":
-            wrapper.lsdir(args.remote_file, order_key=args.order_by)
-        elif args.operation == "dl":
-            wrapper.download(
+        return Cipher(load_key(key_file))
+    except ModuleNotFoundError:
+        if create:
+            raise
+        return None
+
+
+def run(args, wrapper=None, get_wrapper=None):
+    """
+    Execute parsed command. Returns message which should be printed when
+    command completes and exit code. Wrappers of storages are returned by
+    `get_wrapper(storage)`, by default new ones are made.
+    """
+    exit_msg = None
+    exit_code = 0
+    if get_wrapper is None:
+        get_wrapper = make_wrapper
+    if wrapper is None:
+        wrapper = get_wrapper(args.storage)
+    if args.operation == "ls":
+        wrapper.lsdir(
+            args.remote_file, order_key=args.order_by, top=args.top)
+    elif args.operation == "dl":
+        destination = Path(args.destination).absolute()
+        with open_journal(args, args.remote_file, destination) as journal:
+            summary = wrapper.download(
                 wrapper.get_file(args.remote_file),
                 local_destination=Path(args.destination),
+                ov=args.overwrite,
+                journal=journal,
+                cipher=open_cipher(Path(args.key_file))
+            )
+        exit_msg = "\n".join((
+            VerifySummaryMessage(summary).str_value(),
+            DOWNLOAD_COMPLETED_MSG
+        ))
+    elif args.operation == "ul" and args.pack:
+        from wrappers.packing import PackedUpload
+        result = PackedUpload(
+            wrapper,
+            args.destination,
+            pack_size=args.pack_size * 1024 * 1024,
+            jobs=args.jobs
+        ).upload(Path(args.local_file))
+        exit_msg = PackResultMessage(result).str_value()
+    elif args.operation == "ul" and args.mirror is not None:
+        from wrappers.fan_out import FanOutUpload
+        results = FanOutUpload({
+            args.storage: (wrapper, args.destination),
+            other_storage(args.storage): (
+                get_wrapper(other_storage(args.storage)), args.mirror),
+        }).upload(Path(args.local_file))
+        exit_msg = "\n".join(
+            ULResultMessage(storage, result).str_value()
+            for storage, result in results.items()
+        )
+    elif args.operation == "ul":
+        compression = None
+        if args.compress:
+            from cloudbackup.compression import get_codec
+            compression = get_codec(args.codec)
+        cipher = None
+        if args.encrypt:
+            cipher = open_cipher(Path(args.key_file), create=True)
+        local_file = Path(args.local_file).absolute()
+        with open_journal(args, local_file, args.destination) as journal:
+            wrapper.upload(
+                Path(args.local_file),
+                args.destination,
+                journal=journal,
+                dedup=args.dedup,
+                compression=compression,
+                cipher=cipher
+            )
+        exit_msg = UPLOAD_COMPLETED_MSG
+    elif args.operation == "cp":
+        wrapper.copy_to(
+            get_wrapper(other_storage(args.storage)),
+            args.remote_file,
+            args.destination,
+            jobs=args.jobs
+        )
+        exit_msg = COPY_COMPLETED_MSG
+    elif args.operation == "rm":
+        wrapper.remove(
+            args.remote_file, permanently=args.permanently, jobs=args.jobs)
+    elif args.operation == "du":
+        wrapper.du(args.remote_file, depth=args.depth, top=args.top)
+    elif args.operation == "diff":
+        wrapper.diff(
+            Path(args.local_file),
+            args.remote_file,
+            checksum=args.checksum
+        )
+    elif args.operation == "verify":
+        result = wrapper.verify(
+            Path(args.local_file), args.remote_file, jobs=args.jobs)
+        exit_msg = VerifyResultMessage(result).str_value()
+        if any(result.values()):
+            exit_code = 1
+    elif args.operation == "sync":
+        wrapper.sync(
+            Path(args.local_file),
+            args.remote_file,
+            dry_run=args.dry_run,
+            permanently=args.permanently,
+            checksum=args.checksum,
+            jobs=args.jobs,
+            dedup=args.dedup
+        )
+        if not args.dry_run:
+            exit_msg = SYNC_COMPLETED_MSG
+    elif args.operation == "snapshot":
+        with open_catalog(args.storage) as catalog:
+            result = wrapper.snapshot(
+                Path(args.local_file),
+                args.remote_file,
+                catalog,
+                name=args.name,
+                jobs=args.jobs
+            )
+        exit_msg = SnapshotResultMessage(result).str_value()
+    elif args.operation == "snapshots":
+        with open_catalog(args.storage) as catalog:
+            wrapper.snapshots(args.remote_file, catalog)
+    elif args.operation == "restore":
+        with open_catalog(args.storage) as catalog:
+            summary = wrapper.restore(
+                args.remote_file,
+                args.name,
+                Path(args.destination),
+                catalog,
+                path=args.file,
                 ov=args.overwrite
             )
-            exit_msg = DOWNLOAD_COMPLETED_MSG
-        elif args.operation == "ul":
-            wrapper.upload(Path(args.local_file), args.destination)
-            exit_msg = UPLOAD_COMPLETED_MSG
-        elif args.operation == "rm":
-            wrapper.remove(args.remote_file, permanently=args.permanently)
+        exit_msg = "\n".join((
+            VerifySummaryMessage(summary).str_value(),
+            DOWNLOAD_COMPLETED_MSG
+        ))
+    elif args.operation == "unpack":
+        result = wrapper.unpack(
+            args.remote_file,
+            Path(args.destination),
+            paths=args.paths or None,
+            ov=args.overwrite,
+            jobs=args.jobs
+        )
+        exit_msg = UnpackResultMessage(result).str_value()
+    elif args.operation == "chunk-backup":
+        from wrappers.chunk_store import ChunkStore
+        result = ChunkStore(wrapper, args.remote_file, jobs=args.jobs).backup(
+            Path(args.local_file), name=args.name)
+        exit_msg = ChunkBackupResultMessage(result).str_value()
+    elif args.operation == "chunk-list":
+        from wrappers.chunk_store import ChunkStore
+        ChunkStore(wrapper, args.remote_file).backups()
+    elif args.operation == "chunk-restore":
+        from wrappers.chunk_store import ChunkStore
+        result = ChunkStore(wrapper, args.remote_file, jobs=args.jobs).restore(
+            args.name,
+            Path(args.destination),
+            paths=args.paths or None,
+            ov=args.overwrite
+        )
+        exit_msg = ChunkRestoreResultMessage(result).str_value()
+    elif args.operation == "prune":
+        from wrappers.retention import RetentionPolicy
+        policy = RetentionPolicy(
+            last=args.keep_last,
+            daily=args.keep_daily,
+            weekly=args.keep_weekly,
+            monthly=args.keep_monthly
+        )
+        with open_catalog(args.storage) as catalog:
+            removed = wrapper.prune(
+                args.remote_file,
+                policy,
+                catalog,
+                permanently=args.permanently,
+                dry_run=args.dry_run,
+                jobs=args.jobs
+            )
+        if not args.dry_run:
+            exit_msg = PRUNE_COMPLETED_MSG.format(removed)
+    return exit_msg, exit_code
+
+
+def execute(args, wrapper=None, get_wrapper=None) -> int:
+    """
+    Execute parsed command printing errors. Returns exit code.
+    """
+    try:
+        exit_msg, exit_code = run(args, wrapper, get_wrapper)
         if exit_msg:
             print(exit_msg)
     except (ApiResponseException,
+            ChecksumMismatchException,
             FileExistsError,
             FileNotFoundError,
+            NotADirectoryError,
             PermissionError,
-            CredentialsNotFoundException
+            CredentialsNotFoundException,
+            DecompressionException,
+            DecryptionException,
+            EncryptionKeyException,
+            UnsafePathException
             ) as e:
         print(e)
-        sys.exit(1)
+        _print_resume_hint(args)
+        return 1
     except KeyboardInterrupt:
         print("Interrupted by user.")
-        sys.exit(1)
+        _print_resume_hint(args)
+        return 1
+    return exit_code
+
+
+def _print_resume_hint(args):
+    if args.operation in {"ul", "dl"}:
+        print(RESUME_HINT_MSG)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    exit_code = None
+    if not args.no_agent:
+        # client of agent is light, its server side isn't imported here
+        from agent_client import forward
+        exit_code = forward(args)
+    if exit_code is None:
+        exit_code = execute(args)
+    sys.exit(exit_code)
 
 
 if __name__ == "__main__":
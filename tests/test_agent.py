@@ -0,0 +1,229 @@
+import argparse
+import io
+import json
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+import pytest
+from unittest.mock import Mock
+from agent import Agent, _ChannelStdin, _ChannelStdout
+from agent_client import forward
+
+ROOT = Path(__file__).parents[1]
+
+
+def ls_args():
+    return argparse.Namespace(
+        no_agent=False, storage="yadisk", operation="ls",
+        remote_file="disk:/", order_by="name", top=None)
+
+
+def relay_streams(monkeypatch, typed: str = ""):
+    """
+    Installs streams of agent process, output of client goes to
+    returned buffer. Pytest replaces `sys.stdout` before test is called,
+    so it's done by test itself.
+    """
+    out = io.StringIO()
+    monkeypatch.setattr(sys, "stdout", _ChannelStdout(out))
+    monkeypatch.setattr(sys, "stdin", _ChannelStdin(io.StringIO(typed)))
+    return out
+
+
+@pytest.fixture()
+def agent(tmp_path, monkeypatch):
+    """
+    Agent serving in background thread, commands are executed by
+    `main.execute` with mocked wrappers whose `lsdir` calls
+    `agent.lsdir`.
+    """
+    state = argparse.Namespace(wrappers=[], lsdir=None)
+
+    def make_wrapper(storage):
+        wrapper = Mock()
+        wrapper.lsdir.side_effect = (
+            lambda *args, **kwargs: state.lsdir(*args, **kwargs))
+        state.wrappers.append(wrapper)
+        return wrapper
+
+    monkeypatch.setattr("main.make_wrapper", make_wrapper)
+    state.path = tmp_path / "agent.sock"
+    server = Agent(state.path, workers=4)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield state
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_command_output_and_input_are_relayed(agent, monkeypatch):
+    out = relay_streams(monkeypatch, "yes\n")
+
+    def lsdir(remote_file, **kwargs):
+        print(f"listing {remote_file}")
+        print(f"answer {input('Continue? ')}")
+
+    agent.lsdir = lsdir
+    assert forward(ls_args(), agent.path) == 0
+    assert out.getvalue() == "listing disk:/\nContinue? answer yes\n"
+
+
+def test_end_of_client_input_aborts_command(agent, monkeypatch):
+    out = relay_streams(monkeypatch)
+
+    def lsdir(remote_file, **kwargs):
+        input("Continue? ")
+
+    agent.lsdir = lsdir
+    assert forward(ls_args(), agent.path) == 1
+    assert out.getvalue() == "Continue? Aborted.\n"
+
+
+def test_client_doesnt_import_agent():
+    code = ("import sys, main, agent_client;"
+            " print('agent' in sys.modules, 'socketserver' in sys.modules)")
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout == "False False\n"
+
+
+def test_agent_rejects_non_positive_workers(monkeypatch, capsys):
+    import agent
+    serve = Mock()
+    monkeypatch.setattr(agent, "serve", serve)
+    monkeypatch.setattr(sys, "argv", ["agent.py", "--workers", "0"])
+    with pytest.raises(SystemExit):
+        agent.main()
+    assert "0 isn't positive" in capsys.readouterr().err
+    serve.assert_not_called()
+
+
+def test_stop_removes_socket(tmp_path):
+    path = tmp_path / "agent.sock"
+    server = Agent(path, workers=1)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    assert path.stat().st_mode & 0o077 == 0
+    server.shutdown()
+    server.server_close()
+    thread.join()
+    assert not path.exists()
+    assert forward(ls_args(), path) is None
+
+
+def test_stale_socket_is_replaced_but_live_one_is_kept(tmp_path):
+    path = tmp_path / "agent.sock"
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(str(path))
+    stale.close()
+    with Agent(path, workers=1):
+        with pytest.raises(OSError):
+            Agent(path, workers=1)
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        probe.connect(str(path))
+        probe.close()
+
+
+def test_concurrent_commands_share_wrapper(agent):
+    barrier = threading.Barrier(2, timeout=5)
+    agent.lsdir = lambda *args, **kwargs: barrier.wait()
+    codes = []
+    clients = [
+        threading.Thread(
+            target=lambda: codes.append(forward(ls_args(), agent.path)))
+        for _ in range(2)
+    ]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    assert codes == [0, 0]
+    assert len(agent.wrappers) == 1
+
+
+def test_cp_reuses_wrappers_of_both_storages(agent, monkeypatch):
+    relay_streams(monkeypatch)
+    args = argparse.Namespace(
+        no_agent=False, storage="yadisk", operation="cp",
+        remote_file="disk:/a.txt", destination="root", jobs=1)
+    assert forward(args, agent.path) == 0
+    assert forward(args, agent.path) == 0
+    assert len(agent.wrappers) == 2
+    source, target = agent.wrappers
+    assert source.copy_to.call_count == 2
+    assert all(
+        copy_call.args[0] is target
+        for copy_call in source.copy_to.call_args_list
+    )
+
+
+def start_endless_command(agent):
+    started = threading.Event()
+    stopped = threading.Event()
+
+    def lsdir(*args, **kwargs):
+        started.set()
+        try:
+            while True:
+                time.sleep(0.01)
+        finally:
+            stopped.set()
+
+    agent.lsdir = lsdir
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect(str(agent.path))
+    stream = client.makefile("rwb")
+    message = {"args": vars(ls_args())}
+    stream.write(json.dumps(message).encode() + b"\n")
+    stream.flush()
+    assert started.wait(5)
+    return client, stream, stopped
+
+
+def test_interrupt_stops_command(agent, monkeypatch):
+    relay_streams(monkeypatch)
+    client, stream, stopped = start_endless_command(agent)
+    with client, stream:
+        stream.write(b'{"interrupt": true}\n')
+        stream.flush()
+        replies = [json.loads(line) for line in stream]
+    assert stopped.wait(5)
+    assert {"out": "Interrupted by user."} in replies
+    assert replies[-1] == {"exit": 1}
+
+
+def test_disconnect_stops_command(agent):
+    client, stream, stopped = start_endless_command(agent)
+    stream.close()
+    client.close()
+    assert stopped.wait(5)
+
+
+def test_ctrl_c_of_client_is_forwarded(agent, monkeypatch):
+    import agent_client
+    out = relay_streams(monkeypatch)
+    started = threading.Event()
+
+    def lsdir(*args, **kwargs):
+        started.set()
+        while True:
+            time.sleep(0.01)
+
+    agent.lsdir = lsdir
+    relay = agent_client._relay
+    calls = []
+
+    def interrupted_relay(stream, send):
+        calls.append(stream)
+        if len(calls) == 1:
+            assert started.wait(5)
+            raise KeyboardInterrupt
+        return relay(stream, send)
+
+    monkeypatch.setattr(agent_client, "_relay", interrupted_relay)
+    assert forward(ls_args(), agent.path) == 1
+    assert out.getvalue() == "Interrupted by user.\n"
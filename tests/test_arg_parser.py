@@ -0,0 +1,63 @@
+import pytest
+from arg_parser import parse_args
+
+
+def test_prune_rejects_negative_counts(capsys):
+    with pytest.raises(SystemExit):
+        parse_args(["yadisk", "prune", "disk:/backups", "--keep-daily", "-1"])
+    assert "is negative" in capsys.readouterr().err
+    args = parse_args(
+        ["yadisk", "prune", "disk:/backups", "--keep-daily", "7"])
+    assert (args.keep_daily, args.keep_last) == (7, 0)
+
+
+@pytest.mark.parametrize("operation", ["ls", "du"])
+@pytest.mark.parametrize("top", ["0", "-5"])
+def test_top_must_be_positive(operation, top, capsys):
+    with pytest.raises(SystemExit):
+        parse_args(["yadisk", operation, "disk:/", "--top", top])
+    assert "isn't positive" in capsys.readouterr().err
+    args = parse_args(["yadisk", operation, "disk:/", "--top", "3"])
+    assert args.top == 3
+
+
+def test_du_depth_isnt_negative(capsys):
+    with pytest.raises(SystemExit):
+        parse_args(["yadisk", "du", "disk:/", "--depth", "-1"])
+    assert "is negative" in capsys.readouterr().err
+    assert parse_args(["yadisk", "du", "disk:/", "-d", "0"]).depth == 0
+
+
+@pytest.mark.parametrize("argv", [
+    ["yadisk", "ul", "local", "disk:/"],
+    ["yadisk", "rm", "disk:/old"],
+    ["yadisk", "verify", "local", "disk:/"],
+])
+def test_jobs_must_be_positive(argv, capsys):
+    with pytest.raises(SystemExit):
+        parse_args(argv + ["-j", "0"])
+    assert "isn't positive" in capsys.readouterr().err
+    assert parse_args(argv + ["-j", "2"]).jobs == 2
+
+
+@pytest.mark.parametrize("option", ["--resume", "--dedup"])
+@pytest.mark.parametrize("mode", [["--pack"], ["--mirror", "/backup"]])
+def test_ul_resume_and_dedup_exclude_pack_and_mirror(option, mode, capsys):
+    with pytest.raises(SystemExit):
+        parse_args(["yadisk", "ul", "local", "disk:/", option] + mode)
+    assert "can't be combined" in capsys.readouterr().err
+    assert parse_args(["yadisk", "ul", "local", "disk:/", option])
+
+
+@pytest.mark.parametrize("option", ["--compress", "--encrypt"])
+def test_ul_dedup_excludes_compression_and_encryption(option, capsys):
+    with pytest.raises(SystemExit):
+        parse_args(["yadisk", "ul", "local", "disk:/", "--dedup", option])
+    assert "can't be combined with -d/--dedup" in capsys.readouterr().err
+
+
+def test_pack_size_must_be_positive(capsys):
+    with pytest.raises(SystemExit):
+        parse_args(["yadisk", "ul", "local", "disk:/", "--pack",
+                    "--pack-size", "0"])
+    assert "isn't positive" in capsys.readouterr().err
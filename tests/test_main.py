@@ -0,0 +1,58 @@
+import subprocess
+import sys
+from collections import Counter
+from pathlib import Path
+from unittest.mock import Mock
+import pytest
+from arg_parser import parse_args
+from main import execute, open_cipher
+
+ROOT = Path(__file__).parents[1]
+
+
+@pytest.mark.parametrize("result, code", [
+    (Counter(), 0),
+    (Counter(missing=0, extra=0, mismatched=0), 0),
+    (Counter(missing=1), 1),
+    (Counter(extra=2), 1),
+    (Counter(mismatched=1), 1),
+])
+def test_verify_exit_code(result, code, capsys):
+    wrapper = Mock()
+    wrapper.verify.return_value = result
+    args = parse_args(["yadisk", "verify", "local", "disk:/backup"])
+    assert execute(args, wrapper) == code
+    assert capsys.readouterr().out
+
+
+def test_wrappers_dont_import_codecs_journal_and_packs():
+    code = ("import sys, main;"
+            " main.make_wrapper('gdrive'); main.make_wrapper('yadisk');"
+            " print([name for name in ('cloudbackup.compression',"
+            " 'cloudbackup.journal', 'cloudbackup.packs')"
+            " if name in sys.modules])")
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout == "[]\n"
+
+
+def test_created_key_backup_warning(tmp_path, capsys):
+    pytest.importorskip("cryptography")
+    key_file = tmp_path / "config" / "encryption.key"
+    assert open_cipher(key_file, create=True) is not None
+    assert key_file.exists()
+    assert str(key_file) in capsys.readouterr().err
+
+
+def test_legacy_key_used_until_moved(tmp_path, monkeypatch, capsys):
+    pytest.importorskip("cryptography")
+    from cloudbackup import _defaults
+    from cloudbackup.encryption import create_key
+    key_file = tmp_path / "config" / "encryption.key"
+    legacy = tmp_path / "service" / "encryption.key"
+    create_key(legacy)
+    monkeypatch.setattr(_defaults, "ENCRYPTION_KEY_PATH", key_file)
+    monkeypatch.setattr(_defaults, "LEGACY_ENCRYPTION_KEY_PATH", legacy)
+    assert open_cipher(key_file, create=True) is not None
+    assert not key_file.exists()
+    assert str(legacy) in capsys.readouterr().err
@@ -1,50 +1,1309 @@
+import contextlib
+import contextvars
+import datetime
+import errno
+import fnmatch
+import functools
+import hashlib
+import heapq
+import itertools
+import os
+import posixpath
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import Union
-from pathlib import Path
-from wrappers.cli_msgs import DeleteConfirm, DeleteMessage
-from wrappers.defaults import RM_ACCESS_DENIED_MSG
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import ExitStack
+from typing import TYPE_CHECKING, Callable, Union
+from pathlib import Path, PurePosixPath
+from cloudbackup.diff import (
+    ADDED,
+    CHANGED_MTIME,
+    REMOVED,
+    Entry,
+    diff_trees,
+    walk_local
+)
+from cloudbackup.exceptions import (
+    ApiResponseException,
+    ChecksumMismatchException,
+    DecryptionException
+)
+from cloudbackup.file_objects import FileListing
+from cloudbackup.hashing import HashCache, HashingReader, HashPool
+from cloudbackup.pipe import Pipe
+from wrappers.cli_msgs import (
+    BulkDeleteConfirm,
+    CopyMessage,
+    DedupMessage,
+    DeleteConfirm,
+    DeleteMessage,
+    DUMessage,
+    DiffMessage,
+    DLRetryMessage,
+    PlanMessage,
+    PruneKeepMessage,
+    RestoreMessage,
+    SnapshotCopyMessage,
+    SnapshotMessage,
+    ULMessage,
+    UnpackMessage,
+    VerifyMessage
+)
+from wrappers.defaults import (
+    RM_ACCESS_DENIED_MSG,
+    DEFAULT_JOBS,
+    DOWNLOAD_ATTEMPTS,
+    GLOB_CHARS,
+    OPERATION_FAILED_MSG,
+    OPERATION_POLL_INTERVAL
+)
+from wrappers.content_index import ContentIndex
+from wrappers.retention import (
+    RetentionPolicy,
+    SnapshotDir,
+    parse_snapshot_name
+)
+from wrappers.selection import select_recorded
+from wrappers.stages import StagedStream, Stages
+from wrappers.transfer_plan import TransferPlan
+
+if TYPE_CHECKING:
+    # catalog is imported and opened by main.py only for snapshot
+    # commands, codecs, journal and packs are imported by commands
+    # which use them, so they don't slow down start of the others
+    from cloudbackup.catalog import SnapshotCatalog
+    from cloudbackup.compression import Codec
+    from cloudbackup.journal import Journal
 
 
 class BaseWrapper(ABC):
 
+    # fields of storage file objects with size and md5
+    _CHECKSUM_FIELDS = ()
+
     def __init__(self, storage):
         self._storage = storage
 
-    def _put_file(self, local_path: Path, destination: Union[str, None]):
+    def _put_file(
+            self,
+            local_path: Path,
+            destination: Union[str, None]
+    ) -> tuple:
         """
         Get upload link and then upload file raw binary data using this link.
+
+        Returns:
+            Tuple of Digests of local content and id of stored file or
+             None if storage doesn't report it.
         """
         link = self._storage.get_upload_link(local_path, destination)
-        self._storage.upload_file(link, local_path.read_bytes())
+        return self._send_file(
+            link,
+            local_path,
+            discard=lambda: self._discard_upload(destination, local_path.name)
+        )
 
-    def remove(self, file_id: str, permanently=False) -> None:
+    def _replace_file(
+            self,
+            local_path: Path,
+            remote_file,
+            stream: StagedStream = None
+    ) -> tuple:
         """
-        Remove file or directory on GoogleDrive or YandexDisk storage.
+        Replace content of existing remote file with local file content.
+        File whose stored content differs from local one is moved to the
+        trash.
         """
-        file = self._storage.get_file(file_id)
-        user_confirm = input(
-            DeleteConfirm(file.name, permanently).str_value()
+        link = self._get_replace_link(local_path, remote_file)
+        return self._send_file(
+            link,
+            local_path,
+            stream,
+            discard=lambda: self._storage.remove(remote_file.id, False)
         )
-        if user_confirm in {"y", "yes", ""}:
-            self._storage.remove(file_id, permanently)
-            print(DeleteMessage(file.name, permanently).str_value())
+
+    def _send_file(
+            self,
+            link: str,
+            local_path: Path,
+            stream: StagedStream = None,
+            discard: Callable[[], None] = None
+    ) -> tuple:
+        """
+        Streams file to storage hashing the same buffers which are sent,
+        and compares local md5 with md5 storage computed for received
+        content. If staged `stream` of file is given it's sent instead.
+        If checksums differ `discard()` is called to remove stored
+        content, so corrupted copy isn't taken for backup.
+
+        Returns:
+            Tuple of Digests of local content and id of stored file or
+             None if storage doesn't report it.
+
+        Raises:
+            ChecksumMismatchException: if content stored by storage
+             differs from local one.
+        """
+        if stream is not None:
+            remote_md5, file_id = self._upload_content(link, stream)
+            digests = stream.digests()
+            sent_md5 = stream.md5()
+        else:
+            with HashingReader(local_path) as reader:
+                # empty body is sent as bytes, otherwise it would be chunked
+                remote_md5, file_id = self._upload_content(
+                    link, reader if len(reader) else b"")
+                digests = reader.digests()
+            sent_md5 = digests.md5
+        if remote_md5 is not None and remote_md5 != sent_md5:
+            if discard is not None:
+                # mismatch is reported even if copy can't be removed
+                with contextlib.suppress(ApiResponseException):
+                    discard()
+            raise ChecksumMismatchException(local_path, sent_md5, remote_md5)
+        return digests, file_id
+
+    def _upload_content(self, link: str, data) -> tuple:
+        """
+        Sends `data` by upload `link`.
+
+        Returns:
+            Tuple of md5 of stored content and id of stored file, each
+             is None if storage doesn't report it.
+        """
+        return self._storage.upload_file(link, data), None
+
+    def _discard_upload(self, destination, name: str) -> None:
+        """
+        Permanently removes file `name` uploaded to `destination` passed
+        to `_put_file`. The latest modified file with this name is taken,
+        GoogleDrive can hold several files with the same name.
+        """
+        uploaded = [
+            file for file in self._list_dir(destination) if file.name == name
+        ]
+        if uploaded:
+            file = max(uploaded, key=lambda f: f.modified or 0)
+            self._storage.remove(file.id, True)
+
+    @staticmethod
+    def _plan_upload(journal: "Journal", local_file: Path) -> None:
+        """
+        Walks local tree into journal. Every directory is planned before
+        its content, so it's created before anything is put into it.
+        Symlinks to directories aren't followed and are skipped, like by
+        `walk_local`, so `ul` stores the same tree `sync` and `diff` see.
+        """
+        if local_file.is_file():
+            journal.add(
+                "file", local_file, local_file.name,
+                size=local_file.stat().st_size
+            )
+            return
+        if not local_file.is_dir():
+            raise FileNotFoundError(
+                errno.ENOENT, os.strerror(errno.ENOENT), local_file)
+        stack = [(local_file, None)]
+        while stack:
+            path, parent = stack.pop()
+            item_id = journal.add("dir", path, path.name, parent)
+            with os.scandir(path) as it:
+                children = sorted(it, key=lambda e: e.name)
+            for child in children:
+                if child.is_dir(follow_symlinks=False):
+                    stack.append((Path(child.path), item_id))
+                elif child.is_file():
+                    journal.add(
+                        "file", child.path, child.name, item_id,
+                        size=child.stat().st_size
+                    )
+
+    def _upload(
+            self,
+            local_file: Path,
+            destination,
+            journal: "Journal" = None,
+            dedup: bool = False,
+            compression: "Codec" = None,
+            cipher=None
+    ) -> None:
+        """
+        Uploads file or directory into remote `destination` directory.
+
+        Job is planned into `journal` first and then items are
+        transferred one by one. If journal of interrupted job is passed
+        only items which weren't done are transferred. Items which were in
+        flight could have been completed, so already existing remote file
+        is replaced and existing directory is reused instead of creating
+        duplicates. If `dedup` is True files whose content is already
+        stored are copied by storage instead of being uploaded. If
+        `compression` codec is given compressible files are stored
+        compressed, if `cipher` (see `cloudbackup.encryption.Cipher`) is
+        given files are stored encrypted, with suffixes of applied
+        stages appended to their names (see `wrappers.stages.Stages`).
+        """
+        from cloudbackup.compression import Compressor
+        from cloudbackup.journal import Journal
+        if journal is None:
+            journal = Journal()
+        if not journal.planned:
+            journal.clear()
+            self._plan_upload(journal, local_file)
+            journal.set_planned()
+        journal.resume()
+        with ExitStack() as stack:
+            index = stages = compressor = None
+            if dedup:
+                pool = stack.enter_context(HashPool(cache=HashCache()))
+                index = self._index_content(pool)
+            if compression is not None:
+                compressor = stack.enter_context(Compressor(compression))
+            if compressor is not None or cipher is not None:
+                stages = Stages(compressor, cipher)
+            self._transfer(journal, destination, index, stages)
+
+    def _transfer(
+            self,
+            journal: "Journal",
+            destination,
+            index: ContentIndex = None,
+            stages: Stages = None
+    ) -> None:
+        for item in journal.pending():
+            if item.parent is None:
+                parent = destination
+            else:
+                parent = journal.remote_id(item.parent)
+            local_path = Path(item.source)
+            print(ULMessage(local_path).str_value())
+            name, stream = item.name, None
+            if item.kind != "dir" and stages is not None:
+                name = stages.remote_name(local_path, item.name)
+                if name != item.name:
+                    stream = stages.stream(local_path, item.name, name)
+            existing = None
+            if item.attempts:
+                existing = self._find_child(parent, name)
+            journal.start(item.id)
+            if item.kind == "dir":
+                if existing is not None and existing.type == "dir":
+                    remote_id = existing.id
+                else:
+                    remote_id = self._make_dir(parent, item.name)
+            else:
+                remote_id = None
+                if existing is not None and existing.type != "dir":
+                    self._replace_file(local_path, existing, stream)
+                elif stream is not None:
+                    self._store_staged(local_path, stream, parent, name)
+                else:
+                    self._store_file(local_path, parent, name, index)
+            journal.finish(item.id, remote_id)
+
+    def _index_content(self, pool: HashPool) -> ContentIndex:
+        """
+        Lists all files on storage into ContentIndex, local files are
+        hashed by `pool`.
+        """
+        return ContentIndex(
+            self._iter_files(extra_fields=self._CHECKSUM_FIELDS), pool.md5)
+
+    def _store_file(
+            self,
+            local_path: Path,
+            parent,
+            name: str,
+            index: ContentIndex = None
+    ) -> None:
+        """
+        Uploads local file as `name` into remote `parent` directory. If
+        `index` knows remote file with the same content, the file is
+        copied by storage and nothing is uploaded.
+        """
+        destination = self._upload_destination(parent, name)
+        if index is None:
+            self._put_file(local_path=local_path, destination=destination)
+            return
+        key = index.key(local_path)
+        source = index.find(key)
+        if source is not None:
+            print(DedupMessage(local_path).str_value())
+            self._copy_remote(source, parent, name)
+            return
+        digests, file_id = self._put_file(
+            local_path=local_path, destination=destination)
+        if file_id is None:
+            file_id = functools.partial(self._uploaded_id, parent, name)
+        index.add(key, file_id, digests.md5)
+
+    def _store_staged(
+            self,
+            local_path: Path,
+            stream: StagedStream,
+            parent,
+            name: str
+    ) -> None:
+        """
+        Uploads staged `stream` of local file as `name` into remote
+        `parent` directory.
+        """
+        destination = self._upload_destination(parent, name)
+        link = self._storage.get_upload_link(PurePosixPath(name), destination)
+        self._send_file(
+            link,
+            local_path,
+            stream,
+            discard=lambda: self._discard_upload(destination, name)
+        )
+
+    def _uploaded_id(self, parent, name: str):
+        """
+        Returns id of file `name` uploaded into `parent` directory.
+        """
+        return self._find_child(parent, name).id
+
+    def _find_child(self, parent, name: str):
+        """
+        Returns file `name` of remote `parent` directory or None.
+        """
+        for file in self._list_dir(parent):
+            if file.name == name:
+                return file
+        return None
+
+    @staticmethod
+    def _receive_file(
+            open_stream,
+            dl_path: Path,
+            md5: str = None,
+            summary: Counter = None,
+            decode: Callable = None
+    ) -> None:
+        """
+        Writes chunks yielded by `open_stream()` to `dl_path` computing
+        md5 of received data on the way. If md5 differs from `md5` of
+        remote file, file is downloaded again at most DOWNLOAD_ATTEMPTS
+        times. Results are counted in `summary`. Received chunks are
+        passed through `decode` function if it's given (see
+        `Stages.decoder`).
+
+        Raises:
+            ChecksumMismatchException: if every attempt was corrupted.
+        """
+        if summary is None:
+            summary = Counter()
+        for attempt in range(DOWNLOAD_ATTEMPTS):
+            if attempt:
+                print(DLRetryMessage(dl_path).str_value())
+            hasher = hashlib.md5()
+
+            def received():
+                for chunk in open_stream():
+                    hasher.update(chunk)
+                    yield chunk
+
+            chunks = received()
+            if decode is not None:
+                chunks = decode(chunks)
+            with open(dl_path, "wb") as file:
+                try:
+                    for chunk in chunks:
+                        file.write(chunk)
+                except DecryptionException:
+                    raise DecryptionException(dl_path) from None
+            if md5 is None:
+                summary["unverified"] += 1
+                return
+            if hasher.hexdigest() == md5:
+                summary["verified"] += 1
+                if attempt:
+                    summary["retried"] += 1
+                return
+        raise ChecksumMismatchException(dl_path, hasher.hexdigest(), md5)
+
+    def remove(
+            self,
+            file_ids: Union[str, list],
+            permanently=False,
+            jobs: int = DEFAULT_JOBS
+    ) -> None:
+        """
+        Remove files or directories on GoogleDrive or YandexDisk storage.
+
+        Every target is file id (path for YandexDisk) or glob pattern of
+        names in directory, e.g. 'disk:/logs/*.log'. User is asked for
+        confirmation once, then files are removed by pool of `jobs`
+        threads (by batch requests on GoogleDrive). Deletions YandexDisk
+        performs in background are polled until they are complete.
+        """
+        if isinstance(file_ids, str):
+            file_ids = [file_ids]
+        targets = []
+        for file_id in file_ids:
+            targets.extend(self._expand(file_id))
+        if len(targets) == 1:
+            confirm = DeleteConfirm(targets[0][1].name, permanently)
         else:
+            confirm = BulkDeleteConfirm(
+                [file.name for _, file in targets], permanently)
+        user_confirm = input(confirm.str_value())
+        if user_confirm not in {"y", "yes", ""}:
             raise PermissionError(RM_ACCESS_DENIED_MSG)
+        self._remove_all(targets, permanently, jobs)
+
+    def _remove_all(self, targets, permanently, jobs, on_removed=None):
+        """
+        Removes (id, file) targets by pool of `jobs` threads and waits
+        for background operations. `on_removed(file)` is called for every
+        removed file. Failed removals don't stop the others: operations
+        which were started are polled anyway.
+
+        Raises:
+            ApiResponseException: first error of file which wasn't
+             removed, after all operations complete.
+        """
+        operations = {}
+        errors = []
+
+        def removed(file):
+            print(DeleteMessage(file.name, permanently).str_value())
+            if on_removed is not None:
+                on_removed(file)
+
+        with ThreadPoolExecutor(jobs) as pool:
+            def remove_file(target):
+                file_id, file = target
+                try:
+                    link = self._storage.remove(file_id, permanently)
+                except ApiResponseException as e:
+                    errors.append(e)
+                    return
+                if link:
+                    operations[link] = file
+                else:
+                    removed(file)
+
+            self._run_concurrently(pool, remove_file, targets, jobs)
+            try:
+                self._wait_operations(pool, operations, removed)
+            except ApiResponseException as e:
+                errors.append(e)
+        if errors:
+            raise errors[0]
+
+    def _expand(self, file_id: str) -> list:
+        """
+        Returns list of (id, file) pairs for target of `rm`. Target with
+        glob characters in its last part is matched against names of
+        files in its directory, unless some file has exactly this name,
+        so files like 'report[1].txt' can be removed too.
+
+        Raises:
+            FileNotFoundError: if nothing matches glob pattern.
+        """
+        parent, pattern = posixpath.split(file_id)
+        if not GLOB_CHARS.intersection(pattern):
+            return [(file_id, self._storage.get_file(file_id))]
+        files = list(self._glob(parent, pattern))
+        exact = [file for file in files if file.name == pattern]
+        matches = [(file.id, file) for file in exact or files]
+        if not matches:
+            raise FileNotFoundError(
+                errno.ENOENT, os.strerror(errno.ENOENT), file_id)
+        return matches
+
+    def _glob(self, parent, pattern: str):
+        """
+        Yields files of `parent` directory which names match `pattern`
+        or equal it, root directory if `parent` is empty.
+        """
+        for file in self._list_dir(parent or "/"):
+            if (file.name == pattern
+                    or fnmatch.fnmatchcase(file.name, pattern)):
+                yield file
+
+    def _wait_operations(self, pool, operations: dict, removed):
+        """
+        Polls statuses of all background operations concurrently until
+        every one of them completes, `removed(file)` is called when file
+        is removed.
+
+        Raises:
+            ApiResponseException: if any operation failed.
+        """
+        failed = []
+        while operations:
+            links = list(operations)
+            statuses = list(pool.map(self._storage.operation_status, links))
+            for link, status in zip(links, statuses):
+                if status == "in-progress":
+                    continue
+                file = operations.pop(link)
+                if status == "failed":
+                    failed.append(file.name)
+                else:
+                    removed(file)
+            if operations:
+                time.sleep(OPERATION_POLL_INTERVAL)
+        if failed:
+            raise ApiResponseException(
+                None, OPERATION_FAILED_MSG.format(", ".join(failed)))
 
     def get_file(self, file_id: str):
         """
-        Gets file meta-information by file_id.
+        Gets file meta-information by file_id including size and checksum.
+        """
+        return self._storage.get_file(
+            file_id, extra_fields=self._CHECKSUM_FIELDS)
+
+    @staticmethod
+    def _print_top(files, top: int, key=None, reverse=False) -> None:
+        """
+        Prints `top` first files of streaming listing.
+
+        If `key` is None listing is considered to be already sorted by
+        storage, so iteration stops as soon as `top` files are received.
+        Otherwise `top` smallest (or largest if `reverse`) files by `key`
+        are selected with bounded heap over the whole listing.
+        """
+        if key is None:
+            winners = itertools.islice(files, top)
+        elif reverse:
+            winners = heapq.nlargest(top, files, key=key)
+        else:
+            winners = heapq.nsmallest(top, files, key=key)
+        for file in winners:
+            print(file.str_value())
+
+    def du(self, file_id: str, depth: int = None, top: int = None) -> None:
+        """
+        Prints total size of every folder below `file_id` (or below root
+        if `file_id` is None). Sizes are computed by one streaming pass
+        over all files on storage.
+        """
+        usage, top_folder = self._disk_usage(file_id)
+        try:
+            report = usage.report(top_folder, depth=depth, limit=top)
+        except KeyError:
+            raise FileNotFoundError(
+                errno.ENOENT, os.strerror(errno.ENOENT), file_id)
+        for path, size in report:
+            print(DUMessage(path, size).str_value())
+
+    def _walk(self, dir_id, prefix: tuple = ()):
+        """
+        Yields entries of remote directory tree sorted by path.
+        Directories are listed one by one and sorted locally, so order
+        doesn't depend on how storage compares names. Listings of all
+        directories on the way down are held at once, so they are kept
+        packed in FileListing and entries are read from its columns.
+        """
+        children = FileListing(self._list_dir(dir_id))
+        for index in sorted(range(len(children)), key=children.name):
+            path = prefix + (children.name(index),)
+            file_type = children.type(index)
+            file_id = children.id(index)
+            yield Entry(
+                path, file_type, children.size(index),
+                children.modified(index), children.md5(index), file_id
+            )
+            if file_type == "dir":
+                yield from self._walk(file_id, path)
+
+    def _changes(
+            self,
+            local_dir: Path,
+            remote_dir,
+            checksum=False,
+            remote_dirs: dict = None,
+            jobs: int = DEFAULT_JOBS
+    ):
+        """
+        Returns generator of differences between content of local
+        directory and content of remote directory. If `remote_dirs` dict
+        is passed it's filled with ids of remote directories by their
+        paths while tree is walked. If `checksum` is True local files are
+        hashed by `jobs` threads.
+        """
+        if not local_dir.is_dir():
+            raise NotADirectoryError(
+                errno.ENOTDIR, os.strerror(errno.ENOTDIR), str(local_dir))
+        remote = self._walk(remote_dir)
+        if remote_dirs is not None:
+            remote_dirs[()] = remote_dir
+            remote = self._record_dirs(remote, remote_dirs)
+        if checksum:
+            return self._hashed_changes(local_dir, remote, jobs)
+        return diff_trees(walk_local(local_dir), remote)
+
+    @staticmethod
+    def _hashed_changes(local_dir: Path, remote, jobs: int):
+        """
+        Local files are hashed by pool running ahead of comparison, and
+        digests are cached, so unchanged files are read only once.
+        """
+        with HashPool(jobs, cache=HashCache()) as pool:
+            yield from diff_trees(
+                pool.prefetch(walk_local(local_dir)),
+                remote,
+                checksum=True,
+                hasher=pool.md5
+            )
+
+    @staticmethod
+    def _record_dirs(entries, remote_dirs: dict):
+        for entry in entries:
+            if entry.type == "dir":
+                remote_dirs[entry.path] = entry.id
+            yield entry
+
+    def diff(self, local_dir: Path, remote_dir, checksum=False) -> None:
+        """
+        Prints what differs between local directory and remote directory
+        without transferring any file data.
+        """
+        for change in self._changes(local_dir, remote_dir, checksum):
+            print(DiffMessage(change).str_value())
+
+    def verify(
+            self,
+            local_dir: Path,
+            remote_dir,
+            jobs: int = DEFAULT_JOBS
+    ) -> Counter:
+        """
+        Prints files which are missing on remote, extra files on remote
+        and files whose size or md5 differs. Nothing is downloaded: local
+        files are hashed by `jobs` threads and compared with checksums
+        from remote listing. Modification times are ignored, so files
+        storage reports no checksum for are compared only by size.
+
+        Returns:
+            Counter of missing, extra and mismatched files.
+        """
+        result = Counter()
+        for change in self._changes(
+                local_dir, remote_dir, checksum=True, jobs=jobs):
+            if change.kind == CHANGED_MTIME:
+                continue
+            if change.kind == ADDED:
+                result["missing"] += 1
+            elif change.kind == REMOVED:
+                result["extra"] += 1
+            else:
+                result["mismatched"] += 1
+            print(VerifyMessage(change).str_value())
+        return result
+
+    def sync(
+            self,
+            local_dir: Path,
+            remote_dir,
+            dry_run=False,
+            permanently=False,
+            checksum=False,
+            jobs=DEFAULT_JOBS,
+            dedup=False
+    ) -> None:
+        """
+        Make content of remote directory equal to content of local one.
+        Only differences are transferred: new folders are created, new
+        and changed files are uploaded, files and folders which don't
+        exist locally are deleted (moved to the trash by default).
+        Deletions and transfers are run by pool of `jobs` threads.
+
+        If `dedup` is True new files whose content is already stored are
+        copied by storage instead of being uploaded. Then deletions are
+        done after uploads, so moved files are copied from their old
+        location before it's deleted.
+        """
+        remote_dirs = {}
+        plan = TransferPlan(
+            self._changes(local_dir, remote_dir, checksum, remote_dirs))
+        if dry_run:
+            for line in PlanMessage(plan, permanently).lines():
+                print(line)
+            return
+        if not dedup:
+            self._delete_all(plan.deletes, permanently, jobs)
+            self._transfer_plan(plan, remote_dirs, jobs)
+            return
+        # entries replaced by entries of other type must be deleted first
+        created = {action.path for action in plan.mkdirs + plan.uploads}
+        replaced = [a for a in plan.deletes if a.path in created]
+        self._delete_all(replaced, permanently, jobs)
+        with HashPool(jobs, cache=HashCache()) as pool:
+            self._transfer_plan(
+                plan, remote_dirs, jobs, self._index_content(pool))
+        self._delete_all(
+            [a for a in plan.deletes if a.path not in created],
+            permanently,
+            jobs
+        )
+
+    def _delete_all(self, actions, permanently, jobs):
+        with ThreadPoolExecutor(jobs) as pool:
+            self._run_concurrently(
+                pool,
+                lambda action: self._delete(action.remote, permanently),
+                actions,
+                jobs
+            )
+
+    def _transfer_plan(self, plan, remote_dirs, jobs, index=None):
+        for action in plan.mkdirs:
+            remote_dirs[action.path] = self._make_dir(
+                remote_dirs[action.path[:-1]], action.path[-1])
+        with ThreadPoolExecutor(jobs) as pool:
+            self._run_concurrently(
+                pool,
+                lambda action: self._upload_new(action, remote_dirs, index),
+                plan.uploads,
+                jobs
+            )
+            self._run_concurrently(
+                pool,
+                lambda action: self._update(action),
+                plan.updates,
+                jobs
+            )
+
+    def snapshot(
+            self,
+            local_dir: Path,
+            root,
+            catalog: "SnapshotCatalog",
+            name: str = None,
+            jobs: int = DEFAULT_JOBS
+    ) -> Counter:
+        """
+        Makes snapshot of local directory: new folder `name` (today's
+        date by default) is created in remote `root` folder and the whole
+        tree is stored into it. Files whose size and modification time
+        are the same as in previous snapshot from `catalog` are copied by
+        storage from previous snapshot, other files are uploaded by pool
+        of `jobs` threads. Remote ids and checksums of stored files are
+        recorded into `catalog`. Folder left in `root` by interrupted
+        snapshot `name` is removed and snapshot is made again.
+
+        Returns:
+            Counter of uploaded and copied files.
+
+        Raises:
+            FileExistsError: if snapshot `name` was made already or
+             `root` has other file `name`, nothing is created then.
+        """
+        if not local_dir.is_dir():
+            raise NotADirectoryError(
+                errno.ENOTDIR, os.strerror(errno.ENOTDIR), str(local_dir))
+        root = self._normalize_destination(root)
+        if name is None:
+            name = datetime.date.today().isoformat()
+        existing = self._find_child(root, name)
+        if (existing is not None
+                and str(existing.id) == catalog.incomplete(root, name)):
+            # content of interrupted snapshot isn't recorded in catalog
+            self._remove_all([(existing.id, existing)], True, 1)
+            existing = None
+        if (any(s.name == name for s in catalog.snapshots(root))
+                or existing is not None):
+            raise FileExistsError(
+                errno.EEXIST, os.strerror(errno.EEXIST),
+                posixpath.join(str(root), name))
+        previous = catalog.latest(root)
+        snapshot_dir = self._make_dir(root, name)
+        snapshot = catalog.begin(
+            root, name, snapshot_dir, local_dir.absolute())
+        remote_dirs = {(): snapshot_dir}
+        summary = Counter()
+
+        def store_files():
+            for entry in walk_local(local_dir):
+                parent = remote_dirs[entry.path[:-1]]
+                if entry.type == "dir":
+                    remote_dirs[entry.path] = self._make_dir(
+                        parent, entry.path[-1])
+                    continue
+                catalog.add_file(
+                    snapshot, entry.path, entry.size, entry.modified)
+                old = None
+                if previous is not None:
+                    old = catalog.file(previous.id, entry.path)
+                if (old is not None and old.remote_id is not None
+                        and (old.size, old.mtime) == (
+                            entry.size, entry.modified)):
+                    summary["copied"] += 1
+                    yield entry, parent, old
+                else:
+                    summary["uploaded"] += 1
+                    yield entry, parent, None
+
+        def store_file(args):
+            entry = args[0]
+            remote_id, md5 = self._snapshot_file(*args)
+            catalog.set_remote(snapshot, entry.path, remote_id, md5)
+
+        with ThreadPoolExecutor(jobs) as pool:
+            self._run_concurrently(pool, store_file, store_files(), jobs)
+        catalog.complete(snapshot)
+        return summary
+
+    def _snapshot_file(self, entry: Entry, parent, old) -> tuple:
+        """
+        Copies file `old` recorded in previous snapshot into snapshot or
+        uploads local file if there is no such file.
+
+        Returns:
+            Remote id and md5 of stored file.
+        """
+        name = entry.path[-1]
+        if old is not None:
+            print(SnapshotCopyMessage(entry.id).str_value())
+            return self._copy_remote(old.remote_id, parent, name), old.md5
+        print(ULMessage(entry.id).str_value())
+        digests, file_id = self._put_file(
+            local_path=entry.id,
+            destination=self._upload_destination(parent, name)
+        )
+        if file_id is None:
+            file_id = self._uploaded_id(parent, name)
+        return file_id, digests.md5
+
+    def snapshots(self, root, catalog: "SnapshotCatalog") -> None:
+        """
+        Prints snapshots made into remote `root` folder from `catalog`,
+        storage isn't requested.
+        """
+        for snapshot in catalog.snapshots(self._normalize_destination(root)):
+            print(SnapshotMessage(snapshot).str_value())
+
+    def restore(
+            self,
+            root,
+            name: str,
+            local_destination: Path,
+            catalog: "SnapshotCatalog",
+            path: str = None,
+            ov: bool = False
+    ) -> Counter:
+        """
+        Downloads snapshot `name` made into remote `root` folder, or only
+        its file at `path` relative to snapshot root. Remote id is taken
+        from `catalog`, so nothing is listed on storage.
+
+        Returns:
+            Counter of verified, retried and unverified files.
+
+        Raises:
+            FileExistsError: if file exists locally and `ov` is False.
+        """
+        snapshot = catalog.find(self._normalize_destination(root), name)
+        if path is None:
+            return self._restore_snapshot(
+                snapshot, catalog, local_destination, ov)
+        file = catalog.file(snapshot.id, tuple(PurePosixPath(path).parts))
+        if file is None or file.remote_id is None:
+            raise FileNotFoundError(
+                errno.ENOENT, os.strerror(errno.ENOENT), path)
+        return self.download(
+            self.get_file(file.remote_id), local_destination, ov)
+
+    def _restore_snapshot(
+            self,
+            snapshot,
+            catalog: "SnapshotCatalog",
+            local_destination: Path,
+            ov: bool
+    ) -> Counter:
+        """
+        Downloads files of whole snapshot recorded in `catalog` one by one
+        into folder named after snapshot, so YandexDisk doesn't zip it.
+        Empty folders aren't recorded and aren't restored. Nothing is
+        downloaded if some file exists and `ov` is False.
+        """
+        dl_dir = Path(local_destination, snapshot.name)
+        files = select_recorded(catalog.files(snapshot.id))
+        for file in files:
+            dl_path = dl_dir.joinpath(*file.path.split("/"))
+            if dl_path.exists() and not ov:
+                raise FileExistsError(
+                    errno.EEXIST, os.strerror(errno.EEXIST), str(dl_path))
+        summary = Counter()
+        for file in files:
+            dl_path = dl_dir.joinpath(*file.path.split("/"))
+            print(RestoreMessage(dl_path).str_value())
+            dl_path.parent.mkdir(parents=True, exist_ok=True)
+            self._receive_file(
+                lambda: self._open_stream(file.remote_id),
+                dl_path,
+                file.md5,
+                summary
+            )
+        return summary
+
+    def prune(
+            self,
+            root,
+            policy: RetentionPolicy,
+            catalog: "SnapshotCatalog",
+            permanently=False,
+            dry_run=False,
+            jobs: int = DEFAULT_JOBS
+    ) -> int:
+        """
+        Removes snapshots of remote `root` folder expired by `policy`.
+        Snapshots are taken from `catalog`, if it has none, folders of
+        `root` named by dates are treated as snapshots. Plan is printed
+        and user is asked for confirmation once, then expired snapshots
+        are removed concurrently by pool of `jobs` threads.
+
+        Returns:
+            Number of removed snapshots.
+        """
+        root = self._normalize_destination(root)
+        kept, expired = policy.apply(self._snapshot_dirs(root, catalog))
+        for snapshot in kept:
+            print(PruneKeepMessage(snapshot.name).str_value())
+        if not expired:
+            return 0
+        confirm = BulkDeleteConfirm(
+            [snapshot.name for snapshot in expired], permanently)
+        if dry_run:
+            print(confirm.plan())
+            return 0
+        user_confirm = input(confirm.str_value())
+        if user_confirm not in {"y", "yes", ""}:
+            raise PermissionError(RM_ACCESS_DENIED_MSG)
+
+        def forget(snapshot):
+            if snapshot.catalog_id is not None:
+                catalog.remove(snapshot.catalog_id)
+
+        self._remove_all(
+            [(snapshot.remote_id, snapshot) for snapshot in expired],
+            permanently,
+            jobs,
+            on_removed=forget
+        )
+        return len(expired)
+
+    def _snapshot_dirs(self, root, catalog: "SnapshotCatalog") -> list:
+        snapshots = [
+            SnapshotDir(
+                snapshot.name,
+                datetime.datetime.fromtimestamp(snapshot.created),
+                snapshot.remote_id,
+                snapshot.id
+            )
+            for snapshot in catalog.snapshots(root)
+        ]
+        if snapshots:
+            return snapshots
+        for file in self._list_dir(root):
+            time = parse_snapshot_name(file.name)
+            if file.type == "dir" and time is not None:
+                snapshots.append(SnapshotDir(file.name, time, file.id, None))
+        return snapshots
+
+    def unpack(
+            self,
+            remote_dir,
+            local_destination: Path,
+            paths: list = None,
+            ov: bool = False,
+            jobs: int = DEFAULT_JOBS
+    ) -> Counter:
+        """
+        Restores files packed by packed upload of remote directory into
+        `local_destination`, all packed files or only files and folders
+        with given `paths` relative to uploaded directory. Files are
+        looked up in index of packs and only their byte ranges are
+        downloaded. Close files of the same pack are fetched by one
+        request, requests are run by pool of `jobs` threads.
+
+        Returns:
+            Counter of restored "files" and "requests".
+
+        Raises:
+            FileNotFoundError: if directory has no packs or index of
+             packs, or some of `paths` isn't packed.
+            FileExistsError: if file exists locally and `ov` is False.
+            UnsafePathException: if index has absolute path or path
+             with '..'.
+        """
+        from cloudbackup.packs import (
+            INDEX_NAME,
+            PACKS_DIR_NAME,
+            PackIndex,
+            coalesce,
+            extract_span
+        )
+        remote_dir = self._normalize_destination(remote_dir)
+        packs_dir = self._find_child(remote_dir, PACKS_DIR_NAME)
+        if packs_dir is None:
+            raise FileNotFoundError(
+                errno.ENOENT, os.strerror(errno.ENOENT),
+                posixpath.join(str(remote_dir), PACKS_DIR_NAME))
+        objects = {file.name: file.id for file in self._list_dir(packs_dir.id)}
+        if INDEX_NAME not in objects:
+            raise FileNotFoundError(
+                errno.ENOENT, os.strerror(errno.ENOENT),
+                posixpath.join(str(remote_dir), PACKS_DIR_NAME, INDEX_NAME))
+        index = PackIndex.loads(
+            b"".join(self._open_stream(objects[INDEX_NAME])))
+        entries = select_recorded(index, paths)
+        for entry in entries:
+            local_path = local_destination / entry.path
+            if local_path.exists() and not ov:
+                raise FileExistsError(
+                    errno.EEXIST, os.strerror(errno.EEXIST), str(local_path))
+
+        def open_file(entry):
+            print(UnpackMessage(entry.path).str_value())
+            local_path = local_destination / entry.path
+            local_path.parent.mkdir(parents=True, exist_ok=True)
+            return open(local_path, "wb")
+
+        def fetch(span):
+            chunks = []
+            if span.end > span.start:
+                chunks = self._open_stream(
+                    objects[span.pack], (span.start, span.end))
+            extract_span(chunks, span, open_file)
+
+        spans = coalesce(entries)
+        with ThreadPoolExecutor(jobs) as pool:
+            self._run_concurrently(pool, fetch, spans, jobs)
+        return Counter(files=len(entries), requests=len(spans))
+
+    @staticmethod
+    def _run_concurrently(pool, func, actions, jobs: int):
+        """
+        Runs `func` for every action by pool of `jobs` threads and
+        reraises first error. Context of calling thread is propagated to
+        workers, so their output goes where output of the command goes.
+        At most twice as many actions as pool has workers are submitted
+        at once, next actions are taken from `actions` iterator as
+        running ones finish, so long plans are never held in memory and
+        error is seen soon.
+        On error or interruption actions which haven't started yet are
+        cancelled, so pool only waits for running ones.
         """
-        return self._storage.get_file(file_id)
+        limit = 2 * jobs
+        in_flight = set()
+        try:
+            for action in actions:
+                if len(in_flight) >= limit:
+                    done, in_flight = wait(
+                        in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                in_flight.add(pool.submit(
+                    contextvars.copy_context().run, func, action))
+            while in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+        except BaseException:
+            for future in in_flight:
+                future.cancel()
+            raise
+
+    def copy_to(
+            self,
+            target: "BaseWrapper",
+            file_id,
+            destination,
+            jobs: int = DEFAULT_JOBS
+    ) -> None:
+        """
+        Copies remote file or directory to `destination` directory on
+        `target` storage without touching local disk: download stream of
+        every file is piped into upload request through bounded buffer.
+        Folders are created while source tree is walked, files are copied
+        by pool of `jobs` threads. Files of unknown size (G.Suite
+        documents) can't be downloaded, they are skipped.
+        """
+        root = self.get_file(file_id)
+        root_entry = Entry(
+            (root.name,), root.type, root.size, root.modified, root.md5,
+            root.id
+        )
+        target_dirs = {(): destination}
+        if root.type == "dir":
+            entries = itertools.chain(
+                [root_entry], self._walk(root.id, (root.name,)))
+        else:
+            entries = [root_entry]
+
+        def copy_files():
+            for entry in entries:
+                parent = target_dirs[entry.path[:-1]]
+                if entry.type == "dir":
+                    print(CopyMessage("/".join(entry.path)).str_value())
+                    target_dirs[entry.path] = target._make_dir(
+                        parent, entry.path[-1])
+                elif entry.size is None:
+                    print(CopyMessage(
+                        "/".join(entry.path), skipped=True).str_value())
+                else:
+                    yield entry, parent
+
+        with ThreadPoolExecutor(jobs) as pool:
+            self._run_concurrently(
+                pool,
+                lambda args: self._copy_file(target, *args),
+                copy_files(),
+                jobs
+            )
+
+    def _copy_file(self, target: "BaseWrapper", entry: Entry, parent):
+        """
+        Pipes download stream of remote file into upload request of
+        `target` storage. Download is run by its own thread, which is
+        paused while buffer is full.
+
+        Raises:
+            ChecksumMismatchException: if copied data differs from
+             source or target stored something else.
+        """
+        print(CopyMessage("/".join(entry.path)).str_value())
+        pipe = Pipe(entry.size)
+        producer = threading.Thread(
+            target=pipe.pump,
+            args=(self._open_stream(entry.id),),
+            daemon=True
+        )
+        producer.start()
+        try:
+            target_md5 = target._put_stream(
+                pipe if len(pipe) else b"", parent, entry.path[-1])
+        finally:
+            pipe.abort()
+            producer.join()
+        if not len(pipe):
+            return
+        for md5 in (entry.md5, target_md5):
+            if md5 is not None and md5 != pipe.md5():
+                raise ChecksumMismatchException(
+                    "/".join(entry.path), pipe.md5(), md5)
+
+    def _put_stream(self, data, parent, name: str):
+        """
+        Uploads streamed `data` as file `name` into `parent` directory.
+
+        Returns:
+            md5 of stored content reported by storage or None.
+        """
+        link = self._storage.get_upload_link(
+            PurePosixPath(name), self._upload_destination(parent, name))
+        return self._storage.upload_file(link, data)
+
+    def _delete(self, remote_file, permanently):
+        self._storage.remove(remote_file.id, permanently)
+        print(DeleteMessage(remote_file.path[-1], permanently).str_value())
+
+    def _upload_new(self, action, remote_dirs, index=None):
+        print(ULMessage(action.local.id).str_value())
+        self._store_file(
+            action.local.id,
+            remote_dirs[action.path[:-1]],
+            action.path[-1],
+            index
+        )
+
+    def _update(self, action):
+        print(ULMessage(action.local.id).str_value())
+        self._replace_file(action.local.id, action.remote)
+
+    def _normalize_destination(self, destination):
+        """
+        Returns id (path for YandexDisk) of destination directory passed
+        by user.
+        """
+        return destination
+
+    @abstractmethod
+    def _make_dir(self, parent, name: str):
+        """
+        Creates remote directory `name` in `parent` directory and returns
+        its id (path for YandexDisk).
+        """
+        ...
+
+    @abstractmethod
+    def _upload_destination(self, parent, name: str):
+        """
+        Returns value of `destination` argument of `_put_file` method for
+        file `name` which should be placed into `parent` directory.
+        """
+        ...
 
     @abstractmethod
-    def download(self, file_id, local_destination, ov):
+    def _copy_remote(self, file_id, parent, name: str):
+        """
+        Creates copy of remote file as `name` in `parent` directory,
+        content is copied by storage. Returns id of copy (path for
+        YandexDisk).
+        """
+        ...
+
+    @abstractmethod
+    def _get_replace_link(self, local_path: Path, remote_file) -> str:
+        ...
+
+    @abstractmethod
+    def _open_stream(self, file_id, byte_range=None):
+        """
+        Returns iterator over chunks of remote file content or of its
+        (start, end) `byte_range`.
+        """
+        ...
+
+    @abstractmethod
+    def _list_dir(self, dir_id):
+        """
+        Returns iterable over files in remote directory with their sizes,
+        modification times and checksums.
+        """
+        ...
+
+    @abstractmethod
+    def _disk_usage(self, file_id):
+        """
+        Returns tuple of filled DiskUsage object and key of folder
+        usage should be reported for.
+        """
+        ...
+
+    @abstractmethod
+    def download(
+            self,
+            file_id,
+            local_destination,
+            ov,
+            journal=None,
+            cipher=None
+    ):
+        """
+        Returns Counter of verified, retried and unverified files.
+        """
         ...
 
     @abstractmethod
-    def lsdir(self, file_id, order_key):
+    def lsdir(self, file_id, order_key, top=None):
         ...
 
     @abstractmethod
-    def upload(self, file, destination):
+    def upload(
+            self,
+            file,
+            destination,
+            journal=None,
+            dedup=False,
+            compression=None,
+            cipher=None
+    ):
         ...
@@ -0,0 +1,291 @@
+import collections
+import contextlib
+import contextvars
+import datetime
+import errno
+import hashlib
+import os
+import posixpath
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from cloudbackup.chunking import (
+    CHUNKS_DIR_NAME,
+    MANIFEST_SUFFIX,
+    MANIFESTS_DIR_NAME,
+    ChunkedFile,
+    Chunker,
+    Manifest
+)
+from cloudbackup.diff import walk_local
+from cloudbackup.exceptions import ChecksumMismatchException
+from wrappers._base_wrapper import BaseWrapper
+from wrappers.cli_msgs import (
+    ChunkBackupLineMessage,
+    ChunkBackupMessage,
+    ChunkRestoreMessage
+)
+from wrappers.defaults import DEFAULT_JOBS
+from wrappers.selection import select_recorded
+
+
+class ChunkStore:
+    """
+    Deduplicating repository of backups in remote folder.
+
+    Files are split into chunks at content defined boundaries (see
+    `cloudbackup.chunking.Chunker`), every distinct chunk is stored once
+    as object of 'chunks' folder named by its sha256, and every backup is
+    manifest in 'manifests' folder listing chunks of its files. Change
+    in the middle of big file changes only chunks around it, so backup
+    of slightly changed file uploads about the size of change. Files
+    whose size and modification time are the same as in the latest
+    backup aren't read at all.
+    """
+
+    def __init__(
+            self,
+            wrapper: BaseWrapper,
+            repository,
+            jobs: int = DEFAULT_JOBS,
+            chunker: Chunker = None
+    ):
+        self._wrapper = wrapper
+        self._root = wrapper._normalize_destination(repository)
+        self._jobs = jobs
+        self._chunker = Chunker() if chunker is None else chunker
+
+    def backup(self, local_path: Path, name: str = None) -> Counter:
+        """
+        Stores local file or directory as new backup `name` (current
+        time by default). Chunks which aren't stored yet are uploaded by
+        pool of `jobs` threads while next ones are read, manifest is
+        uploaded the last, so interrupted backup leaves only chunks,
+        which next backup doesn't upload again. Empty folders aren't
+        recorded.
+
+        Returns:
+            Counter of backed up "files", "unchanged" files, uploaded
+            "chunks" and their "bytes" and chunks which were "stored"
+            already.
+
+        Raises:
+            FileNotFoundError: if `local_path` doesn't exist.
+            FileExistsError: if repository has backup `name` already.
+            ChecksumMismatchException: if storage stored something else.
+        """
+        if not local_path.exists():
+            raise FileNotFoundError(
+                errno.ENOENT, os.strerror(errno.ENOENT), str(local_path))
+        if name is None:
+            name = datetime.datetime.now().strftime("%Y-%m-%dT%H%M%S")
+        chunks_dir = self._folder(CHUNKS_DIR_NAME, create=True)
+        manifests_dir = self._folder(MANIFESTS_DIR_NAME, create=True)
+        manifests = self._manifests(manifests_dir)
+        if name in manifests:
+            raise FileExistsError(
+                errno.EEXIST, os.strerror(errno.EEXIST), name)
+        previous = Manifest()
+        if manifests:
+            previous = self._load(max(
+                manifests.values(), key=lambda file: file.modified or 0))
+        stored = {file.name for file in self._wrapper._list_dir(chunks_dir)}
+        manifest = Manifest()
+        summary = Counter()
+        with ThreadPoolExecutor(self._jobs) as pool:
+            uploads = collections.deque()
+
+            def upload(digest: str, data: bytes) -> None:
+                uploads.append(pool.submit(
+                    contextvars.copy_context().run,
+                    self._put_chunk, data, chunks_dir, digest))
+                # at most two chunks per thread are held in memory
+                if len(uploads) > 2 * self._jobs:
+                    uploads.popleft().result()
+
+            try:
+                for path, local_file in self._local_files(local_path):
+                    stat = local_file.stat()
+                    old = previous.get(path)
+                    if (old is not None
+                            and (old.size, old.mtime) == (
+                                stat.st_size, stat.st_mtime)
+                            and all(d in stored for d, _ in old.chunks)):
+                        summary["unchanged"] += 1
+                        manifest.add(old)
+                        continue
+                    print(ChunkBackupMessage(local_file).str_value())
+                    chunks = []
+                    with open(local_file, "rb") as file:
+                        for data in self._chunker.split(file):
+                            digest = hashlib.sha256(data).hexdigest()
+                            chunks.append([digest, len(data)])
+                            if digest in stored:
+                                summary["stored"] += 1
+                                continue
+                            stored.add(digest)
+                            summary["chunks"] += 1
+                            summary["bytes"] += len(data)
+                            upload(digest, data)
+                    manifest.add(ChunkedFile(
+                        path,
+                        sum(length for _, length in chunks),
+                        stat.st_mtime,
+                        chunks
+                    ))
+                while uploads:
+                    uploads.popleft().result()
+            finally:
+                for future in uploads:
+                    future.cancel()
+        summary["files"] = len(manifest)
+        self._wrapper._put_stream(
+            manifest.dumps(), manifests_dir, name + MANIFEST_SUFFIX)
+        return summary
+
+    def backups(self) -> None:
+        """
+        Prints names of backups in order they were made.
+        """
+        manifests = self._manifests(self._folder(MANIFESTS_DIR_NAME))
+        for name, file in sorted(
+                manifests.items(), key=lambda item: item[1].modified or 0):
+            print(ChunkBackupLineMessage(name, file.modified).str_value())
+
+    def restore(
+            self,
+            name: str,
+            local_destination: Path,
+            paths: list = None,
+            ov: bool = False
+    ) -> Counter:
+        """
+        Restores files of backup `name` into `local_destination`, all
+        files or only files and folders with given `paths` relative to
+        backed up directory. Files are written one by one, their chunks
+        are downloaded ahead by pool of `jobs` threads and checked by
+        their sha256. Modification times of files are restored too.
+
+        Returns:
+            Counter of restored "files" and downloaded "chunks".
+
+        Raises:
+            FileNotFoundError: if there is no backup `name`, some of
+             `paths` isn't in backup or some chunk is missing.
+            FileExistsError: if file exists locally and `ov` is False.
+            ChecksumMismatchException: if chunk is corrupted.
+            UnsafePathException: if manifest has absolute path or path
+             with '..'.
+        """
+        manifests = self._manifests(self._folder(MANIFESTS_DIR_NAME))
+        if name not in manifests:
+            raise FileNotFoundError(
+                errno.ENOENT, os.strerror(errno.ENOENT), name)
+        files = select_recorded(self._load(manifests[name]), paths)
+        for file in files:
+            local_path = local_destination / file.path
+            if local_path.exists() and not ov:
+                raise FileExistsError(
+                    errno.EEXIST, os.strerror(errno.EEXIST), str(local_path))
+        objects = {
+            file.name: file.id
+            for file in self._wrapper._list_dir(
+                self._folder(CHUNKS_DIR_NAME))
+        }
+        for file in files:
+            for digest, _ in file.chunks:
+                if digest not in objects:
+                    raise FileNotFoundError(
+                        errno.ENOENT, os.strerror(errno.ENOENT),
+                        posixpath.join(CHUNKS_DIR_NAME, digest))
+
+        def fetch(digest: str) -> bytes:
+            data = b"".join(self._wrapper._open_stream(objects[digest]))
+            actual = hashlib.sha256(data).hexdigest()
+            if actual != digest:
+                raise ChecksumMismatchException(digest, actual, digest)
+            return data
+
+        def fetched(pool):
+            ahead = collections.deque()
+            try:
+                for file in files:
+                    for digest, _ in file.chunks:
+                        ahead.append(pool.submit(fetch, digest))
+                        if len(ahead) > 2 * self._jobs:
+                            yield ahead.popleft().result()
+                while ahead:
+                    yield ahead.popleft().result()
+            finally:
+                for future in ahead:
+                    future.cancel()
+
+        summary = Counter()
+        with ThreadPoolExecutor(self._jobs) as pool, \
+                contextlib.closing(fetched(pool)) as chunks:
+            for file in files:
+                print(ChunkRestoreMessage(file.path).str_value())
+                local_path = local_destination / file.path
+                local_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(local_path, "wb") as local_file:
+                    for _ in file.chunks:
+                        local_file.write(next(chunks))
+                os.utime(local_path, (file.mtime, file.mtime))
+                summary["files"] += 1
+                summary["chunks"] += len(file.chunks)
+        return summary
+
+    def _folder(self, name: str, create: bool = False):
+        """
+        Returns id of folder `name` of repository (path for YandexDisk).
+
+        Raises:
+            FileNotFoundError: if there is no folder and `create` is
+             False.
+        """
+        folder = self._wrapper._find_child(self._root, name)
+        if folder is not None:
+            return folder.id
+        if not create:
+            raise FileNotFoundError(
+                errno.ENOENT, os.strerror(errno.ENOENT),
+                posixpath.join(str(self._root), name))
+        return self._wrapper._make_dir(self._root, name)
+
+    def _manifests(self, manifests_dir) -> dict:
+        """
+        Returns dict of remote manifest files by names of backups.
+        """
+        return {
+            file.name[:-len(MANIFEST_SUFFIX)]: file
+            for file in self._wrapper._list_dir(manifests_dir)
+            if file.name.endswith(MANIFEST_SUFFIX)
+        }
+
+    def _load(self, manifest_file) -> Manifest:
+        return Manifest.loads(
+            b"".join(self._wrapper._open_stream(manifest_file.id)))
+
+    @staticmethod
+    def _local_files(local_path: Path):
+        """
+        Yields (path, local path) of files of backed up file or
+        directory, path of single file is its name.
+        """
+        if not local_path.is_dir():
+            yield local_path.name, local_path
+            return
+        for entry in walk_local(local_path):
+            if entry.type == "file":
+                yield "/".join(entry.path), entry.id
+
+    def _put_chunk(self, data: bytes, chunks_dir, digest: str) -> None:
+        """
+        Raises:
+            ChecksumMismatchException: if storage stored something else.
+        """
+        remote_md5 = self._wrapper._put_stream(data, chunks_dir, digest)
+        md5 = hashlib.md5(data).hexdigest()
+        if remote_md5 is not None and remote_md5 != md5:
+            raise ChecksumMismatchException(digest, md5, remote_md5)
@@ -1,5 +1,6 @@
 import errno
 import os
+import time
 from pathlib import Path
 from wrappers.defaults import (
     OVERWRITE_REQUEST_MSG,
@@ -8,11 +9,47 @@ from wrappers.defaults import (
     SKIPPING_MSG,
     DOWNLOADING_MSG,
     UPLOADING_MSG,
+    COPYING_MSG,
+    DEDUP_MSG,
+    UPLOAD_FAILED_MSG,
+    PACKING_MSG,
+    PACK_RESULT_MSG,
+    CHUNK_BACKUP_MSG,
+    CHUNK_BACKUP_LINE_MSG,
+    CHUNK_BACKUP_RESULT_MSG,
+    CHUNK_RESTORE_MSG,
+    CHUNK_RESTORE_RESULT_MSG,
+    UNPACKING_MSG,
+    UNPACK_RESULT_MSG,
+    UPLOAD_RESULT_MSG,
     DOWNLOADING_AS_ZIP_MSG,
     SUCCESSFUL_DELETE_MSG,
     SUCCESSFUL_TRASH_MSG,
     DELETE_CONFIRMATION_MSG,
-    MOVE_TO_TRASH_CONFIRMATION_MSG
+    MOVE_TO_TRASH_CONFIRMATION_MSG,
+    BULK_DELETE_CONFIRMATION_MSG,
+    BULK_MOVE_TO_TRASH_CONFIRMATION_MSG,
+    DU_LINE_MSG,
+    SNAPSHOT_LINE_MSG,
+    SNAPSHOT_COPY_MSG,
+    SNAPSHOT_RESULT_MSG,
+    DIFF_ADDED_MSG,
+    DIFF_REMOVED_MSG,
+    DIFF_CHANGED_MSG,
+    VERIFY_MISSING_MSG,
+    VERIFY_EXTRA_MSG,
+    VERIFY_MISMATCH_MSG,
+    VERIFY_RESULT_MSG,
+    VERIFY_OK_MSG,
+    PLAN_MKDIR_MSG,
+    PLAN_UPLOAD_MSG,
+    PLAN_UPDATE_MSG,
+    PLAN_DELETE_MSG,
+    PLAN_KEEP_MSG,
+    PLAN_TRASH_MSG,
+    PLAN_SUMMARY_MSG,
+    DOWNLOAD_RETRY_MSG,
+    VERIFY_SUMMARY_MSG
 )
 
 
@@ -85,6 +122,164 @@ class ULMessage:
         return UPLOADING_MSG.format(self._path)
 
 
+class DedupMessage:
+
+    def __init__(self, path: Path):
+        self._path = path
+
+    def str_value(self):
+        return DEDUP_MSG.format(self._path)
+
+
+class PackMessage:
+
+    def __init__(self, name: str, size: int):
+        self._name = name
+        self._size = size
+
+    def str_value(self):
+        return PACKING_MSG.format(self._name, human_size(self._size))
+
+
+class UnpackMessage:
+
+    def __init__(self, path: str):
+        self._path = path
+
+    def str_value(self):
+        return UNPACKING_MSG.format(self._path)
+
+
+class RestoreMessage:
+
+    def __init__(self, path: Path):
+        self._path = path
+
+    def str_value(self):
+        return DOWNLOADING_MSG.format(self._path)
+
+
+class UnpackResultMessage:
+
+    def __init__(self, result):
+        self._result = result
+
+    def str_value(self):
+        return UNPACK_RESULT_MSG.format(
+            self._result["files"], self._result["requests"])
+
+
+class PackResultMessage:
+
+    def __init__(self, result):
+        self._result = result
+
+    def str_value(self):
+        return PACK_RESULT_MSG.format(
+            self._result["packed"],
+            self._result["packs"],
+            self._result["uploaded"]
+        )
+
+
+class ChunkBackupMessage:
+
+    def __init__(self, path: Path):
+        self._path = path
+
+    def str_value(self):
+        return CHUNK_BACKUP_MSG.format(self._path)
+
+
+class ChunkBackupLineMessage:
+
+    def __init__(self, name: str, modified: float = None):
+        self._name = name
+        self._modified = modified
+
+    def str_value(self):
+        modified = ""
+        if self._modified is not None:
+            modified = time.strftime(
+                "%Y-%m-%d %H:%M", time.localtime(self._modified))
+        return CHUNK_BACKUP_LINE_MSG.format(modified, self._name)
+
+
+class ChunkBackupResultMessage:
+
+    def __init__(self, result):
+        """
+        :param result: Counter of backed up "files", "unchanged" files,
+         uploaded "chunks" and their "bytes" and already "stored" chunks
+        """
+        self._result = result
+
+    def str_value(self):
+        return CHUNK_BACKUP_RESULT_MSG.format(
+            self._result["files"],
+            self._result["unchanged"],
+            self._result["chunks"],
+            human_size(self._result["bytes"]),
+            self._result["stored"]
+        )
+
+
+class ChunkRestoreMessage:
+
+    def __init__(self, path: str):
+        self._path = path
+
+    def str_value(self):
+        return CHUNK_RESTORE_MSG.format(self._path)
+
+
+class ChunkRestoreResultMessage:
+
+    def __init__(self, result):
+        self._result = result
+
+    def str_value(self):
+        return CHUNK_RESTORE_RESULT_MSG.format(
+            self._result["files"], self._result["chunks"])
+
+
+class ULFailedMessage:
+
+    def __init__(self, path, storage: str, error: Exception):
+        self._path = path
+        self._storage = storage
+        self._error = error
+
+    def str_value(self):
+        return UPLOAD_FAILED_MSG.format(self._path, self._storage, self._error)
+
+
+class ULResultMessage:
+
+    def __init__(self, storage: str, result):
+        """
+        :param result: Counter of "uploaded" and "failed" files
+        """
+        self._storage = storage
+        self._result = result
+
+    def str_value(self):
+        return UPLOAD_RESULT_MSG.format(
+            self._storage, self._result["uploaded"], self._result["failed"])
+
+
+class CopyMessage:
+
+    def __init__(self, path: str, skipped: bool = False):
+        self._path = path
+        self._skipped = skipped
+
+    def str_value(self):
+        if self._skipped:
+            return SKIPPING_MSG.format(self._path)
+        return COPYING_MSG.format(self._path)
+
+
 class DeleteConfirm:
 
     def __init__(self, file_name: str, permanently: bool):
@@ -99,6 +294,37 @@ class DeleteConfirm:
         return msg.format(self._file_name)
 
 
+class BulkDeleteConfirm:
+
+    def __init__(self, file_names: list, permanently: bool):
+        self._file_names = file_names
+        self._permanently = permanently
+
+    def plan(self):
+        if self._permanently:
+            msg = PLAN_DELETE_MSG
+        else:
+            msg = PLAN_TRASH_MSG
+        return "\n".join(msg.format(name) for name in self._file_names)
+
+    def str_value(self):
+        if self._permanently:
+            msg = BULK_DELETE_CONFIRMATION_MSG
+        else:
+            msg = BULK_MOVE_TO_TRASH_CONFIRMATION_MSG
+        return "\n".join(
+            (self.plan(), msg.format(len(self._file_names))))
+
+
+class PruneKeepMessage:
+
+    def __init__(self, name: str):
+        self._name = name
+
+    def str_value(self):
+        return PLAN_KEEP_MSG.format(self._name)
+
+
 class DeleteMessage:
 
     def __init__(self, file_name: str, permanently: bool):
@@ -111,3 +337,173 @@ class DeleteMessage:
         else:
             msg = SUCCESSFUL_TRASH_MSG
         return msg.format(self._file_name)
+
+
+def human_size(size: int) -> str:
+    """
+    Format size in bytes like `du -h` does.
+    """
+    for unit in ("B", "K", "M", "G", "T"):
+        if size < 1024 or unit == "T":
+            break
+        size /= 1024
+    if unit == "B":
+        return f"{size}{unit}"
+    return f"{size:.1f}{unit}"
+
+
+class DUMessage:
+
+    def __init__(self, path: str, size: int):
+        self._path = path
+        self._size = size
+
+    def str_value(self):
+        return DU_LINE_MSG.format(human_size(self._size), self._path)
+
+
+class SnapshotMessage:
+
+    def __init__(self, snapshot):
+        self._snapshot = snapshot
+
+    def str_value(self):
+        snapshot = self._snapshot
+        return SNAPSHOT_LINE_MSG.format(
+            snapshot.name,
+            time.strftime("%Y-%m-%d %H:%M", time.localtime(snapshot.created)),
+            snapshot.files,
+            human_size(snapshot.size),
+            snapshot.source
+        )
+
+
+class SnapshotCopyMessage:
+
+    def __init__(self, path: Path):
+        self._path = path
+
+    def str_value(self):
+        return SNAPSHOT_COPY_MSG.format(self._path)
+
+
+class SnapshotResultMessage:
+
+    def __init__(self, result):
+        self._result = result
+
+    def str_value(self):
+        return SNAPSHOT_RESULT_MSG.format(
+            self._result["uploaded"], self._result["copied"])
+
+
+class DiffMessage:
+
+    def __init__(self, change):
+        self._change = change
+
+    def str_value(self):
+        change = self._change
+        entry = change.local or change.remote
+        path = "/".join(change.path)
+        if entry.type == "dir":
+            path += "/"
+        if change.kind == "added":
+            return DIFF_ADDED_MSG.format(path)
+        elif change.kind == "removed":
+            return DIFF_REMOVED_MSG.format(path)
+        return DIFF_CHANGED_MSG.format(path, change.kind)
+
+
+class VerifyMessage:
+
+    def __init__(self, change):
+        self._change = change
+
+    def str_value(self):
+        change = self._change
+        entry = change.local or change.remote
+        path = "/".join(change.path)
+        if entry.type == "dir":
+            path += "/"
+        if change.kind == "added":
+            return VERIFY_MISSING_MSG.format(path)
+        elif change.kind == "removed":
+            return VERIFY_EXTRA_MSG.format(path)
+        return VERIFY_MISMATCH_MSG.format(path, change.kind)
+
+
+class VerifyResultMessage:
+
+    def __init__(self, result):
+        """
+        :param result: Counter of "missing", "extra" and "mismatched"
+         files
+        """
+        self._result = result
+
+    def str_value(self):
+        if not any(self._result.values()):
+            return VERIFY_OK_MSG
+        return VERIFY_RESULT_MSG.format(
+            self._result["missing"],
+            self._result["extra"],
+            self._result["mismatched"]
+        )
+
+
+class PlanMessage:
+
+    def __init__(self, plan, permanently: bool):
+        self._plan = plan
+        self._permanently = permanently
+
+    def lines(self):
+        plan = self._plan
+        if self._permanently:
+            delete_msg = PLAN_DELETE_MSG
+        else:
+            delete_msg = PLAN_TRASH_MSG
+        for action in plan.deletes:
+            yield delete_msg.format("/".join(action.path))
+        for action in plan.mkdirs:
+            yield PLAN_MKDIR_MSG.format("/".join(action.path))
+        for action in plan.uploads:
+            yield PLAN_UPLOAD_MSG.format(
+                "/".join(action.path), human_size(action.local.size))
+        for action in plan.updates:
+            yield PLAN_UPDATE_MSG.format(
+                "/".join(action.path), human_size(action.local.size))
+        yield PLAN_SUMMARY_MSG.format(
+            len(plan.mkdirs),
+            len(plan.uploads) + len(plan.updates),
+            human_size(plan.total_bytes),
+            len(plan.deletes),
+            plan.total_requests
+        )
+
+
+class DLRetryMessage:
+
+    def __init__(self, path: Path):
+        self._path = path
+
+    def str_value(self):
+        return DOWNLOAD_RETRY_MSG.format(self._path)
+
+
+class VerifySummaryMessage:
+
+    def __init__(self, summary):
+        """
+        :param summary: Counter of "verified", "retried" and "unverified"
+         downloaded files
+        """
+        self._summary = summary
+
+    def str_value(self):
+        return VERIFY_SUMMARY_MSG.format(
+            self._summary["verified"],
+            self._summary["retried"],
+            self._summary["unverified"]
+        )
@@ -0,0 +1,85 @@
+import os
+from pathlib import Path
+from typing import Callable, Iterable
+
+from cloudbackup.file_objects import FileListing
+
+
+class ContentIndex:
+    """
+    Index of remote files by content, i.e. by md5 and size.
+
+    Upload of local file whose content is already stored somewhere on
+    storage (in previous snapshot or as duplicate in uploaded tree) can
+    be replaced by server-side copy of found remote file. Indexed files
+    are packed in FileListing and looked up by raw checksum and size,
+    so index of whole storage stays small.
+    """
+
+    def __init__(self, files: Iterable, hasher: Callable[[Path], str]):
+        """
+        Args:
+            files: remote files with sizes and checksums, files storage
+             reports no checksum for are skipped.
+            hasher: returns hex md5 of local file.
+        """
+        self._hasher = hasher
+        self._files = FileListing()
+        # packed key to row of listed file or to id of added one
+        self._ids = {}
+        self._sizes = set()
+        for file in files:
+            if file.type == "file" and file.md5 is not None and file.size:
+                key = _pack(bytes.fromhex(file.md5), file.size)
+                if key not in self._ids:
+                    self._ids[key] = len(self._files)
+                    self._files.append(file)
+                    self._sizes.add(file.size)
+
+    def key(self, local_path: Path):
+        """
+        Returns key of local file content or None for empty file, there
+        is nothing to save on copying it. File is hashed only if some
+        indexed file has the same size, otherwise checksum of key is
+        None and nothing is found by it.
+        """
+        size = os.stat(local_path).st_size
+        if not size:
+            return None
+        if size not in self._sizes:
+            return None, size
+        return bytes.fromhex(self._hasher(local_path)), size
+
+    def find(self, key):
+        """
+        Returns id of remote file with content of `key` or None.
+        """
+        if key is None or key[0] is None:
+            return None
+        packed = _pack(*key)
+        file_id = self._ids.get(packed)
+        if isinstance(file_id, int):
+            return self._files.id(file_id)
+        if callable(file_id):
+            file_id = self._ids[packed] = file_id()
+        return file_id
+
+    def add(self, key, file_id, md5: str = None) -> None:
+        """
+        Records uploaded file. `file_id` may be function returning id,
+        then it's called only if file is found. Hex `md5` computed while
+        file was uploaded completes key of file which wasn't hashed.
+        """
+        if key is None:
+            return
+        checksum, size = key
+        if checksum is None:
+            if md5 is None:
+                return
+            checksum = bytes.fromhex(md5)
+        self._ids.setdefault(_pack(checksum, size), file_id)
+        self._sizes.add(size)
+
+
+def _pack(checksum: bytes, size: int) -> bytes:
+    return checksum + size.to_bytes(8, "little")
@@ -1,3 +1,5 @@
+from pathlib import Path
+
 GDRIVE_SORT_KEYS = {
     "name": "name",
     "modified": "modifiedTime",
@@ -34,6 +36,12 @@ RM_ACCESS_DENIED_MSG = "No access was granted to delete."
 
 UPLOAD_COMPLETED_MSG = "Upload completed."
 DOWNLOAD_COMPLETED_MSG = "Download completed."
+COPY_COMPLETED_MSG = "Copy completed."
+DOWNLOAD_RETRY_MSG = "Checksum mismatch: `{}`, downloading again..."
+VERIFY_SUMMARY_MSG = (
+    "Verified: {} files ({} downloaded again), {} files without checksum."
+)
+RESUME_HINT_MSG = "Run the same command with --resume to continue."
 SUCCESSFUL_DOWNLOAD_MSG = "Successfully downloaded `{}`."
 SUCCESSFUL_UPLOAD_MSG = "Successfully uploaded `{}`."
 SUCCESSFUL_DELETE_MSG = "Successfully deleted `{}`."
@@ -49,6 +57,15 @@ DELETE_CONFIRMATION_MSG = (
         "Are you sure you want to permanently delete `{}`? " +
         CONFIRM_CHOICE_STRING
 )
+BULK_MOVE_TO_TRASH_CONFIRMATION_MSG = (
+        "Are you sure you want to move {} files to the trash? " +
+        CONFIRM_CHOICE_STRING
+)
+BULK_DELETE_CONFIRMATION_MSG = (
+        "Are you sure you want to permanently delete {} files? " +
+        CONFIRM_CHOICE_STRING
+)
+OPERATION_FAILED_MSG = "Failed to delete: {}."
 
 LIST_NEXT_PAGE_MSG = "List next page? " + CONFIRM_CHOICE_STRING
 
@@ -59,6 +76,74 @@ OVERWRITE_REQUEST_MSG = (
 OVERWRITING_MSG = "Overwriting: `{}`..."
 
 UPLOADING_MSG = "Uploading: `{}`..."
+COPYING_MSG = "Copying: `{}`..."
+COPY_FAILED_MSG = "Failed to copy `{}` on server."
+DEDUP_MSG = "Same content is already stored, copying on server: `{}`"
+UPLOAD_FAILED_MSG = "Failed to upload `{}` to {}: {}"
+UPLOAD_RESULT_MSG = "{}: {} files uploaded, {} failed."
+PACKING_MSG = "Uploading pack: `{}` ({})..."
+UNPACKING_MSG = "Unpacking: `{}`..."
+UNPACK_RESULT_MSG = "Unpack completed: {} files restored by {} requests."
+PACK_RESULT_MSG = (
+    "Upload completed: {} files packed into {} packs, {} files uploaded."
+)
+CHUNK_BACKUP_MSG = "Chunking: `{}`..."
+CHUNK_BACKUP_LINE_MSG = "{}  {}"
+CHUNK_BACKUP_RESULT_MSG = (
+    "Backup completed: {} files ({} unchanged), {} new chunks"
+    " uploaded ({}), {} chunks were stored already."
+)
+CHUNK_RESTORE_MSG = "Restoring: `{}`..."
+CHUNK_RESTORE_RESULT_MSG = (
+    "Restore completed: {} files restored from {} chunks."
+)
 DOWNLOADING_MSG = "Downloading: `{}`..."
 DOWNLOADING_AS_ZIP_MSG = "Downloading: `{}` as `{}`..."
 SKIPPING_MSG = "Skipping: `{}` ..."
+
+DU_LINE_MSG = "{:>8}  {}"
+SNAPSHOT_LINE_MSG = "{}  {}  {:>6} files {:>8}  {}"
+SNAPSHOT_COPY_MSG = "Unchanged, copying on server: `{}`"
+SNAPSHOT_RESULT_MSG = (
+    "Snapshot completed: {} files uploaded, {} copied on server."
+)
+DIFF_ADDED_MSG = "+ {}"
+DIFF_REMOVED_MSG = "- {}"
+DIFF_CHANGED_MSG = "~ {} ({})"
+VERIFY_MISSING_MSG = "Missing: `{}`"
+VERIFY_EXTRA_MSG = "Extra: `{}`"
+VERIFY_MISMATCH_MSG = "Mismatch: `{}` ({})"
+VERIFY_RESULT_MSG = "{} missing, {} extra, {} mismatched."
+VERIFY_OK_MSG = "Remote directory matches local directory."
+
+DEFAULT_JOBS = 4
+DOWNLOAD_ATTEMPTS = 3
+# how often statuses of background operations are polled, seconds
+OPERATION_POLL_INTERVAL = 1
+# target of `rm` with these characters in its name is glob pattern
+GLOB_CHARS = frozenset("*?[")
+
+PLAN_MKDIR_MSG = "Create folder: `{}`"
+PLAN_UPLOAD_MSG = "Upload: `{}` ({})"
+PLAN_UPDATE_MSG = "Update: `{}` ({})"
+PLAN_DELETE_MSG = "Delete: `{}`"
+PLAN_TRASH_MSG = "Move to the trash: `{}`"
+PLAN_KEEP_MSG = "Keep: `{}`"
+PLAN_SUMMARY_MSG = (
+    "Total: {} folders to create, {} files to upload ({}),"
+    " {} to delete, {} requests."
+)
+SYNC_COMPLETED_MSG = "Sync completed."
+PRUNE_COMPLETED_MSG = "Prune completed: {} snapshots removed."
+
+AGENT_SOCKET_PATH = Path.home() / ".cloudbackup-agent.sock"
+AGENT_WORKERS = 8
+ENCRYPTION_KEY_MISSING_MSG = (
+    "Encryption key and `cryptography` package are required to decrypt"
+    " file, pass key by --key-file")
+KEY_CREATED_MSG = (
+    "New encryption key is written to `{}`. Back it up to safe place now:"
+    " encrypted files can't be restored without it.")
+LEGACY_KEY_MSG = (
+    "Encryption key is read from `{}`, move it to `{}`: key inside"
+    " package is lost when package is reinstalled.")
@@ -0,0 +1,102 @@
+from collections import defaultdict
+from typing import Hashable, List, Tuple
+
+
+class DiskUsage:
+    """
+    Aggregates file sizes per folder in one pass over files listing.
+
+    Only folders are kept in memory: every file adds its size to its
+    parent folder and is forgotten, totals of nested folders are rolled
+    up to their ancestors when report is built.
+    """
+
+    def __init__(self, root: Hashable, root_name: str = "/"):
+        self._root = root
+        self._parents = {root: None}
+        self._names = {root: root_name}
+        self._sizes = defaultdict(int)
+
+    def add_folder(self, folder: Hashable, parent: Hashable, name: str):
+        """
+        Register folder. Parent may be registered later or never, in the
+        last case folder is considered to be placed in root.
+        """
+        if folder != self._root:
+            self._parents[folder] = parent
+            self._names[folder] = name
+
+    def has_folder(self, folder: Hashable) -> bool:
+        return folder in self._parents
+
+    def add_file(self, parent: Hashable, size: int):
+        self._sizes[parent] += size or 0
+
+    def _parent(self, folder):
+        parent = self._parents.get(folder, self._root)
+        if folder != self._root and parent not in self._parents:
+            return self._root
+        return parent
+
+    def _ancestors(self, folder):
+        """
+        Yields folder itself and all its ancestors up to root.
+        """
+        seen = set()
+        while folder is not None and folder not in seen:
+            seen.add(folder)
+            yield folder
+            folder = self._parent(folder)
+
+    def _path(self, folder):
+        names = [self._names[f] for f in self._ancestors(folder)]
+        if len(names) == 1:
+            return names[0]
+        names[-1] = names[-1].rstrip("/")
+        return "/".join(reversed(names))
+
+    def report(
+            self,
+            top: Hashable = None,
+            depth: int = None,
+            limit: int = None
+    ) -> List[Tuple[str, int]]:
+        """
+        Build list of (folder path, total size) pairs.
+
+        Args:
+            top: Optional; folder to report usage for, root by default.
+            depth: Optional; report only folders which are at most
+             `depth` levels below `top`.
+            limit: Optional; report only `limit` largest folders.
+
+        Returns:
+            Pairs sorted by path or by size (largest first)
+             if `limit` is given.
+
+        Raises:
+            KeyError: if `top` folder was not registered.
+        """
+        if top is None:
+            top = self._root
+        if top not in self._parents:
+            raise KeyError(top)
+        levels = {}
+        for folder in self._parents:
+            chain = list(self._ancestors(folder))
+            if top in chain:
+                levels[folder] = chain.index(top)
+        totals = dict.fromkeys(levels, 0)
+        for folder, size in self._sizes.items():
+            for ancestor in self._ancestors(folder):
+                if ancestor in totals:
+                    totals[ancestor] += size
+        usage = [
+            (self._path(folder), size)
+            for folder, size in totals.items()
+            if depth is None or levels[folder] <= depth
+        ]
+        if limit is not None:
+            usage.sort(key=lambda pair: (-pair[1], pair[0]))
+            return usage[:limit]
+        return sorted(usage)
@@ -0,0 +1,135 @@
+import hashlib
+import threading
+from collections import Counter
+from pathlib import Path
+
+from cloudbackup._defaults import DOWNLOAD_CHUNK_SIZE
+from cloudbackup.exceptions import ChecksumMismatchException
+from cloudbackup.journal import Journal
+from cloudbackup.pipe import Pipe
+from wrappers._base_wrapper import BaseWrapper
+from wrappers.cli_msgs import ULMessage, ULFailedMessage
+
+
+class FanOutUpload:
+    """
+    Uploads local file or directory to several storages at once reading
+    every file only once.
+
+    Every chunk read from file is written to bounded pipe of every
+    target, pipes are read by upload requests running concurrently. When
+    pipe of slower target is full reading is paused, so reading follows
+    the slowest target. Failure of one target doesn't stop others.
+    """
+
+    def __init__(self, targets: dict):
+        """
+        Args:
+            targets: wrapper and destination directory by storage name.
+        """
+        self._targets = {
+            storage: (wrapper, wrapper._normalize_destination(destination))
+            for storage, (wrapper, destination) in targets.items()
+        }
+
+    def upload(self, local_file: Path) -> dict:
+        """
+        Returns:
+            Counter of "uploaded" and "failed" files by storage name.
+        """
+        if not local_file.name:
+            local_file = local_file.resolve()
+        journal = Journal()
+        BaseWrapper._plan_upload(journal, local_file)
+        results = {storage: Counter() for storage in self._targets}
+        # remote folder ids of every target by journal item id
+        folders = {storage: {None: destination}
+                   for storage, (_, destination) in self._targets.items()}
+        failed_targets = set()
+        for item in journal.pending():
+            print(ULMessage(Path(item.source)).str_value())
+            if item.kind == "dir":
+                for storage, (wrapper, _) in self._targets.items():
+                    if storage in failed_targets:
+                        continue
+                    try:
+                        folders[storage][item.id] = wrapper._make_dir(
+                            folders[storage][item.parent], item.name)
+                    except Exception as e:
+                        print(ULFailedMessage(
+                            item.source, storage, e).str_value())
+                        failed_targets.add(storage)
+                continue
+            for storage in failed_targets:
+                results[storage]["failed"] += 1
+            parents = {
+                storage: folders[storage][item.parent]
+                for storage in self._targets if storage not in failed_targets
+            }
+            for storage, error in self._upload_file(
+                    Path(item.source), item.size, parents).items():
+                if error is None:
+                    results[storage]["uploaded"] += 1
+                else:
+                    results[storage]["failed"] += 1
+                    print(ULFailedMessage(
+                        item.source, storage, error).str_value())
+        return results
+
+    def _upload_file(self, local_path: Path, size: int, parents: dict):
+        """
+        Reads file once feeding its chunks to upload requests of all
+        targets with `parents` folders.
+
+        Returns:
+            Exception or None by storage name.
+        """
+        pipes = {storage: Pipe(size) for storage in parents}
+        errors = dict.fromkeys(parents)
+        remote_md5 = dict.fromkeys(parents)
+
+        def put(storage):
+            wrapper = self._targets[storage][0]
+            try:
+                remote_md5[storage] = wrapper._put_stream(
+                    pipes[storage] if size else b"",
+                    parents[storage],
+                    local_path.name
+                )
+            except Exception as e:
+                errors[storage] = e
+            finally:
+                pipes[storage].abort()
+
+        uploads = [threading.Thread(target=put, args=(storage,), daemon=True)
+                   for storage in parents]
+        for thread in uploads:
+            thread.start()
+        md5 = hashlib.md5()
+        live = set(pipes) if size else set()
+        try:
+            with open(local_path, "rb") as file:
+                for chunk in iter(
+                        lambda: file.read(DOWNLOAD_CHUNK_SIZE), b""):
+                    md5.update(chunk)
+                    for storage in list(live):
+                        try:
+                            pipes[storage].write(chunk)
+                        except BrokenPipeError:
+                            live.discard(storage)
+        except BaseException as e:
+            for storage in live:
+                pipes[storage].close(e)
+            live.clear()
+            raise
+        finally:
+            for storage in live:
+                pipes[storage].close()
+            for thread in uploads:
+                thread.join()
+        for storage in parents:
+            if (errors[storage] is None and remote_md5[storage] is not None
+                    and remote_md5[storage] != md5.hexdigest()):
+                errors[storage] = ChecksumMismatchException(
+                    local_path, md5.hexdigest(), remote_md5[storage])
+        return errors
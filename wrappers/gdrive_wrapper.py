@@ -1,31 +1,170 @@
 import errno
+import fnmatch
+import itertools
 import os
 import shutil
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from cloudbackup.file_objects import GDriveFile
+from cloudbackup._defaults import GDRIVE_BATCH_SIZE
+from cloudbackup.file_objects import FileListing, GDriveFile
 from cloudbackup.gdrive import GDrive
 from wrappers._base_wrapper import BaseWrapper
-from wrappers.cli_msgs import GdriveDLMessage, ULMessage
+from wrappers.cli_msgs import DeleteMessage, GdriveDLMessage
+from wrappers.disk_usage import DiskUsage
+from wrappers.stages import Stages
 from wrappers.defaults import (
     GDRIVE_SORT_KEYS,
     ABORTED_MSG,
     LIST_NEXT_PAGE_MSG,
 )
 
+if TYPE_CHECKING:
+    # codecs and journal are imported by commands which use them
+    from cloudbackup.compression import Codec
+    from cloudbackup.journal import Journal
+
 
 class GDriveWrapper(BaseWrapper):
     """
     Implements CLI interface to Google Drive API
     """
 
+    _CHECKSUM_FIELDS = ("size", "md5Checksum")
+
     def __init__(self):
         super().__init__(GDrive())
 
+    def _iter_files(
+            self,
+            dir_id: str = None,
+            order_by: str = "modifiedTime",
+            extra_fields: tuple = (),
+            page_size: int = 1000
+    ):
+        """
+        Yields files page by page from listing of directory with `dir_id`
+        or of all files if `dir_id` is None. Listing of whole drive
+        never holds more than one page of file objects.
+        """
+        page_token = None
+        while True:
+            page = self._storage.lsdir(
+                dir_id=dir_id,
+                owners=["me"],
+                page_size=page_size,
+                order_by=order_by,
+                page_token=page_token,
+                extra_fields=extra_fields
+            )
+            page_token = page.next_page_token
+            yield from page.files
+            if page_token is None:
+                break
+
+    def _list_dir(self, dir_id):
+        """
+        G.Suite files have neither size nor checksum and can't be
+        downloaded, so they are skipped.
+        """
+        for file in self._iter_files(
+                dir_id,
+                order_by="name",
+                extra_fields=("size", "modifiedTime", "md5Checksum")
+        ):
+            if file.type != "g.suite":
+                yield file
+
+    def _glob(self, parent, pattern: str):
+        """
+        Unlike `_list_dir` includes G.Suite files, they can be removed.
+        """
+        for file in self._iter_files(parent or "root", order_by="name"):
+            if (file.name == pattern
+                    or fnmatch.fnmatchcase(file.name, pattern)):
+                yield file
+
+    def _remove_all(self, targets, permanently, jobs, on_removed=None):
+        """
+        Several files are removed by batch requests of GDRIVE_BATCH_SIZE
+        files, batches are sent concurrently.
+
+        Raises:
+            ApiResponseException: first error of file which wasn't
+             removed, after all batches are sent.
+        """
+        if len(targets) == 1:
+            super()._remove_all(targets, permanently, jobs, on_removed)
+            return
+        batches = [targets[i:i + GDRIVE_BATCH_SIZE]
+                   for i in range(0, len(targets), GDRIVE_BATCH_SIZE)]
+        errors = []
+
+        def remove_batch(batch):
+            failed = self._storage.remove_batch(
+                [file_id for file_id, _ in batch], permanently)
+            for file_id, file in batch:
+                if file_id in failed:
+                    errors.append(failed[file_id])
+                    continue
+                print(DeleteMessage(file.name, permanently).str_value())
+                if on_removed is not None:
+                    on_removed(file)
+
+        with ThreadPoolExecutor(jobs) as pool:
+            self._run_concurrently(pool, remove_batch, batches, jobs)
+        if errors:
+            raise errors[0]
+
+    def _copy_remote(self, file_id, parent, name: str):
+        return self._storage.copy(file_id, name, parent_id=parent)
+
+    def _make_dir(self, parent, name: str):
+        return self._storage.mkdir(name, parent_id=parent)
+
+    def _upload_destination(self, parent, name: str):
+        return parent
+
+    def _get_replace_link(self, local_path: Path, remote_file) -> str:
+        return self._storage.get_update_link(remote_file.id, local_path)
+
+    def _upload_content(self, link: str, data) -> tuple:
+        uploaded = self._storage.upload(link, data)
+        return uploaded.get("md5Checksum"), uploaded.get("id")
+
+    def _open_stream(self, file_id, byte_range=None):
+        return self._storage.download_stream(file_id, byte_range=byte_range)
+
+    def _disk_usage(self, file_id):
+        """
+        Drive has no paths, so folder tree is restored from `parents`
+        of listed folders. Files placed in folders not owned by user
+        are counted in root. Every page is packed in FileListing and
+        read from its columns, so parent ids kept by DiskUsage are
+        interned instead of being copied for every folder.
+        """
+        usage = DiskUsage("root")
+        files = self._iter_files(extra_fields=("parents", "size"))
+        while True:
+            page = FileListing(itertools.islice(files, 1000))
+            if not len(page):
+                break
+            for index in range(len(page)):
+                parents = page.field("parents", index)
+                parent = parents[0] if parents else "root"
+                if page.type(index) == "dir":
+                    usage.add_folder(page.id(index), parent, page.name(index))
+                else:
+                    usage.add_file(parent, page.size(index))
+        return usage, "root" if file_id is None else file_id
+
     def lsdir(
             self,
             file_id: str,
-            order_key: str
+            order_key: str,
+            top: int = None
     ) -> None:
         """
         Prints content of directory or file itself. Prints all files
@@ -34,7 +173,34 @@ class GDriveWrapper(BaseWrapper):
         This method should properly call storage.lsdir method, print
         corresponding file info and if `file_id` is provided list files
         page by page by asking user before every next page.
+
+        If `top` is provided prints only `top` first files without asking.
+        Drive sorts by quota bytes used (which includes revisions) when
+        ordering by size, so for size keys files are ranked by actual size
+        locally, other orders are trusted and listing stops early.
         """
+        if top is not None:
+            if order_key in {"size", "rev_size"}:
+                self._print_top(
+                    self._iter_files(
+                        file_id,
+                        order_by=GDRIVE_SORT_KEYS[order_key],
+                        extra_fields=("size",)
+                    ),
+                    top,
+                    key=lambda file: file.size or 0,
+                    reverse=order_key == "rev_size"
+                )
+            else:
+                self._print_top(
+                    self._iter_files(
+                        file_id,
+                        order_by=GDRIVE_SORT_KEYS[order_key],
+                        page_size=min(top, 1000)
+                    ),
+                    top
+                )
+            return
         page_token = None
         if file_id is None:
             page_size = 1000
@@ -62,50 +228,118 @@ class GDriveWrapper(BaseWrapper):
             else:
                 break
 
+    def _plan_download(
+            self,
+            journal: "Journal",
+            file: GDriveFile,
+            dl_path: Path
+    ) -> None:
+        """
+        Walks remote tree into journal. Content of every folder is
+        planned right after folder itself is listed. Files stored
+        compressed are planned under their original names.
+        """
+        stack = [(file, dl_path, journal.add(
+            file.type, file.id, file.name, target=dl_path,
+            checksum=file.md5
+        ))]
+        while stack:
+            folder, folder_path, folder_item = stack.pop()
+            if folder.type != "dir":
+                continue
+            for child in self._iter_files(
+                    folder.id, extra_fields=self._CHECKSUM_FIELDS):
+                child_path = Path(folder_path, self._local_name(child))
+                child_item = journal.add(
+                    child.type, child.id, child.name, folder_item,
+                    target=child_path, checksum=child.md5
+                )
+                stack.append((child, child_path, child_item))
+
+    @staticmethod
+    def _local_name(file: GDriveFile) -> str:
+        if file.type == "dir":
+            return file.name
+        return Stages.local_name(file.name)
+
     def download(
             self,
             file: GDriveFile,
             local_destination: Path,
-            ov: bool = False
-    ) -> None:
+            ov: bool = False,
+            journal: "Journal" = None,
+            cipher=None
+    ) -> Counter:
         """
         Download file or directory from GoogleDrive storage. This method
         should print what file or dir is being downloading, build
         correct download path, remove local file before download
         if ov=True and correctly call storage.download method (storage
         method takes care about `file` arg).
+
+        Remote tree is planned into `journal` before download starts.
+        If journal of interrupted job is passed only items which weren't
+        done are downloaded, partially written files are downloaded again.
+
+        md5 of every file is computed while it's received and compared
+        with md5Checksum listed by Drive, corrupted files are downloaded
+        again. Files stored compressed or encrypted are decompressed
+        and decrypted by `cipher` on the way.
+
+        Returns:
+            Counter of verified, retried and unverified files.
         """
-        dl_path = Path(local_destination, file.name)
-        print(GdriveDLMessage(dl_path, file.type, ov).str_value())
-        if dl_path.is_dir() and ov:
-            shutil.rmtree(dl_path)
-        elif dl_path.is_file() and ov:
-            dl_path.unlink()
-        elif dl_path.exists() and not ov:
-            raise FileExistsError(
-                errno.EEXIST, os.strerror(errno.EEXIST), dl_path)
-        if file.type == "file":
-            dl_path.write_bytes(self._storage.download(file.id))
-        elif file.type == "dir":
-            dl_path.mkdir()
-            next_page_token = None
-            while True:
-                page = self._storage.lsdir(
-                    file.id,
-                    owners=['me'],
-                    page_token=next_page_token,
-                    page_size=1000
+        from cloudbackup.journal import Journal
+        summary = Counter()
+        stages = Stages(cipher=cipher)
+        dl_path = Path(local_destination, self._local_name(file))
+        if journal is None:
+            journal = Journal()
+        if not journal.planned:
+            if dl_path.exists() and not ov:
+                raise FileExistsError(
+                    errno.EEXIST, os.strerror(errno.EEXIST), dl_path)
+            journal.clear()
+            self._plan_download(journal, file, dl_path)
+            journal.set_planned()
+        journal.resume()
+        for item in journal.pending():
+            dl_path = Path(item.target)
+            if item.attempts:
+                print(GdriveDLMessage(dl_path, item.kind, False).str_value())
+                if dl_path.is_file():
+                    dl_path.unlink()
+            else:
+                print(GdriveDLMessage(dl_path, item.kind, ov).str_value())
+                if dl_path.is_dir() and ov:
+                    shutil.rmtree(dl_path)
+                elif dl_path.is_file() and ov:
+                    dl_path.unlink()
+                elif dl_path.exists() and not ov:
+                    raise FileExistsError(
+                        errno.EEXIST, os.strerror(errno.EEXIST), dl_path)
+            journal.start(item.id)
+            if item.kind == "file":
+                self._receive_file(
+                    lambda: self._storage.download_stream(item.source),
+                    dl_path,
+                    item.checksum,
+                    summary,
+                    stages.decoder(item.name)
                 )
-                for file in page.files:
-                    self.download(file, local_destination=dl_path, ov=ov)
-                next_page_token = page.next_page_token
-                if next_page_token is None:
-                    break
+            elif item.kind == "dir":
+                dl_path.mkdir(exist_ok=bool(item.attempts))
+            journal.finish(item.id)
+        return summary
 
     def upload(
             self,
             local_file: Path,
-            parent_id: str
+            parent_id: str,
+            journal: "Journal" = None,
+            dedup: bool = False,
+            compression: "Codec" = None,
+            cipher=None
     ) -> None:
         """
         Upload file or directory by path. This method should print
@@ -115,16 +349,5 @@ class GDriveWrapper(BaseWrapper):
         """
         if not local_file.name:
             local_file = local_file.resolve()
-        print(ULMessage(local_file).str_value())
-        if local_file.is_file():
-            self._put_file(local_path=local_file, destination=parent_id)
-        elif local_file.is_dir():
-            folder_id = self._storage.mkdir(
-                local_file.name,
-                parent_id=parent_id
-            )
-            for child in local_file.iterdir():
-                self.upload(child, folder_id)
-        else:
-            raise FileNotFoundError(
-                errno.ENOENT, os.strerror(errno.ENOENT), local_file)
+        self._upload(
+            local_file, parent_id, journal, dedup, compression, cipher)
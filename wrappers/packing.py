@@ -0,0 +1,142 @@
+import errno
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from cloudbackup._defaults import PACK_FILE_THRESHOLD, PACK_SIZE
+from cloudbackup.diff import walk_local
+from cloudbackup.exceptions import ChecksumMismatchException
+from cloudbackup.packs import (
+    INDEX_NAME,
+    PACKS_DIR_NAME,
+    Pack,
+    PackIndex
+)
+from cloudbackup.pipe import Pipe
+from wrappers._base_wrapper import BaseWrapper
+from wrappers.cli_msgs import PackMessage, ULMessage
+from wrappers.defaults import DEFAULT_JOBS
+
+
+class PackedUpload:
+    """
+    Uploads local directory packing small files into tar archives.
+
+    Upload of many tiny files is bound by number of requests, so files
+    up to `threshold` bytes are streamed into packs of about `pack_size`
+    bytes which are uploaded as single objects into '.packs' folder of
+    uploaded tree, together with index of packed files (see
+    `cloudbackup.packs`). Bigger files are uploaded as usual, folders
+    are created only if bigger files are put into them.
+    """
+
+    def __init__(
+            self,
+            wrapper: BaseWrapper,
+            destination,
+            pack_size: int = PACK_SIZE,
+            threshold: int = PACK_FILE_THRESHOLD,
+            jobs: int = DEFAULT_JOBS
+    ):
+        self._wrapper = wrapper
+        self._destination = wrapper._normalize_destination(destination)
+        self._pack_size = pack_size
+        self._threshold = threshold
+        self._jobs = jobs
+
+    def upload(self, local_dir: Path) -> Counter:
+        """
+        Returns:
+            Counter of "packed" files, "packs" and "uploaded" files.
+        """
+        if not local_dir.name:
+            local_dir = local_dir.resolve()
+        if not local_dir.is_dir():
+            raise NotADirectoryError(
+                errno.ENOTDIR, os.strerror(errno.ENOTDIR), str(local_dir))
+        wrapper = self._wrapper
+        root = wrapper._make_dir(self._destination, local_dir.name)
+        packs_dir = wrapper._make_dir(root, PACKS_DIR_NAME)
+        remote_dirs = {(): root}
+        index = PackIndex()
+        summary = Counter()
+
+        def remote_dir(path: tuple):
+            if path not in remote_dirs:
+                remote_dirs[path] = wrapper._make_dir(
+                    remote_dir(path[:-1]), path[-1])
+            return remote_dirs[path]
+
+        def transfers():
+            pack = Pack(self._pack_name(1))
+            for entry in walk_local(local_dir):
+                if entry.type == "dir":
+                    continue
+                if entry.size > self._threshold:
+                    summary["uploaded"] += 1
+                    parent = remote_dir(entry.path[:-1])
+                    yield self._upload_file, (entry, parent)
+                    continue
+                index.add(pack.add(
+                    "/".join(entry.path), entry.id, os.stat(entry.id)))
+                summary["packed"] += 1
+                if pack.content_size >= self._pack_size:
+                    summary["packs"] += 1
+                    yield self._upload_pack, (pack, packs_dir)
+                    pack = Pack(self._pack_name(summary["packs"] + 1))
+            if pack:
+                summary["packs"] += 1
+                yield self._upload_pack, (pack, packs_dir)
+
+        with ThreadPoolExecutor(self._jobs) as pool:
+            wrapper._run_concurrently(
+                pool,
+                lambda transfer: transfer[0](*transfer[1]),
+                transfers(),
+                self._jobs
+            )
+        wrapper._put_stream(index.dumps(), packs_dir, INDEX_NAME)
+        return summary
+
+    @staticmethod
+    def _pack_name(number: int) -> str:
+        return f"pack-{number:06d}.tar"
+
+    def _upload_file(self, entry, parent) -> None:
+        print(ULMessage(entry.id).str_value())
+        self._wrapper._put_file(
+            local_path=entry.id,
+            destination=self._wrapper._upload_destination(
+                parent, entry.path[-1])
+        )
+
+    def _upload_pack(self, pack: Pack, packs_dir) -> None:
+        """
+        Streams archive to storage through bounded pipe, archive is
+        written by its own thread.
+
+        Raises:
+            ChecksumMismatchException: if storage stored something else.
+        """
+        print(PackMessage(pack.name, len(pack)).str_value())
+        pipe = Pipe(len(pack))
+
+        def write():
+            try:
+                pack.write(pipe)
+            except BaseException as e:
+                pipe.close(e)
+            else:
+                pipe.close()
+
+        producer = threading.Thread(target=write, daemon=True)
+        producer.start()
+        try:
+            remote_md5 = self._wrapper._put_stream(pipe, packs_dir, pack.name)
+        finally:
+            pipe.abort()
+            producer.join()
+        if remote_md5 is not None and remote_md5 != pipe.md5():
+            raise ChecksumMismatchException(pack.name, pipe.md5(), remote_md5)
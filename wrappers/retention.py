@@ -0,0 +1,77 @@
+import datetime
+from collections import namedtuple
+from typing import Iterable
+
+SnapshotDir = namedtuple(
+    "SnapshotDir", ["name", "time", "remote_id", "catalog_id"])
+SnapshotDir.__doc__ = """
+Remote folder of snapshot. `time` is datetime snapshot was made at,
+`catalog_id` is id of snapshot in local catalog or None if snapshot was
+found by remote listing.
+"""
+
+
+class RetentionPolicy:
+    """
+    Policy like "keep 7 daily, 4 weekly, 12 monthly snapshots".
+
+    Every rule keeps the newest snapshot of each of its last N periods
+    which have snapshots (days, ISO weeks, months), `last` keeps N newest
+    snapshots. Snapshot is kept if any rule keeps it.
+    """
+
+    _PERIODS = {
+        "last": lambda time: time,
+        "daily": lambda time: time.date(),
+        "weekly": lambda time: time.isocalendar()[:2],
+        "monthly": lambda time: (time.year, time.month),
+    }
+
+    def __init__(self, last=0, daily=0, weekly=0, monthly=0):
+        """
+        Raises:
+            ValueError: if some count is negative or policy keeps
+             nothing, all snapshots would be deleted.
+        """
+        self._counts = {
+            "last": last, "daily": daily, "weekly": weekly,
+            "monthly": monthly
+        }
+        if any(count < 0 for count in self._counts.values()):
+            raise ValueError("Retention counts can't be negative.")
+        if not any(self._counts.values()):
+            raise ValueError("Retention policy must keep some snapshots.")
+
+    def apply(self, snapshots: Iterable[SnapshotDir]):
+        """
+        Returns:
+            Tuple of lists of kept and expired snapshots from oldest one.
+        """
+        newest_first = sorted(snapshots, key=lambda s: s.time, reverse=True)
+        kept = set()
+        for rule, count in self._counts.items():
+            period_of = self._PERIODS[rule]
+            periods = set()
+            for snapshot in newest_first:
+                if len(periods) >= count:
+                    break
+                period = period_of(snapshot.time)
+                if period not in periods:
+                    periods.add(period)
+                    kept.add(snapshot)
+        oldest_first = newest_first[::-1]
+        return (
+            [s for s in oldest_first if s in kept],
+            [s for s in oldest_first if s not in kept]
+        )
+
+
+def parse_snapshot_name(name: str):
+    """
+    Returns datetime of snapshot folder named by date (e.g. '2026-10-17')
+    or None if name isn't a date.
+    """
+    try:
+        return datetime.datetime.fromisoformat(name)
+    except ValueError:
+        return None
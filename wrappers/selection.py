@@ -0,0 +1,41 @@
+import errno
+import os
+
+from cloudbackup.exceptions import UnsafePathException
+
+
+def select_recorded(index, paths: list = None) -> list:
+    """
+    Selects files recorded in index of packs, manifest of chunk store
+    or snapshot catalog, i.e. in `index` which is iterable of records
+    with '/' separated `path` and has `get(path)` method if `paths`
+    are given.
+
+    Returns records with given paths or inside folders with given paths,
+    all records if `paths` is None. Records are written relative to
+    destination folder, so their paths are checked not to lead outside
+    of it.
+
+    Raises:
+        FileNotFoundError: if some of `paths` isn't in `index`.
+        UnsafePathException: if path of record is absolute or has '..'
+         part.
+    """
+    for record in index:
+        if record.path.startswith("/") or ".." in record.path.split("/"):
+            raise UnsafePathException(record.path)
+    if paths is None:
+        return list(index)
+    selected = {}
+    for path in paths:
+        path = path.strip("/")
+        record = index.get(path)
+        if record is not None:
+            selected[record.path] = record
+            continue
+        inside = [r for r in index if r.path.startswith(path + "/")]
+        if not inside:
+            raise FileNotFoundError(
+                errno.ENOENT, os.strerror(errno.ENOENT), path)
+        selected.update((r.path, r) for r in inside)
+    return list(selected.values())
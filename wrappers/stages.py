@@ -0,0 +1,217 @@
+import errno
+import hashlib
+import tempfile
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Iterator
+
+from cloudbackup._defaults import (COMPRESSION_BLOCK_SIZE,
+                                   COMPRESSION_SPOOL_SIZE,
+                                   ENCRYPTED_SUFFIX)
+from cloudbackup.exceptions import DecompressionException
+from cloudbackup.hashing import HashingReader
+from wrappers.defaults import ENCRYPTION_KEY_MISSING_MSG
+
+if TYPE_CHECKING:
+    # codecs are imported only when names of stored files are decoded
+    from cloudbackup.compression import Compressor
+
+
+def _strip_encrypted(name: str) -> tuple:
+    if name.endswith(ENCRYPTED_SUFFIX):
+        return name[:-len(ENCRYPTED_SUFFIX)], True
+    return name, False
+
+
+class StagedStream:
+    """
+    Iterable of content of local file passed through stages. md5 of sent
+    data and Digests of local content are computed on the way.
+    """
+
+    def __init__(self, local_path: Path, transforms: list):
+        self._local_path = local_path
+        self._transforms = transforms
+        self._md5 = hashlib.md5()
+        self._reader = None
+
+    def __iter__(self) -> Iterator[bytes]:
+        with HashingReader(self._local_path) as reader:
+            self._reader = reader
+            chunks = iter(lambda: reader.read(COMPRESSION_BLOCK_SIZE), b"")
+            for transform in self._transforms:
+                chunks = transform(chunks)
+            for chunk in chunks:
+                self._md5.update(chunk)
+                yield chunk
+
+    def md5(self) -> str:
+        """
+        Returns md5 of data yielded so far.
+        """
+        return self._md5.hexdigest()
+
+    def digests(self):
+        """
+        Returns Digests of local content read so far.
+        """
+        return self._reader.digests()
+
+
+class _SizedStagedStream(StagedStream):
+    """
+    StagedStream whose size is known in advance, `__len__` lets HTTP
+    client send Content-Length instead of chunked body.
+    """
+
+    def __init__(self, local_path: Path, transforms: list, size: int):
+        super().__init__(local_path, transforms)
+        self._size = size
+
+    def __len__(self):
+        return self._size
+
+
+class _SpooledStagedStream(StagedStream):
+    """
+    StagedStream of compressed file. Size of compressed content isn't
+    known until file is compressed, so it's compressed to spool first
+    and rest of stages are applied while spool is sent. `size` maps
+    size of compressed content to size of sent one.
+    """
+
+    def __init__(
+            self,
+            local_path: Path,
+            compress: Callable,
+            transforms: list,
+            size: Callable[[int], int] = None
+    ):
+        super().__init__(local_path, transforms)
+        self._compress = compress
+        self._size = size
+        self._spool = None
+        self._spooled_size = 0
+
+    def _spooled(self):
+        if self._spool is None:
+            self._spool = tempfile.SpooledTemporaryFile(COMPRESSION_SPOOL_SIZE)
+            with HashingReader(self._local_path) as reader:
+                self._reader = reader
+                blocks = iter(
+                    lambda: reader.read(COMPRESSION_BLOCK_SIZE), b"")
+                for block in self._compress(blocks):
+                    self._spool.write(block)
+            self._spooled_size = self._spool.tell()
+        return self._spool
+
+    def __len__(self):
+        self._spooled()
+        if self._size is None:
+            return self._spooled_size
+        return self._size(self._spooled_size)
+
+    def __iter__(self) -> Iterator[bytes]:
+        spool = self._spooled()
+        spool.seek(0)
+        try:
+            chunks = iter(lambda: spool.read(COMPRESSION_BLOCK_SIZE), b"")
+            for transform in self._transforms:
+                chunks = transform(chunks)
+            for chunk in chunks:
+                self._md5.update(chunk)
+                yield chunk
+        finally:
+            spool.close()
+            self._spool = None
+
+
+class Stages:
+    """
+    Optional stages between local file and storage: compression and
+    then encryption on upload, decryption and then decompression on
+    download. Stages applied to stored file are recorded by suffixes of
+    its name (e.g. 'dump.sql.cb.gz.cb.enc'), so files are restored
+    without any other state. `cipher` is `cloudbackup.encryption.Cipher`,
+    which is imported only if encryption is used.
+    """
+
+    def __init__(self, compressor: "Compressor" = None, cipher=None):
+        self._compressor = compressor
+        self._cipher = cipher
+
+    def remote_name(self, local_path: Path, name: str) -> str:
+        """
+        Returns name local file is stored with.
+        """
+        if self._compressor is not None:
+            name = self._compressor.remote_name(local_path, name)
+        if self._cipher is not None:
+            name += ENCRYPTED_SUFFIX
+        return name
+
+    def stream(
+            self,
+            local_path: Path,
+            name: str,
+            remote_name: str
+    ) -> StagedStream:
+        """
+        Returns content of local file `name` stored as `remote_name`
+        returned by `remote_name` method. Size of staged content is
+        known, so it's sent with Content-Length.
+        """
+        transforms, size = [], None
+        if self._cipher is not None:
+            remote_name = remote_name[:-len(ENCRYPTED_SUFFIX)]
+            transforms.append(self._cipher.encrypt)
+            size = self._cipher.encrypted_size
+        if remote_name != name:
+            return _SpooledStagedStream(
+                local_path, self._compressor.compress, transforms, size)
+        if size is None:
+            return StagedStream(local_path, transforms)
+        return _SizedStagedStream(
+            local_path, transforms, size(local_path.stat().st_size))
+
+    @staticmethod
+    def local_name(remote_name: str) -> str:
+        """
+        Returns original name of stored file.
+        """
+        from cloudbackup.compression import codec_of
+        return codec_of(_strip_encrypted(remote_name)[0])[0]
+
+    def decoder(self, remote_name: str) -> Callable:
+        """
+        Returns function restoring original content from chunks of
+        stored file or None if file is stored as is. Content which
+        can't be decompressed raises `DecompressionException`.
+
+        Raises:
+            FileNotFoundError: if file is encrypted and there is no key.
+        """
+        from cloudbackup.compression import codec_of
+        name, encrypted = _strip_encrypted(remote_name)
+        codec = codec_of(name)[1]
+        if encrypted and self._cipher is None:
+            raise FileNotFoundError(
+                errno.ENOENT, ENCRYPTION_KEY_MISSING_MSG, remote_name)
+        if not encrypted and codec is None:
+            return None
+
+        def decode(chunks):
+            if encrypted:
+                chunks = self._cipher.decrypt(chunks)
+            if codec is not None:
+                chunks = _decompress(chunks, codec, remote_name)
+            return chunks
+
+        return decode
+
+
+def _decompress(chunks, codec, remote_name: str) -> Iterator[bytes]:
+    from cloudbackup.compression import DECOMPRESSION_ERRORS, decompress
+    try:
+        yield from decompress(chunks, codec)
+    except DECOMPRESSION_ERRORS:
+        raise DecompressionException(remote_name) from None
@@ -1,5 +1,14 @@
+import hashlib
+import threading
+import time
 import pytest
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import Mock, patch, call
+from cloudbackup.exceptions import (
+    ApiResponseException,
+    ChecksumMismatchException
+)
+from cloudbackup.file_objects import RemoteFile
 from wrappers._base_wrapper import BaseWrapper
 
 
@@ -23,14 +32,61 @@ def test_put_file_gets_upload_link_and_then_uploads(wrapper, tmp_path):
     test_file = tmp_path / "test.txt"
     test_file.write_bytes(b"hello from test file")
     wrapper._storage.get_upload_link = Mock(return_value="upload link")
-    wrapper._storage.upload_file = Mock()
-    wrapper._put_file(test_file, "root")
+    sent = []
+    wrapper._storage.upload_file = Mock(
+        side_effect=lambda link, data: sent.append((link, data.read()))
+    )
+    digests, file_id = wrapper._put_file(test_file, "root")
     assert wrapper._storage.get_upload_link.mock_calls == [
         call(test_file, "root")
     ]
-    assert wrapper._storage.upload_file.mock_calls == [
-        call("upload link", b"hello from test file")
-    ]
+    assert sent == [("upload link", b"hello from test file")]
+    assert digests.md5 == hashlib.md5(b"hello from test file").hexdigest()
+    assert file_id is None
+
+
+def test_send_file_verifies_md5_reported_by_storage(wrapper, tmp_path):
+    test_file = tmp_path / "test.txt"
+    test_file.write_bytes(b"hello from test file")
+    wrapper._storage.upload_file = Mock(
+        side_effect=lambda link, data: hashlib.md5(data.read()).hexdigest()
+    )
+    wrapper._send_file("upload link", test_file)
+    wrapper._storage.upload_file = Mock(
+        side_effect=lambda link, data: hashlib.md5(b"corrupted").hexdigest()
+    )
+    with pytest.raises(ChecksumMismatchException):
+        wrapper._send_file("upload link", test_file)
+
+
+def test_mismatched_upload_is_removed_before_raising(wrapper, tmp_path):
+    test_file = tmp_path / "test.txt"
+    test_file.write_bytes(b"hello from test file")
+    older = Mock(id="old_id", modified=1.0)
+    uploaded = Mock(id="new_id", modified=2.0)
+    other = Mock(id="other_id", modified=3.0)
+    for file, name in ((older, "test.txt"), (uploaded, "test.txt"),
+                       (other, "other.txt")):
+        file.name = name
+    wrapper._list_dir = Mock(return_value=[older, uploaded, other])
+    wrapper._storage.upload_file = Mock(return_value="0" * 32)
+    with pytest.raises(ChecksumMismatchException):
+        wrapper._put_file(test_file, "dir_id")
+    wrapper._list_dir.assert_called_once_with("dir_id")
+    assert wrapper._storage.remove.mock_calls == [call("new_id", True)]
+
+
+def test_mismatched_replacement_is_trashed(wrapper, tmp_path, remote_file):
+    test_file = tmp_path / "test.txt"
+    test_file.write_bytes(b"hello from test file")
+    remote_file.id = "file_id"
+    wrapper._get_replace_link = Mock(return_value="update link")
+    wrapper._storage.upload_file = Mock(return_value="0" * 32)
+    wrapper._storage.remove.side_effect = ApiResponseException(
+        500, "Backend error.")
+    with pytest.raises(ChecksumMismatchException):
+        wrapper._replace_file(test_file, remote_file)
+    assert wrapper._storage.remove.mock_calls == [call("file_id", False)]
 
 
 def test_remove_not_permanently_prints_trash_msg(wrapper, capsys, remote_file):
@@ -54,3 +110,139 @@ def test_remove_call_storage_remove_properly(wrapper, remote_file):
         assert wrapper._storage.remove.mock_calls == [
             call("some_id", False)
         ]
+
+
+def test_remove_glob_asks_once_and_removes_all_matches(wrapper):
+    files = [Mock(id=f"disk:/logs/{name}") for name in ("a.log", "b.txt",
+                                                        "c.log")]
+    for file, name in zip(files, ("a.log", "b.txt", "c.log")):
+        file.name = name
+    wrapper._list_dir = Mock(return_value=files)
+    wrapper._storage.remove.return_value = None
+    with patch("builtins.input") as input_mock:
+        input_mock.return_value = "y"
+        wrapper.remove(["disk:/logs/*.log"], permanently=True, jobs=2)
+    assert input_mock.call_count == 1
+    assert "2 files" in input_mock.call_args.args[0]
+    wrapper._list_dir.assert_called_once_with("disk:/logs")
+    assert sorted(wrapper._storage.remove.mock_calls) == [
+        call("disk:/logs/a.log", True), call("disk:/logs/c.log", True)
+    ]
+
+
+def test_remove_glob_without_matches_raises(wrapper):
+    wrapper._list_dir = Mock(return_value=[])
+    with pytest.raises(FileNotFoundError):
+        wrapper.remove("disk:/logs/*.log")
+    wrapper._storage.remove.assert_not_called()
+
+
+def test_remove_glob_prefers_file_named_like_pattern(wrapper):
+    files = [Mock(id=f"disk:/logs/{name}") for name in ("a[1].log", "a1.log")]
+    for file, name in zip(files, ("a[1].log", "a1.log")):
+        file.name = name
+    wrapper._list_dir = Mock(return_value=files)
+    wrapper._storage.remove.return_value = None
+    with patch("builtins.input", return_value="y"):
+        wrapper.remove("disk:/logs/a[1].log", permanently=True)
+    assert wrapper._storage.remove.mock_calls == [
+        call("disk:/logs/a[1].log", True)
+    ]
+
+
+def test_remove_polls_async_operations(wrapper, capsys, remote_file):
+    wrapper._storage.get_file.return_value = remote_file
+    wrapper._storage.remove.return_value = "operation link"
+    wrapper._storage.operation_status.side_effect = [
+        "in-progress", "success"
+    ]
+    with patch("builtins.input", return_value="y"), \
+            patch("wrappers._base_wrapper.time.sleep") as sleep_mock:
+        wrapper.remove("some_id", permanently=True)
+    assert wrapper._storage.operation_status.mock_calls == [
+        call("operation link"), call("operation link")
+    ]
+    sleep_mock.assert_called_once()
+    assert "Successfully deleted `test_file`." in capsys.readouterr().out
+
+
+def test_remove_raises_if_async_operation_failed(wrapper, remote_file):
+    wrapper._storage.get_file.return_value = remote_file
+    wrapper._storage.remove.return_value = "operation link"
+    wrapper._storage.operation_status.return_value = "failed"
+    with patch("builtins.input", return_value="y"):
+        with pytest.raises(ApiResponseException):
+            wrapper.remove("some_id", permanently=True)
+
+
+def test_diff_prints_changes(wrapper, tmp_path, capsys):
+    (tmp_path / "new.txt").touch()
+    remote_dir = RemoteFile("old", "dir", "dir_id")
+    wrapper._list_dir = Mock(side_effect=[[remote_dir], []])
+    wrapper.diff(tmp_path, "root")
+    assert wrapper._list_dir.mock_calls == [call("root"), call("dir_id")]
+    assert capsys.readouterr().out == "+ new.txt\n- old/\n"
+
+
+def test_remove_waits_operations_when_other_removals_fail(wrapper, capsys):
+    targets = []
+    for name in ("dir", "locked"):
+        file = Mock()
+        file.name = name
+        targets.append((f"disk:/{name}", file))
+    error = ApiResponseException(423, "Resource is locked.")
+
+    def remove(file_id, permanently):
+        if file_id == "disk:/locked":
+            raise error
+        return "operation link"
+
+    wrapper._storage.remove.side_effect = remove
+    wrapper._storage.operation_status.return_value = "success"
+    with pytest.raises(ApiResponseException) as raised:
+        wrapper._remove_all(targets, True, 2)
+    assert raised.value is error
+    wrapper._storage.operation_status.assert_called_once_with(
+        "operation link")
+    assert "Successfully deleted `dir`." in capsys.readouterr().out
+
+
+def test_run_concurrently_cancels_queued_actions_on_error():
+    started = []
+
+    def action(number):
+        started.append(number)
+        if number == 0:
+            raise ApiResponseException(500, "Backend error.")
+        time.sleep(0.05)
+
+    with pytest.raises(ApiResponseException):
+        with ThreadPoolExecutor(1) as pool:
+            BaseWrapper._run_concurrently(pool, action, range(20), 1)
+    # worker may take the next action before it's cancelled
+    assert started in ([0], [0, 1])
+
+
+def test_run_concurrently_takes_actions_as_running_ones_finish():
+    release = threading.Event()
+    taken = []
+
+    def actions():
+        for number in range(100):
+            taken.append(number)
+            yield number
+
+    def action(number):
+        release.wait(5)
+
+    with ThreadPoolExecutor(2) as pool:
+        runner = threading.Thread(
+            target=BaseWrapper._run_concurrently,
+            args=(pool, action, actions(), 2))
+        runner.start()
+        time.sleep(0.1)
+        # twice as many actions as workers are in flight, one more waits
+        assert taken == [0, 1, 2, 3, 4]
+        release.set()
+        runner.join(5)
+    assert len(taken) == 100
@@ -0,0 +1,123 @@
+import hashlib
+import os
+import random
+import pytest
+from unittest.mock import Mock
+from cloudbackup.chunking import Chunker
+from cloudbackup.exceptions import ChecksumMismatchException
+from wrappers.chunk_store import ChunkStore
+
+
+class Remote:
+    """
+    Folders of storage in memory, ids of files are their paths.
+    """
+
+    def __init__(self):
+        self.files = {}
+        self.puts = []
+
+    def file(self, path):
+        file = Mock(id=path, modified=len(self.puts))
+        file.name = path.rsplit("/", 1)[-1]
+        return file
+
+    def list_dir(self, parent):
+        return [self.file(path) for path in self.files
+                if path.rsplit("/", 1)[0] == parent]
+
+    def find_child(self, parent, name):
+        path = f"{parent}/{name}"
+        return self.file(path) if path in self.files else None
+
+    def make_dir(self, parent, name):
+        self.files[f"{parent}/{name}"] = None
+        return f"{parent}/{name}"
+
+    def put_stream(self, data, parent, name):
+        self.files[f"{parent}/{name}"] = data
+        self.puts.append(name)
+        return hashlib.md5(data).hexdigest()
+
+    def wrapper(self):
+        wrapper = Mock()
+        wrapper._normalize_destination.side_effect = lambda d: d
+        wrapper._list_dir.side_effect = self.list_dir
+        wrapper._find_child.side_effect = self.find_child
+        wrapper._make_dir.side_effect = self.make_dir
+        wrapper._put_stream.side_effect = self.put_stream
+        wrapper._open_stream.side_effect = lambda path: [self.files[path]]
+        return wrapper
+
+
+@pytest.fixture()
+def store():
+    remote = Remote()
+    store = ChunkStore(
+        remote.wrapper(), "disk:/repo", jobs=2,
+        chunker=Chunker(min_size=256, average_size=1024, max_size=4096))
+    return remote, store
+
+
+def make_tree(root):
+    (root / "db").mkdir(parents=True)
+    (root / "db" / "data.bin").write_bytes(random.Random(1).randbytes(100000))
+    (root / "notes.txt").write_bytes(b"notes\n" * 100)
+    (root / "empty").write_bytes(b"")
+
+
+def test_backup_uploads_only_changed_chunks(store, tmp_path):
+    remote, store = store
+    root = tmp_path / "tree"
+    make_tree(root)
+    first = store.backup(root, name="first")
+    assert first["files"] == 3
+    assert first["bytes"] == 100600
+    assert remote.puts[-1] == "first.jsonl.gz"
+    data = root / "db" / "data.bin"
+    content = data.read_bytes()
+    data.write_bytes(content[:50000] + b"changed" + content[50000:])
+    remote.puts.clear()
+    second = store.backup(root, name="second")
+    assert second["files"] == 3
+    assert second["unchanged"] == 2
+    assert second["chunks"] <= 3
+    assert second["bytes"] < 10000
+    assert len(remote.puts) == second["chunks"] + 1
+    with pytest.raises(FileExistsError):
+        store.backup(root, name="second")
+
+
+def test_restore_writes_files_and_mtimes(store, tmp_path, capsys):
+    remote, store = store
+    root = tmp_path / "tree"
+    make_tree(root)
+    os.utime(root / "notes.txt", (1700000000, 1700000000))
+    store.backup(root, name="first")
+    out = tmp_path / "out"
+    result = store.restore("first", out)
+    assert result["files"] == 3
+    for name in ("db/data.bin", "notes.txt", "empty"):
+        assert (out / name).read_bytes() == (root / name).read_bytes()
+    assert (out / "notes.txt").stat().st_mtime == 1700000000
+    assert "Restoring: `db/data.bin`" in capsys.readouterr().out
+    with pytest.raises(FileExistsError):
+        store.restore("first", out, paths=["db"])
+    result = store.restore("first", out, paths=["db"], ov=True)
+    assert result["files"] == 1
+    with pytest.raises(FileNotFoundError):
+        store.restore("missing", out)
+
+
+def test_restore_checks_chunks(store, tmp_path):
+    remote, store = store
+    local_file = tmp_path / "file.bin"
+    local_file.write_bytes(random.Random(2).randbytes(10000))
+    store.backup(local_file, name="first")
+    chunk = next(path for path in remote.files if "/chunks/" in path)
+    remote.files[chunk] = b"corrupted"
+    with pytest.raises(ChecksumMismatchException):
+        store.restore("first", tmp_path / "out")
+    del remote.files[chunk]
+    with pytest.raises(FileNotFoundError):
+        store.restore("first", tmp_path / "out", ov=True)
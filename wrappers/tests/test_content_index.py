@@ -0,0 +1,64 @@
+import hashlib
+from unittest.mock import Mock, call
+from cloudbackup.file_objects import RemoteFile
+from wrappers.content_index import ContentIndex
+
+
+def remote_file(file_id, content):
+    return RemoteFile(file_id.rpartition("/")[2], "file", file_id,
+                      size=len(content), md5=hashlib.md5(content).hexdigest())
+
+
+def md5(path):
+    return hashlib.md5(path.read_bytes()).hexdigest()
+
+
+def test_find_returns_remote_file_with_same_content(tmp_path):
+    index = ContentIndex(
+        [remote_file("old/a.txt", b"hello"),
+         remote_file("old/b.txt", b"world"),
+         RemoteFile("doc", "g.suite", "g.suite")],
+        md5
+    )
+    local = tmp_path / "a.txt"
+    local.write_bytes(b"hello")
+    assert index.find(index.key(local)) == "old/a.txt"
+    local.write_bytes(b"hello!")
+    assert index.find(index.key(local)) is None
+
+
+def test_empty_files_are_not_indexed(tmp_path):
+    index = ContentIndex([remote_file("empty", b"")], md5)
+    local = tmp_path / "empty"
+    local.touch()
+    assert index.key(local) is None
+    assert index.find(index.key(local)) is None
+
+
+def test_added_id_is_resolved_once_when_found(tmp_path):
+    index = ContentIndex([], md5)
+    local = tmp_path / "a.txt"
+    local.write_bytes(b"hello")
+    resolve = Mock(return_value="new/a.txt")
+    index.add(index.key(local), resolve, md5(local))
+    resolve.assert_not_called()
+    assert index.find(index.key(local)) == "new/a.txt"
+    assert index.find(index.key(local)) == "new/a.txt"
+    resolve.assert_called_once()
+
+
+def test_file_is_hashed_only_if_some_file_has_its_size(tmp_path):
+    hasher = Mock(side_effect=md5)
+    index = ContentIndex([remote_file("old/a.txt", b"hello")], hasher)
+    local = tmp_path / "b.txt"
+    local.write_bytes(b"hello!")
+    key = index.key(local)
+    assert index.find(key) is None
+    hasher.assert_not_called()
+    index.add(key, "new/b.txt")
+    copy = tmp_path / "c.txt"
+    copy.write_bytes(b"hello!")
+    assert index.find(index.key(copy)) is None
+    index.add(key, "new/b.txt", md5(local))
+    assert index.find(index.key(copy)) == "new/b.txt"
+    assert hasher.mock_calls == [call(copy)]
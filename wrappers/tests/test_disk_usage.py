@@ -0,0 +1,62 @@
+import pytest
+from wrappers.disk_usage import DiskUsage
+
+
+@pytest.fixture()
+def usage():
+    """
+    /
+    |-- a (10 + 5 + 1)
+    |   |-- b (5)
+    |   `-- c (1)
+    |-- d (empty)
+    `-- 100 bytes in root
+    """
+    usage = DiskUsage("root")
+    usage.add_file("b_id", 5)
+    usage.add_folder("b_id", "a_id", "b")
+    usage.add_folder("a_id", "root", "a")
+    usage.add_folder("c_id", "a_id", "c")
+    usage.add_folder("d_id", "root", "d")
+    usage.add_file("a_id", 10)
+    usage.add_file("c_id", 1)
+    usage.add_file("root", 100)
+    return usage
+
+
+def test_report_rolls_up_totals(usage):
+    assert usage.report() == [
+        ("/", 116),
+        ("/a", 16),
+        ("/a/b", 5),
+        ("/a/c", 1),
+        ("/d", 0),
+    ]
+
+
+def test_report_respects_depth(usage):
+    assert usage.report(depth=1) == [("/", 116), ("/a", 16), ("/d", 0)]
+    assert usage.report(depth=0) == [("/", 116)]
+
+
+def test_report_limits_to_largest_folders(usage):
+    assert usage.report(limit=2) == [("/", 116), ("/a", 16)]
+
+
+def test_report_for_subfolder(usage):
+    assert usage.report("a_id") == [
+        ("/a", 16), ("/a/b", 5), ("/a/c", 1)
+    ]
+
+
+def test_unknown_parent_is_counted_in_root():
+    usage = DiskUsage("root")
+    usage.add_folder("a_id", "shared_folder_id", "a")
+    usage.add_file("a_id", 3)
+    usage.add_file("real_root_id", 4)
+    assert usage.report() == [("/", 7), ("/a", 3)]
+
+
+def test_report_raises_key_error_for_unknown_top(usage):
+    with pytest.raises(KeyError):
+        usage.report("unknown")
@@ -0,0 +1,66 @@
+import hashlib
+import pytest
+from unittest.mock import call, patch
+from wrappers.fan_out import FanOutUpload
+from wrappers.gdrive_wrapper import GDriveWrapper
+from wrappers.yadisk_wrapper import YaDiskWrapper
+
+
+@pytest.fixture()
+def targets():
+    with patch("wrappers.gdrive_wrapper.GDrive"), \
+            patch("wrappers.yadisk_wrapper.YaDisk"):
+        gdrive, yadisk = GDriveWrapper(), YaDiskWrapper()
+    gdrive._storage.mkdir.return_value = "folder_id"
+    for wrapper in (gdrive, yadisk):
+        wrapper._storage.get_upload_link.return_value = "link"
+    return gdrive, yadisk
+
+
+def _receive(sent, fail_on=None):
+    def upload_file(link, data):
+        content = data if isinstance(data, bytes) else data.read()
+        if content == fail_on:
+            raise ConnectionError("connection reset")
+        sent.append(content)
+        return hashlib.md5(content).hexdigest()
+    return upload_file
+
+
+def test_fan_out_uploads_same_data_to_every_target(targets, tmp_path):
+    gdrive, yadisk = targets
+    (tmp_path / "backup").mkdir()
+    (tmp_path / "backup" / "a.txt").write_bytes(b"a" * 3000)
+    (tmp_path / "backup" / "b.txt").write_bytes(b"")
+    to_gdrive, to_yadisk = [], []
+    gdrive._storage.upload_file.side_effect = _receive(to_gdrive)
+    yadisk._storage.upload_file.side_effect = _receive(to_yadisk)
+    results = FanOutUpload({
+        "gdrive": (gdrive, "root"),
+        "yadisk": (yadisk, "/"),
+    }).upload(tmp_path / "backup")
+    assert results == {
+        "gdrive": {"uploaded": 2},
+        "yadisk": {"uploaded": 2},
+    }
+    assert to_gdrive == to_yadisk == [b"a" * 3000, b""]
+    assert gdrive._storage.mkdir.mock_calls == [
+        call("backup", parent_id="root")
+    ]
+    assert yadisk._storage.mkdir.mock_calls == [call("disk:/backup")]
+
+
+def test_failure_of_one_target_doesnt_stop_other(targets, tmp_path, capsys):
+    gdrive, yadisk = targets
+    (tmp_path / "a.txt").write_bytes(b"first")
+    to_gdrive, to_yadisk = [], []
+    gdrive._storage.upload_file.side_effect = _receive(to_gdrive)
+    yadisk._storage.upload_file.side_effect = _receive(
+        to_yadisk, fail_on=b"first")
+    results = FanOutUpload({
+        "gdrive": (gdrive, "root"),
+        "yadisk": (yadisk, "/"),
+    }).upload(tmp_path / "a.txt")
+    assert results == {"gdrive": {"uploaded": 1}, "yadisk": {"failed": 1}}
+    assert to_gdrive == [b"first"]
+    assert "Failed to upload" in capsys.readouterr().out
@@ -1,8 +1,15 @@
+import hashlib
 import pytest
 from collections import namedtuple
-from pathlib import Path
+from pathlib import Path, PurePosixPath
 from unittest.mock import Mock, call, patch
+from cloudbackup.exceptions import (
+    ApiResponseException,
+    ChecksumMismatchException
+)
+from cloudbackup.file_objects import GDriveFile
 from wrappers.gdrive_wrapper import GDriveWrapper
+from wrappers.yadisk_wrapper import YaDiskWrapper
 
 
 @pytest.fixture()
@@ -11,23 +18,37 @@ def wrapper():
         return GDriveWrapper()
 
 
+MIME_TYPES = {
+    "file": "text/plain",
+    "dir": "application/vnd.google-apps.folder",
+    "g.suite": "application/vnd.google-apps.document",
+}
+
+
+def gdrive_file(file_id, name, type="file", size=None, md5=None,
+                parents=None):
+    meta_inf = {"id": file_id, "name": name, "mimeType": MIME_TYPES[type],
+                "size": size, "md5Checksum": md5}
+    if parents is not None:
+        meta_inf["parents"] = parents
+    return GDriveFile(meta_inf)
+
+
 @pytest.fixture()
 def dl_page():
     Page = namedtuple("Page", ["files", "next_page_token"])
-    files = [Mock() for _ in range(2)]
-    for file in files:
-        file.id = files.index(file)
-        file.type = "file"
-        file.name = f"test_file-{files.index(file)}"
+    files = [gdrive_file(str(i), f"test_file-{i}") for i in range(2)]
     return Page(files, None)
 
 
+def ls_lines(*numbers):
+    return "".join(f"[F] file-{i} ({i})\n" for i in numbers)
+
+
 @pytest.fixture()
 def ls_pages():
     Page = namedtuple("Page", ["files", "next_page_token"])
-    files = [Mock() for _ in range(5)]
-    for file in files:
-        file.str_value.return_value = files.index(file)
+    files = [gdrive_file(str(i), f"file-{i}") for i in range(5)]
     pages = [
         Page([files[4], files[3]], "first_page_token"),
         Page([files[2], files[1]], "second_page_token"),
@@ -79,7 +100,7 @@ def test_lsdir_with_file_id_prints_correct_data(wrapper, capsys, ls_pages):
             call("List next page? ([y]/n) ") for _ in range(2)
         ]
         captured = capsys.readouterr()
-        assert captured.out == "4\n3\n2\n1\n0\n"
+        assert captured.out == ls_lines(4, 3, 2, 1, 0)
 
 
 def test_lsdir_prints_only_one_page_and_aborted_msg_if_user_doesnt_confirm(
@@ -93,7 +114,7 @@ def test_lsdir_prints_only_one_page_and_aborted_msg_if_user_doesnt_confirm(
             call("List next page? ([y]/n) ")
         ]
         captured = capsys.readouterr()
-        assert captured.out == "4\n3\nAborted.\n"
+        assert captured.out == ls_lines(4, 3) + "Aborted.\n"
 
 
 def test_lsdir_without_file_id_prints_correct_data(wrapper, capsys, ls_pages):
@@ -102,7 +123,7 @@ def test_lsdir_without_file_id_prints_correct_data(wrapper, capsys, ls_pages):
         wrapper.lsdir(file_id=None, order_key="modified")
         input_mock.assert_not_called()
         captured = capsys.readouterr()
-        assert captured.out == "4\n3\n2\n1\n0\n"
+        assert captured.out == ls_lines(4, 3, 2, 1, 0)
 
 
 def test_download_raises_type_error_when_local_dest_is_none(wrapper):
@@ -111,10 +132,9 @@ def test_download_raises_type_error_when_local_dest_is_none(wrapper):
 
 
 def test_download_file_prints_correct_data(capsys, wrapper, not_existing_file):
-    remote_target = Mock()
-    remote_target.type = "file"
+    remote_target = Mock(type="file", md5=None)
     remote_target.name = not_existing_file.name
-    wrapper._storage.download = Mock(return_value=b"any bytes")
+    wrapper._storage.download_stream = Mock(return_value=[b"any bytes"])
     wrapper.download(remote_target, Path(""))
     captured = capsys.readouterr()
     assert captured.out == f"Downloading: `{not_existing_file}`...\n"
@@ -123,10 +143,9 @@ def test_download_file_prints_correct_data(capsys, wrapper, not_existing_file):
 def test_download_dir_prints_correct_data(
         capsys, wrapper, not_existing_dir, dl_page
 ):
-    remote_target = Mock()
-    remote_target.type = "dir"
+    remote_target = Mock(type="dir", md5=None)
     remote_target.name = not_existing_dir.name
-    wrapper._storage.download = Mock(return_value=b"hello world")
+    wrapper._storage.download_stream = Mock(return_value=[b"hello world"])
     wrapper._storage.lsdir.return_value = dl_page
     wrapper.download(remote_target, Path(""))
     captured = capsys.readouterr()
@@ -142,12 +161,11 @@ def is_file_downloaded(path: Path, data: bytes):
 
 
 def test_download_dir_happy_path(capsys, wrapper, not_existing_dir, dl_page):
-    remote_target = Mock()
-    remote_target.type = "dir"
+    remote_target = Mock(type="dir", md5=None)
     remote_target.name = not_existing_dir.name
     wrapper._storage.lsdir.return_value = dl_page
-    wrapper._storage.download = Mock(
-        side_effect=[b"hello from 0", b"hello from 1"]
+    wrapper._storage.download_stream = Mock(
+        side_effect=[[b"hello ", b"from 0"], [b"hello ", b"from 1"]]
     )
     wrapper.download(remote_target, Path(""))
     assert not_existing_dir.exists()
@@ -173,10 +191,9 @@ def test_download_doesnt_overwrite(tmp_path, wrapper, capsys):
 def test_download_overwrites(tmp_path, wrapper):
     test_file = tmp_path / "testfile.txt"
     test_file.write_bytes(b"hello from testfile")
-    file = Mock()
+    file = Mock(type="file", md5=None)
     file.name = "testfile.txt"
-    file.type = "file"
-    wrapper._storage.download = Mock(return_value=b"erased data")
+    wrapper._storage.download_stream = Mock(return_value=[b"erased data"])
     with patch("wrappers.gdrive_wrapper.GdriveDLMessage"):
         wrapper.download(file, tmp_path, ov=True)
         assert test_file.read_bytes() == b"erased data"
@@ -197,6 +214,7 @@ def test_upload_file_handles_simple_file_correctly(wrapper, tmp_path):
 
 def test_upload_resolves_dot_directory(wrapper, tmp_path):
     wrapper._storage.mkdir = Mock()
+    wrapper._storage.upload.return_value = {}
     wrapper.upload(Path(""), "root")
     assert wrapper._storage.mkdir.mock_calls[0] == call(
         Path("").resolve().name,
@@ -215,3 +233,139 @@ def test_uploads_handles_complex_dir(wrapper):
     Unreal to test due to Path.iterdir() arbitrary order.
     """
     pass
+
+
+def test_du_builds_folder_tree_from_parents(wrapper, capsys):
+    Page = namedtuple("Page", ["files", "next_page_token"])
+    folder = gdrive_file("dir_id", "dir", "dir", parents=["real_root"])
+    file_1 = gdrive_file("file_1", "a", size="2048", parents=["dir_id"])
+    file_2 = gdrive_file("file_2", "b", size="1024", parents=["real_root"])
+    wrapper._storage.lsdir = Mock(side_effect=[
+        Page([file_1], "next_page_token"),
+        Page([folder, file_2], None),
+    ])
+    wrapper.du(None)
+    assert wrapper._storage.lsdir.mock_calls[1] == call(
+        dir_id=None,
+        owners=["me"],
+        page_size=1000,
+        order_by="modifiedTime",
+        page_token="next_page_token",
+        extra_fields=("parents", "size")
+    )
+    captured = capsys.readouterr()
+    assert captured.out == "    3.0K  /\n    2.0K  /dir\n"
+
+
+def test_du_raises_file_not_found_for_unknown_folder(wrapper):
+    Page = namedtuple("Page", ["files", "next_page_token"])
+    wrapper._storage.lsdir = Mock(return_value=Page([], None))
+    with pytest.raises(FileNotFoundError):
+        wrapper.du("unknown_id")
+
+
+def test_lsdir_top_stops_early_for_server_sorted_keys(
+        wrapper, capsys, ls_pages
+):
+    wrapper._storage.lsdir = Mock(side_effect=ls_pages)
+    wrapper.lsdir(None, "rev_modified", top=2)
+    assert wrapper._storage.lsdir.mock_calls == [
+        call(
+            dir_id=None,
+            owners=["me"],
+            page_size=2,
+            order_by="modifiedTime desc",
+            page_token=None,
+            extra_fields=()
+        )
+    ]
+    assert capsys.readouterr().out == ls_lines(4, 3)
+
+
+def test_lsdir_top_ranks_by_actual_size(wrapper, capsys):
+    Page = namedtuple("Page", ["files", "next_page_token"])
+    files = [gdrive_file(str(size), f"file-{size}", size=size)
+             for size in (30, None, 10, 50, 20)]
+    wrapper._storage.lsdir = Mock(side_effect=[
+        Page(files[:2], "next_page_token"),
+        Page(files[2:], None),
+    ])
+    wrapper.lsdir(None, "rev_size", top=3)
+    assert len(wrapper._storage.lsdir.mock_calls) == 2
+    assert capsys.readouterr().out == ls_lines(50, 30, 20)
+
+
+def test_download_retries_corrupted_file(tmp_path, wrapper, capsys):
+    file = Mock(type="file", md5=hashlib.md5(b"good data").hexdigest())
+    file.name = "testfile.txt"
+    wrapper._storage.download_stream = Mock(
+        side_effect=[[b"bad data"], [b"good ", b"data"]]
+    )
+    summary = wrapper.download(file, tmp_path)
+    assert (tmp_path / "testfile.txt").read_bytes() == b"good data"
+    assert summary == {"verified": 1, "retried": 1}
+    assert "downloading again" in capsys.readouterr().out
+
+
+def test_download_raises_if_every_attempt_is_corrupted(tmp_path, wrapper):
+    file = Mock(type="file", md5=hashlib.md5(b"good data").hexdigest())
+    file.name = "testfile.txt"
+    wrapper._storage.download_stream = Mock(return_value=[b"bad data"])
+    with pytest.raises(ChecksumMismatchException):
+        wrapper.download(file, tmp_path)
+
+
+def test_copy_to_pipes_download_into_upload(wrapper):
+    with patch("wrappers.yadisk_wrapper.YaDisk"):
+        target = YaDiskWrapper()
+    root = Mock(id="dir_id", type="dir", size=None, modified=None, md5=None)
+    root.name = "backup"
+    inner = gdrive_file("file_id", "hello.txt", size="5",
+                        md5=hashlib.md5(b"hello").hexdigest())
+    wrapper._storage.get_file.return_value = root
+    wrapper._list_dir = lambda dir_id: [inner] if dir_id == "dir_id" else []
+    wrapper._storage.download_stream.return_value = iter([b"hel", b"lo"])
+    target._storage.get_upload_link.return_value = "link"
+    sent = []
+
+    def upload_file(link, data):
+        sent.append(data.read())
+        return hashlib.md5(sent[-1]).hexdigest()
+
+    target._storage.upload_file.side_effect = upload_file
+    wrapper.copy_to(target, "dir_id", "disk:/", jobs=2)
+    assert target._storage.mkdir.mock_calls == [call("disk:/backup")]
+    assert target._storage.get_upload_link.mock_calls == [
+        call(PurePosixPath("hello.txt"), "disk:/backup/hello.txt")
+    ]
+    assert sent == [b"hello"]
+
+
+def test_copy_to_skips_gsuite_documents(wrapper, capsys):
+    target = Mock()
+    document = Mock(id="doc_id", type="g.suite", size=None, modified=None,
+                    md5=None)
+    document.name = "notes"
+    wrapper._storage.get_file.return_value = document
+    wrapper.copy_to(target, "doc_id", "disk:/")
+    target._put_stream.assert_not_called()
+    wrapper._storage.download_stream.assert_not_called()
+    assert capsys.readouterr().out == "Skipping: `notes` ...\n"
+
+
+def test_remove_all_sends_batches_and_reports_failed_files(wrapper, capsys):
+    targets = []
+    for i in range(150):
+        file = Mock()
+        file.name = f"file_{i}"
+        targets.append((str(i), file))
+    error = ApiResponseException(404, "File not found: 3.")
+    wrapper._storage.remove_batch.side_effect = (
+        lambda ids, permanently: {"3": error} if "3" in ids else {})
+    removed = []
+    with pytest.raises(ApiResponseException):
+        wrapper._remove_all(targets, True, 2, on_removed=removed.append)
+    assert [len(c.args[0]) for c in
+            wrapper._storage.remove_batch.mock_calls] == [100, 50]
+    assert len(removed) == 149
+    assert "`file_3`" not in capsys.readouterr().out
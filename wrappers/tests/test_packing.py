@@ -0,0 +1,46 @@
+import io
+import tarfile
+from unittest.mock import Mock
+from cloudbackup.packs import INDEX_NAME, PackIndex
+from wrappers.packing import PackedUpload
+
+
+def test_small_files_are_packed_and_big_ones_uploaded(tmp_path):
+    root = tmp_path / "tree"
+    (root / "small").mkdir(parents=True)
+    (root / "big").mkdir()
+    for i in range(5):
+        (root / "small" / f"{i}.txt").write_bytes(b"x" * 600)
+    (root / "big" / "file.bin").write_bytes(b"y" * 5000)
+    wrapper = Mock()
+    wrapper._normalize_destination.side_effect = lambda d: d
+    wrapper._make_dir.side_effect = lambda parent, name: f"{parent}/{name}"
+    wrapper._upload_destination.side_effect = (
+        lambda parent, name: f"{parent}/{name}")
+    wrapper._run_concurrently.side_effect = (
+        lambda pool, func, actions, jobs: [func(action) for action in actions])
+    stored = {}
+
+    def put_stream(data, parent, name):
+        stored[name] = data if isinstance(data, bytes) else data.read()
+
+    wrapper._put_stream.side_effect = put_stream
+    result = PackedUpload(
+        wrapper, "disk:", pack_size=4000, threshold=1000, jobs=1
+    ).upload(root)
+    assert result == {"packed": 5, "packs": 2, "uploaded": 1}
+    assert [c.args for c in wrapper._make_dir.mock_calls] == [
+        ("disk:", "tree"), ("disk:/tree", ".packs"),
+        ("disk:/tree", "big")
+    ]
+    wrapper._put_file.assert_called_once_with(
+        local_path=root / "big" / "file.bin",
+        destination="disk:/tree/big/file.bin"
+    )
+    index = PackIndex.loads(stored[INDEX_NAME])
+    assert len(index) == 5
+    for entry in index:
+        data = stored[entry.pack][entry.offset:entry.offset + entry.length]
+        assert data == b"x" * 600
+    with tarfile.open(fileobj=io.BytesIO(stored["pack-000001.tar"])) as tar:
+        assert tar.getnames() == ["small/0.txt", "small/1.txt", "small/2.txt"]
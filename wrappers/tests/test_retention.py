@@ -0,0 +1,53 @@
+import datetime
+import pytest
+from wrappers.retention import (
+    RetentionPolicy,
+    SnapshotDir,
+    parse_snapshot_name
+)
+
+
+def daily_snapshots(first: str, days: int):
+    start = datetime.datetime.fromisoformat(first)
+    return [
+        SnapshotDir(str((start + datetime.timedelta(days=i)).date()),
+                    start + datetime.timedelta(days=i), i, None)
+        for i in range(days)
+    ]
+
+
+def test_daily_rule_keeps_newest_days():
+    snapshots = daily_snapshots("2026-10-01", 10)
+    kept, expired = RetentionPolicy(daily=3).apply(snapshots)
+    assert [s.name for s in kept] == [
+        "2026-10-08", "2026-10-09", "2026-10-10"
+    ]
+    assert expired == snapshots[:7]
+
+
+def test_rules_are_combined():
+    snapshots = daily_snapshots("2026-08-25", 60)
+    kept, expired = RetentionPolicy(daily=2, weekly=2, monthly=3).apply(
+        snapshots)
+    assert [s.name for s in kept] == [
+        "2026-08-31", "2026-09-30",
+        "2026-10-18", "2026-10-22", "2026-10-23"
+    ]
+    assert len(kept) + len(expired) == 60
+
+
+def test_policy_keeping_nothing_is_rejected():
+    with pytest.raises(ValueError):
+        RetentionPolicy()
+
+
+def test_negative_counts_are_rejected():
+    with pytest.raises(ValueError):
+        RetentionPolicy(daily=-1)
+    with pytest.raises(ValueError):
+        RetentionPolicy(daily=7, weekly=-1)
+
+
+def test_parse_snapshot_name():
+    assert parse_snapshot_name("2026-10-17") == datetime.datetime(2026, 10, 17)
+    assert parse_snapshot_name("photos") is None
@@ -0,0 +1,22 @@
+import pytest
+from cloudbackup.chunking import ChunkedFile, Manifest
+from cloudbackup.exceptions import UnsafePathException
+from cloudbackup.packs import PackEntry, PackIndex
+from wrappers.selection import select_recorded
+
+
+def test_selects_files_and_folders_of_pack_index():
+    index = PackIndex(PackEntry(path, "pack-000001.tar", 512, 1)
+                      for path in ("a/1.txt", "a/2.txt", "ab.txt"))
+    assert len(select_recorded(index)) == 3
+    assert [e.path for e in select_recorded(index, ["/a/", "a/1.txt"])] == [
+        "a/1.txt", "a/2.txt"]
+    with pytest.raises(FileNotFoundError):
+        select_recorded(index, ["b"])
+
+
+@pytest.mark.parametrize("path", ["/etc/passwd", "..", "a/../../b"])
+def test_manifest_paths_outside_destination_are_rejected(path):
+    manifest = Manifest([ChunkedFile(path, 0, 0.0, [])])
+    with pytest.raises(UnsafePathException):
+        select_recorded(manifest)
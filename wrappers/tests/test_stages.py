@@ -0,0 +1,89 @@
+import gzip
+import hashlib
+import os
+import pytest
+from cloudbackup.compression import GZIP, Compressor
+from cloudbackup.exceptions import DecompressionException
+from wrappers import stages as stages_module
+from wrappers.stages import Stages
+
+
+def test_names_record_applied_stages(tmp_path):
+    text = tmp_path / "dump.sql"
+    text.write_bytes(b"SELECT 1;\n" * 1000)
+    random = tmp_path / "random.bin"
+    random.write_bytes(os.urandom(5000))
+    with Compressor(GZIP) as compressor:
+        stages = Stages(compressor)
+        assert stages.remote_name(text, "dump.sql") == "dump.sql.cb.gz"
+        assert stages.remote_name(random, "random.bin") == "random.bin"
+        stream = stages.stream(text, "dump.sql", "dump.sql.cb.gz")
+        compressed = b"".join(stream)
+    assert gzip.decompress(compressed) == text.read_bytes()
+    assert Stages.local_name("dump.sql.cb.gz.cb.enc") == "dump.sql"
+    assert Stages.local_name("dump.sql") == "dump.sql"
+    assert Stages().decoder("dump.sql") is None
+    decode = Stages().decoder("dump.sql.cb.gz")
+    assert b"".join(decode([compressed])) == text.read_bytes()
+
+
+@pytest.mark.parametrize("truncated", [False, True])
+def test_corrupted_or_truncated_file_isnt_decompressed(truncated):
+    compressed = bytearray(gzip.compress(os.urandom(1000)))
+    if truncated:
+        del compressed[-100:]
+    else:
+        # checksum of member
+        compressed[-6] ^= 0xff
+    decode = Stages().decoder("dump.sql.cb.gz")
+    with pytest.raises(DecompressionException, match="dump.sql.cb.gz"):
+        b"".join(decode([bytes(compressed)]))
+
+
+def test_encrypted_file_requires_key():
+    with pytest.raises(FileNotFoundError):
+        Stages().decoder("dump.sql.cb.enc")
+
+
+def test_compressed_file_is_encrypted_after_compression(tmp_path):
+    pytest.importorskip("cryptography")
+    from cloudbackup.encryption import Cipher
+    text = tmp_path / "log.txt"
+    text.write_bytes(b"GET / 200\n" * 1000)
+    cipher = Cipher(os.urandom(32))
+    with Compressor(GZIP) as compressor:
+        stages = Stages(compressor, cipher)
+        name = stages.remote_name(text, "log.txt")
+        assert name == "log.txt.cb.gz.cb.enc"
+        stream = stages.stream(text, "log.txt", name)
+        size = len(stream)
+        stored = b"".join(stream)
+    assert size == len(stored) < text.stat().st_size
+    assert stream.digests().md5 == hashlib.md5(text.read_bytes()).hexdigest()
+    decode = Stages(cipher=cipher).decoder(name)
+    assert b"".join(decode([stored])) == text.read_bytes()
+
+
+def test_encrypted_stream_has_known_size(tmp_path):
+    pytest.importorskip("cryptography")
+    from cloudbackup.encryption import Cipher
+    local = tmp_path / "random.bin"
+    local.write_bytes(os.urandom(5000))
+    stages = Stages(cipher=Cipher(os.urandom(32), chunk_size=1000))
+    name = stages.remote_name(local, "random.bin")
+    stream = stages.stream(local, "random.bin", name)
+    assert len(stream) == len(b"".join(stream))
+
+
+def test_compressed_stream_has_known_size(tmp_path, monkeypatch):
+    monkeypatch.setattr(stages_module, "COMPRESSION_SPOOL_SIZE", 100)
+    text = tmp_path / "dump.sql"
+    text.write_bytes(b"SELECT 1;\n" * 1000)
+    with Compressor(GZIP) as compressor:
+        stream = Stages(compressor).stream(text, "dump.sql", "dump.sql.cb.gz")
+        size = len(stream)
+        compressed = b"".join(stream)
+    assert size == len(compressed) < text.stat().st_size
+    assert gzip.decompress(compressed) == text.read_bytes()
+    assert stream.digests().md5 == hashlib.md5(text.read_bytes()).hexdigest()
+    assert stream.md5() == hashlib.md5(compressed).hexdigest()
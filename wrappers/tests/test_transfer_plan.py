@@ -0,0 +1,51 @@
+from cloudbackup.diff import (
+    ADDED,
+    CHANGED_SIZE,
+    REMOVED,
+    Change,
+    Entry
+)
+from wrappers.transfer_plan import TransferPlan
+
+
+def _entry(path, type="file", size=10):
+    return Entry(tuple(path.split("/")), type, size, 0.0, None, path)
+
+
+def _change(kind, path, type="file"):
+    entry = _entry(path, type)
+    return Change(
+        kind,
+        entry.path,
+        None if kind == REMOVED else entry,
+        None if kind == ADDED else entry
+    )
+
+
+def test_plan_collapses_content_of_removed_dirs():
+    plan = TransferPlan([
+        _change(REMOVED, "a", "dir"),
+        _change(REMOVED, "a/b", "dir"),
+        _change(REMOVED, "a/b/c"),
+        _change(REMOVED, "ab"),
+    ])
+    assert [a.path for a in plan.deletes] == [("a",), ("ab",)]
+
+
+def test_plan_totals():
+    plan = TransferPlan([
+        _change(ADDED, "d", "dir"),
+        _change(ADDED, "d/f"),
+        _change(CHANGED_SIZE, "g"),
+        _change(REMOVED, "h"),
+    ])
+    assert [a.path for a in plan.mkdirs] == [("d",)]
+    assert [a.path for a in plan.uploads] == [("d", "f")]
+    assert [a.path for a in plan.updates] == [("g",)]
+    assert plan.total_bytes == 20
+    assert plan.total_requests == 1 + 2 * 2 + 1
+    assert plan
+
+
+def test_empty_plan_is_false():
+    assert not TransferPlan([])
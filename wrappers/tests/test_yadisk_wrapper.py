@@ -1,5 +1,21 @@
+import datetime
+import gzip
+import hashlib
+import io
+import os
 import pytest
 from unittest.mock import Mock, call, patch
+from cloudbackup.catalog import SnapshotCatalog
+from cloudbackup.compression import GZIP
+from cloudbackup.exceptions import (
+    ChecksumMismatchException,
+    UnsafePathException
+)
+from cloudbackup.file_objects import YaDiskFile
+from cloudbackup.hashing import HashCache, hash_file
+from cloudbackup.journal import Journal
+from cloudbackup.packs import INDEX_NAME, Pack, PackEntry, PackIndex
+from wrappers.retention import RetentionPolicy
 from wrappers.yadisk_wrapper import YaDiskWrapper
 
 
@@ -121,9 +137,9 @@ def test_uploads_handles_complex_dir(wrapper):
 
 def test_download_creates_correct_local_filename(wrapper, not_existing_file):
     wrapper._storage.get_download_link = Mock(return_value="random link")
-    wrapper._storage.download = Mock(return_value=b"file bytes on remote")
-    file = Mock()
-    file.type = "file"
+    wrapper._storage.download_stream = Mock(
+        return_value=[b"file bytes ", b"on remote"])
+    file = Mock(type="file", md5=None)
     file.id = f"disk:/{not_existing_file.name}"
     wrapper.download(file, ".")
     assert not_existing_file.exists()
@@ -132,10 +148,537 @@ def test_download_creates_correct_local_filename(wrapper, not_existing_file):
 
 def test_download_file_prints_correct_inf(wrapper, not_existing_file, capsys):
     wrapper._storage.get_download_link = Mock()
-    wrapper._storage.download = Mock(return_value=b"any bytes")
-    file = Mock()
-    file.type = "file"
+    wrapper._storage.download_stream = Mock(return_value=[b"any bytes"])
+    file = Mock(type="file", md5=None)
     file.id = f"disk:/{not_existing_file.name}"
     wrapper.download(file, ".")
     captured = capsys.readouterr()
     assert captured.out == f"Downloading: `{not_existing_file}`...\n"
+
+
+def _yadisk_file(path, size):
+    return _remote_entry(path, "file", size)
+
+
+def test_du_restores_folders_from_paths(wrapper, capsys):
+    wrapper._storage.list_files = Mock(return_value=[
+        _yadisk_file("disk:/a/b/1.txt", 10),
+        _yadisk_file("disk:/a/2.txt", 20),
+        _yadisk_file("disk:/ab/3.txt", 30),
+        _yadisk_file("disk:/4.txt", 40),
+    ])
+    wrapper.du(None, depth=1)
+    assert capsys.readouterr().out == (
+        "    100B  disk:/\n"
+        "     30B  disk:/a\n"
+        "     30B  disk:/ab\n"
+    )
+    wrapper._storage.get_file = Mock(
+        return_value=_remote_entry("disk:/a", "dir"))
+    wrapper.du("disk:/a", top=1)
+    assert capsys.readouterr().out == "     30B  disk:/a\n"
+    assert wrapper._storage.list_files.mock_calls[0] == call(
+        sort="name",
+        limit=1000,
+        offset=0,
+        extra_fields=("size",)
+    )
+
+
+def test_du_reports_empty_folder(wrapper, capsys):
+    wrapper._storage.list_files = Mock(return_value=[
+        _yadisk_file("disk:/4.txt", 40)])
+    wrapper._storage.get_file = Mock(
+        return_value=_remote_entry("disk:/a/empty", "dir"))
+    wrapper.du("disk:/a/empty")
+    assert capsys.readouterr().out == "      0B  disk:/a/empty\n"
+    wrapper._storage.get_file.assert_called_once_with("disk:/a/empty")
+    wrapper._storage.get_file = Mock(
+        return_value=_remote_entry("disk:/4.txt", "file"))
+    with pytest.raises(FileNotFoundError):
+        wrapper.du("disk:/4.txt")
+
+
+def test_lsdir_top_stops_early(wrapper, capsys):
+    files = [_remote_entry(f"disk:/{i}.txt", "file") for i in range(3)]
+    wrapper._storage.list_files = Mock(side_effect=[files, files])
+    wrapper.lsdir(None, "rev_size", top=3)
+    assert wrapper._storage.list_files.mock_calls == [
+        call(sort="-size", limit=3, offset=0, extra_fields=())
+    ]
+    assert capsys.readouterr().out == "".join(
+        f"[F] {i}.txt (disk:/{i}.txt)\n" for i in range(3))
+
+
+def _remote_entry(path, type, size=None, modified=None, md5=None):
+    if modified is not None:
+        modified = datetime.datetime.fromtimestamp(
+            modified, datetime.timezone.utc).isoformat()
+    return YaDiskFile({"name": path.rsplit("/", 1)[-1], "type": type,
+                       "path": path, "size": size, "modified": modified,
+                       "md5": md5})
+
+
+@pytest.fixture()
+def synced_tree(tmp_path):
+    (tmp_path / "new_dir").mkdir()
+    (tmp_path / "new_dir" / "new.txt").write_bytes(b"new")
+    (tmp_path / "changed.txt").write_bytes(b"changed")
+    (tmp_path / "same.txt").write_bytes(b"same")
+    listings = {
+        "disk:/backup": [
+            _remote_entry("disk:/backup/changed.txt", "file", 1, 2e9),
+            _remote_entry("disk:/backup/old", "dir"),
+            _remote_entry("disk:/backup/same.txt", "file", 4, 2e9),
+        ],
+        "disk:/backup/old": [
+            _remote_entry("disk:/backup/old/old.txt", "file", 1, 2e9)
+        ],
+    }
+    return tmp_path, listings
+
+
+def test_sync_dry_run_prints_plan(wrapper, synced_tree, capsys):
+    local_dir, listings = synced_tree
+    wrapper._list_dir = lambda path: listings[path]
+    wrapper.sync(local_dir, "disk:/backup", dry_run=True)
+    assert capsys.readouterr().out == (
+        "Move to the trash: `old`\n"
+        "Create folder: `new_dir`\n"
+        "Upload: `new_dir/new.txt` (3B)\n"
+        "Update: `changed.txt` (7B)\n"
+        "Total: 1 folders to create, 2 files to upload (10B),"
+        " 1 to delete, 6 requests.\n"
+    )
+    wrapper._storage.upload_file.assert_not_called()
+    wrapper._storage.remove.assert_not_called()
+
+
+def test_sync_transfers_only_differences(wrapper, synced_tree):
+    local_dir, listings = synced_tree
+    wrapper._list_dir = lambda path: listings[path]
+    wrapper._storage.get_upload_link.return_value = "link"
+    sent = []
+    wrapper._storage.upload_file.side_effect = (
+        lambda link, data: sent.append((link, data.read()))
+    )
+    wrapper.sync(local_dir, "disk:/backup", jobs=2)
+    assert wrapper._storage.remove.mock_calls == [
+        call("disk:/backup/old", False)
+    ]
+    assert wrapper._storage.mkdir.mock_calls == [
+        call("disk:/backup/new_dir")
+    ]
+    assert sorted(wrapper._storage.get_upload_link.mock_calls) == sorted([
+        call(
+            local_dir / "new_dir" / "new.txt",
+            "disk:/backup/new_dir/new.txt"
+        ),
+        call(
+            local_dir / "changed.txt",
+            "disk:/backup/changed.txt",
+            overwrite=True
+        ),
+    ])
+    assert sorted(sent) == [("link", b"changed"), ("link", b"new")]
+
+
+def test_upload_resumes_from_journal(wrapper, tmp_path):
+    (tmp_path / "backup").mkdir()
+    for name in ("a.txt", "b.txt", "c.txt"):
+        (tmp_path / "backup" / name).write_bytes(name.encode())
+    journal = Journal()
+    wrapper._put_file = Mock(side_effect=[None, ConnectionError])
+    with pytest.raises(ConnectionError):
+        wrapper.upload(tmp_path / "backup", "/", journal=journal)
+    wrapper._put_file = Mock()
+    wrapper._storage.get_upload_link.return_value = "link"
+    wrapper._storage.upload_file.return_value = None
+    wrapper._list_dir = Mock(return_value=[
+        _remote_entry("disk:/backup/a.txt", "file", 5),
+        _remote_entry("disk:/backup/b.txt", "file", 5),
+    ])
+    wrapper.upload(tmp_path / "backup", "/", journal=journal)
+    assert wrapper._storage.mkdir.mock_calls == [call("disk:/backup")]
+    assert wrapper._storage.get_upload_link.mock_calls == [
+        call(tmp_path / "backup" / "b.txt", "disk:/backup/b.txt",
+             overwrite=True)
+    ]
+    assert wrapper._put_file.mock_calls == [
+        call(
+            local_path=tmp_path / "backup" / "c.txt",
+            destination="disk:/backup/c.txt"
+        )
+    ]
+
+
+def test_upload_skips_symlinked_directories(wrapper, tmp_path):
+    (tmp_path / "elsewhere").mkdir()
+    (tmp_path / "elsewhere" / "a.txt").write_bytes(b"a")
+    (tmp_path / "backup").mkdir()
+    (tmp_path / "backup" / "b.txt").write_bytes(b"b")
+    (tmp_path / "backup" / "linked").symlink_to(tmp_path / "elsewhere")
+    wrapper._put_file = Mock()
+    wrapper.upload(tmp_path / "backup", "/")
+    assert wrapper._storage.mkdir.mock_calls == [call("disk:/backup")]
+    assert wrapper._put_file.mock_calls == [
+        call(
+            local_path=tmp_path / "backup" / "b.txt",
+            destination="disk:/backup/b.txt"
+        )
+    ]
+
+
+def test_verify_reports_missing_extra_and_mismatched_files(
+        wrapper, tmp_path, capsys
+):
+    (tmp_path / "missing.txt").write_bytes(b"missing")
+    (tmp_path / "same.txt").write_bytes(b"same")
+    (tmp_path / "corrupted.txt").write_bytes(b"corrupted")
+    listing = [
+        _remote_entry("disk:/backup/corrupted.txt", "file", 9, 0.0),
+        _remote_entry("disk:/backup/extra.txt", "file", 5, 0.0),
+        _remote_entry("disk:/backup/same.txt", "file", 4, 0.0),
+    ]
+    listing[0].md5 = hashlib.md5(b"corrupt3d").hexdigest()
+    listing[2].md5 = hashlib.md5(b"same").hexdigest()
+    wrapper._list_dir = lambda path: listing
+    with patch("wrappers._base_wrapper.HashCache",
+               lambda: HashCache(":memory:")):
+        result = wrapper.verify(tmp_path, "disk:/backup", jobs=2)
+    assert result == {"missing": 1, "extra": 1, "mismatched": 1}
+    assert capsys.readouterr().out == (
+        "Mismatch: `corrupted.txt` (checksum)\n"
+        "Extra: `extra.txt`\n"
+        "Missing: `missing.txt`\n"
+    )
+    wrapper._storage.download.assert_not_called()
+
+
+def test_upload_with_dedup_copies_stored_content_on_server(wrapper, tmp_path):
+    (tmp_path / "stored.txt").write_bytes(b"stored")
+    (tmp_path / "new.txt").write_bytes(b"new")
+    (tmp_path / "new_copy.txt").write_bytes(b"new")
+    stored = _remote_entry("disk:/old/stored.txt", "file", 6,
+                           md5=hashlib.md5(b"stored").hexdigest())
+    wrapper._storage.list_files.return_value = [stored]
+    wrapper._storage.copy.return_value = None
+    wrapper._make_dir = Mock(return_value="disk:/backup/dir")
+    wrapper._put_file = Mock(side_effect=lambda local_path, destination:
+                             (hash_file(local_path), None))
+    with patch("wrappers._base_wrapper.HashCache",
+               lambda: HashCache(":memory:")), \
+            patch("cloudbackup.hashing.hash_file",
+                  Mock(side_effect=hash_file)) as hash_mock:
+        wrapper.upload(tmp_path, "/backup", dedup=True)
+    # file whose size differs from sizes of stored ones isn't hashed
+    assert sorted(hash_mock.mock_calls) == [
+        call(tmp_path / "new_copy.txt"), call(tmp_path / "stored.txt")
+    ]
+    assert wrapper._put_file.mock_calls == [
+        call(local_path=tmp_path / "new.txt",
+             destination="disk:/backup/dir/new.txt")
+    ]
+    assert wrapper._storage.copy.mock_calls == [
+        call("disk:/backup/dir/new.txt", "disk:/backup/dir/new_copy.txt"),
+        call("disk:/old/stored.txt", "disk:/backup/dir/stored.txt")
+    ]
+
+
+@pytest.mark.parametrize("destination, normalized", [
+    ("/", "disk:/"),
+    ("disk:/", "disk:/"),
+    ("/backups/", "disk:/backups"),
+    ("disk:/backups/", "disk:/backups"),
+    ("disk:/backups", "disk:/backups"),
+])
+def test_destination_is_normalized(wrapper, destination, normalized):
+    assert wrapper._normalize_destination(destination) == normalized
+
+
+def test_snapshot_copies_unchanged_files_from_previous_snapshot(
+        wrapper, tmp_path):
+    local_dir = tmp_path / "home"
+    (local_dir / "dir").mkdir(parents=True)
+    (local_dir / "dir" / "same.txt").write_bytes(b"same")
+    (local_dir / "changed.txt").write_bytes(b"old")
+    catalog = SnapshotCatalog("yadisk", ":memory:")
+    wrapper._storage.copy.return_value = None
+    wrapper._list_dir = Mock(return_value=[])
+
+    def put_file(local_path, destination):
+        return Mock(md5=hashlib.md5(local_path.read_bytes()).hexdigest()), None
+
+    wrapper._put_file = Mock(side_effect=put_file)
+    assert wrapper.snapshot(local_dir, "/backups", catalog, name="1") == {
+        "uploaded": 2
+    }
+    (local_dir / "changed.txt").write_bytes(b"new!")
+    wrapper._put_file.reset_mock()
+    assert wrapper.snapshot(local_dir, "/backups", catalog, name="2") == {
+        "uploaded": 1, "copied": 1
+    }
+    assert wrapper._storage.copy.mock_calls == [
+        call("disk:/backups/1/dir/same.txt", "disk:/backups/2/dir/same.txt")
+    ]
+    assert wrapper._put_file.mock_calls == [
+        call(local_path=local_dir / "changed.txt",
+             destination="disk:/backups/2/changed.txt")
+    ]
+    # ids of stored files are recorded without listing snapshot folder
+    wrapper._list_dir.assert_called_with("disk:/backups")
+    snapshot = catalog.find("disk:/backups", "2")
+    assert [
+        (file.remote_id, file.md5)
+        for file in (catalog.file(snapshot.id, ("changed.txt",)),
+                     catalog.file(snapshot.id, ("dir", "same.txt")))
+    ] == [
+        ("disk:/backups/2/changed.txt", hashlib.md5(b"new!").hexdigest()),
+        ("disk:/backups/2/dir/same.txt", hashlib.md5(b"same").hexdigest())
+    ]
+    wrapper._storage.mkdir.reset_mock()
+    with pytest.raises(FileExistsError):
+        wrapper.snapshot(local_dir, "/backups", catalog, name="2")
+    wrapper._list_dir = Mock(
+        return_value=[_remote_entry("disk:/backups/3", "dir")])
+    with pytest.raises(FileExistsError):
+        wrapper.snapshot(local_dir, "/backups", catalog, name="3")
+    wrapper._storage.mkdir.assert_not_called()
+    assert [s.name for s in catalog.snapshots("disk:/backups")] == ["1", "2"]
+
+
+def test_snapshot_replaces_folder_of_interrupted_snapshot(wrapper, tmp_path):
+    local_dir = tmp_path / "home"
+    local_dir.mkdir()
+    (local_dir / "a.txt").write_bytes(b"a")
+    catalog = SnapshotCatalog("yadisk", ":memory:")
+    catalog.begin("disk:/backups", "1", "disk:/backups/1", local_dir)
+    tree = {
+        "disk:/backups": [_remote_entry("disk:/backups/1", "dir")],
+        "disk:/backups/1": [_remote_entry("disk:/backups/1/a.txt", "file")],
+    }
+    wrapper._list_dir = tree.__getitem__
+    wrapper._storage.remove.return_value = None
+    wrapper._put_file = Mock(return_value=(Mock(md5=None), None))
+    assert wrapper.snapshot(local_dir, "/backups", catalog, name="1") == {
+        "uploaded": 1
+    }
+    wrapper._storage.remove.assert_called_once_with("disk:/backups/1", True)
+    wrapper._storage.mkdir.assert_called_once_with("disk:/backups/1")
+    assert [s.name for s in catalog.snapshots("disk:/backups")] == ["1"]
+
+
+def test_restore_downloads_snapshot_file_by_file(wrapper, tmp_path, capsys):
+    catalog = SnapshotCatalog("yadisk", ":memory:")
+    snapshot = catalog.begin("disk:/backups", "1", "disk:/backups/1", "/home")
+    for path, content in (("a.txt", b"a"), ("dir/b.txt", b"b")):
+        parts = tuple(path.split("/"))
+        catalog.add_file(snapshot, parts, 1, 1.0)
+        catalog.set_remote(snapshot, parts, f"disk:/backups/1/{path}",
+                           hashlib.md5(content).hexdigest())
+    catalog.complete(snapshot)
+    contents = {"disk:/backups/1/a.txt": [b"a"],
+                "disk:/backups/1/dir/b.txt": [b"b"]}
+    wrapper._open_stream = lambda path, byte_range=None: contents[path]
+    summary = wrapper.restore("/backups", "1", tmp_path, catalog)
+    assert summary == {"verified": 2}
+    assert (tmp_path / "1" / "a.txt").read_bytes() == b"a"
+    assert (tmp_path / "1" / "dir" / "b.txt").read_bytes() == b"b"
+    wrapper._storage.get_file.assert_not_called()
+    assert ".zip" not in capsys.readouterr().out
+
+
+def test_restore_overwrites_files_only_if_asked(wrapper, tmp_path):
+    catalog = SnapshotCatalog("yadisk", ":memory:")
+    snapshot = catalog.begin("disk:/backups", "1", "disk:/backups/1", "/home")
+    for path in ("a.txt", "b.txt"):
+        catalog.add_file(snapshot, (path,), 1, 1.0)
+        catalog.set_remote(snapshot, (path,), f"disk:/backups/1/{path}",
+                           hashlib.md5(b"new").hexdigest())
+    catalog.complete(snapshot)
+    (tmp_path / "1").mkdir()
+    (tmp_path / "1" / "b.txt").write_bytes(b"old")
+    wrapper._open_stream = Mock(side_effect=lambda path: [b"new"])
+    with pytest.raises(FileExistsError):
+        wrapper.restore("disk:/backups/", "1", tmp_path, catalog)
+    wrapper._open_stream.assert_not_called()
+    assert not (tmp_path / "1" / "a.txt").exists()
+    summary = wrapper.restore("/backups/", "1", tmp_path, catalog, ov=True)
+    assert summary == {"verified": 2}
+    assert (tmp_path / "1" / "b.txt").read_bytes() == b"new"
+
+
+def test_prune_removes_expired_snapshots_and_forgets_them(wrapper, capsys):
+    catalog = SnapshotCatalog("yadisk", ":memory:")
+    for name in ("2026-10-15", "2026-10-16", "2026-10-17"):
+        snapshot = catalog.begin(
+            "disk:/backups", name, f"disk:/backups/{name}", "/home")
+        catalog.complete(snapshot)
+    wrapper._storage.remove.side_effect = ["operation link", None]
+    wrapper._storage.operation_status.return_value = "success"
+    policy = RetentionPolicy(last=1)
+    with patch("builtins.input", return_value="y") as input_mock:
+        assert wrapper.prune("/backups", policy, catalog, jobs=1) == 2
+    assert "2 files" in input_mock.call_args.args[0]
+    assert wrapper._storage.remove.mock_calls == [
+        call("disk:/backups/2026-10-15", False),
+        call("disk:/backups/2026-10-16", False)
+    ]
+    assert [s.name for s in catalog.snapshots("disk:/backups")] == [
+        "2026-10-17"
+    ]
+    assert "Keep: `2026-10-17`" in capsys.readouterr().out
+
+
+def test_prune_uses_dated_folders_if_catalog_is_empty(wrapper, capsys):
+    folders = []
+    for name in ("2026-10-16", "2026-10-17", "photos"):
+        folder = Mock(id=f"disk:/backups/{name}", type="dir")
+        folder.name = name
+        folders.append(folder)
+    wrapper._list_dir = Mock(return_value=folders)
+    catalog = SnapshotCatalog("yadisk", ":memory:")
+    assert wrapper.prune(
+        "/backups", RetentionPolicy(daily=1), catalog, dry_run=True) == 0
+    wrapper._storage.remove.assert_not_called()
+    assert capsys.readouterr().out == (
+        "Keep: `2026-10-17`\n"
+        "Move to the trash: `2026-10-16`\n"
+    )
+
+
+def test_unpack_fetches_ranges_of_selected_files(wrapper, tmp_path, capsys):
+    pack = Pack("pack-000001.tar")
+    index = PackIndex()
+    for path, content in (("a/1.txt", b"one"), ("a/2.txt", b"two"),
+                          ("b.txt", b"three")):
+        local = tmp_path / path.replace("/", "_")
+        local.write_bytes(content)
+        index.add(pack.add(path, local, os.stat(local)))
+    stored = io.BytesIO()
+    pack.write(stored)
+    objects = []
+    for name in (INDEX_NAME, pack.name):
+        stored_object = Mock(id=f"disk:/tree/.packs/{name}")
+        stored_object.name = name
+        objects.append(stored_object)
+    wrapper._find_child = Mock(return_value=Mock(id="disk:/tree/.packs"))
+    wrapper._list_dir = Mock(return_value=objects)
+    wrapper._storage.get_download_link.side_effect = lambda path: path
+
+    def download_stream(path, byte_range=None):
+        if byte_range is None:
+            return [index.dumps()]
+        return [stored.getvalue()[byte_range[0]:byte_range[1]]]
+
+    wrapper._storage.download_stream.side_effect = download_stream
+    result = wrapper.unpack(
+        "/tree", tmp_path / "out", paths=["a", "a/1.txt"], jobs=1)
+    assert result == {"files": 2, "requests": 1}
+    assert (tmp_path / "out" / "a" / "1.txt").read_bytes() == b"one"
+    assert (tmp_path / "out" / "a" / "2.txt").read_bytes() == b"two"
+    assert not (tmp_path / "out" / "b.txt").exists()
+    wrapper._find_child.assert_called_once_with("disk:/tree", ".packs")
+    assert "Unpacking: `a/1.txt`" in capsys.readouterr().out
+    with pytest.raises(FileExistsError):
+        wrapper.unpack("/tree", tmp_path / "out", paths=["a/1.txt"])
+    with pytest.raises(FileNotFoundError):
+        wrapper.unpack("/tree", tmp_path / "out", paths=["c"])
+
+
+def stored_packs(wrapper, names, index_data=b""):
+    objects = []
+    for name in names:
+        stored_object = Mock(id=f"disk:/tree/.packs/{name}")
+        stored_object.name = name
+        objects.append(stored_object)
+    wrapper._find_child = Mock(return_value=Mock(id="disk:/tree/.packs"))
+    wrapper._list_dir = Mock(return_value=objects)
+    wrapper._storage.download_stream.return_value = [index_data]
+
+
+def test_unpack_without_index_names_folder(wrapper, tmp_path):
+    stored_packs(wrapper, ["pack-000001.tar"])
+    with pytest.raises(FileNotFoundError, match="disk:/tree/.packs/index"):
+        wrapper.unpack("/tree", tmp_path / "out")
+
+
+@pytest.mark.parametrize("path", ["/etc/passwd", "../outside", "a/../../b"])
+def test_unpack_rejects_paths_outside_destination(wrapper, tmp_path, path):
+    index = PackIndex([PackEntry(path, "pack-000001.tar", 512, 3)])
+    stored_packs(wrapper, [INDEX_NAME, "pack-000001.tar"], index.dumps())
+    with pytest.raises(UnsafePathException):
+        wrapper.unpack("/tree", tmp_path / "out")
+    wrapper._storage.download_stream.assert_called_once()
+
+
+def test_upload_with_compression_stores_compressed_stream(wrapper, tmp_path):
+    (tmp_path / "dump.sql").write_bytes(b"INSERT INTO t VALUES (1);\n" * 100)
+    (tmp_path / "photo.jpg").write_bytes(b"jpeg")
+    received = {}
+
+    def upload_file(link, data):
+        received[link] = data.read() if hasattr(data, "read") else (
+            b"".join(data))
+
+    wrapper._storage.get_upload_link.side_effect = (
+        lambda path, destination, overwrite=False: destination)
+    wrapper._storage.upload_file.side_effect = upload_file
+    wrapper._make_dir = Mock(return_value="disk:/backup/dir")
+    wrapper.upload(tmp_path, "/backup", compression=GZIP)
+    assert set(received) == {
+        "disk:/backup/dir/dump.sql.cb.gz", "disk:/backup/dir/photo.jpg"}
+    assert gzip.decompress(received["disk:/backup/dir/dump.sql.cb.gz"]) == (
+        b"INSERT INTO t VALUES (1);\n" * 100)
+
+
+def test_download_decompresses_compressed_file(wrapper, tmp_path):
+    compressed = gzip.compress(b"raz dva tri\n")
+    wrapper._storage.download_stream = Mock(
+        return_value=[compressed[:10], compressed[10:]])
+    file = Mock(id="disk:/backup/log.txt.cb.gz", type="file",
+                md5=hashlib.md5(compressed).hexdigest())
+    summary = wrapper.download(file, tmp_path)
+    assert summary == {"verified": 1}
+    assert (tmp_path / "log.txt").read_bytes() == b"raz dva tri\n"
+    assert not (tmp_path / "log.txt.cb.gz").exists()
+
+
+def test_encrypted_upload_is_decrypted_by_download(wrapper, tmp_path):
+    pytest.importorskip("cryptography")
+    from cloudbackup.encryption import Cipher
+    cipher = Cipher(os.urandom(32))
+    local = tmp_path / "secret.txt"
+    local.write_bytes(b"password\n")
+    received = {}
+
+    def upload_file(link, data):
+        received[link] = b"".join(data)
+        return hashlib.md5(received[link]).hexdigest()
+
+    wrapper._storage.get_upload_link.side_effect = (
+        lambda path, destination, overwrite=False: destination)
+    wrapper._storage.upload_file.side_effect = upload_file
+    wrapper.upload(local, "/backup", cipher=cipher)
+    stored = received["disk:/backup/secret.txt.cb.enc"]
+    assert b"password" not in stored
+    wrapper._storage.download_stream = Mock(return_value=[stored])
+    file = Mock(id="disk:/backup/secret.txt.cb.enc", type="file",
+                md5=hashlib.md5(stored).hexdigest())
+    out = tmp_path / "out"
+    out.mkdir()
+    with pytest.raises(FileNotFoundError):
+        wrapper.download(file, out)
+    assert wrapper.download(file, out, cipher=cipher) == {"verified": 1}
+    assert (out / "secret.txt").read_bytes() == b"password\n"
+
+
+def test_mismatched_upload_is_removed(wrapper, tmp_path):
+    local = tmp_path / "a.txt"
+    local.write_bytes(b"content")
+    wrapper._storage.upload_file.return_value = "0" * 32
+    with pytest.raises(ChecksumMismatchException):
+        wrapper._put_file(local, "disk:/backup/a.txt")
+    assert wrapper._storage.remove.mock_calls == [
+        call("disk:/backup/a.txt", True)
+    ]
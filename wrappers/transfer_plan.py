@@ -0,0 +1,62 @@
+from collections import namedtuple
+from typing import Iterable
+
+from cloudbackup.diff import ADDED, REMOVED
+
+Action = namedtuple("Action", ["path", "local", "remote"])
+
+
+class TransferPlan:
+    """
+    Minimal set of operations making remote directory equal to local one.
+
+    Plan is built from changes yielded by `cloudbackup.diff.diff_trees`:
+    added folders are created, added files are uploaded, changed files
+    are replaced and removed entries are deleted. Content of removed
+    folders isn't deleted one by one, folder is deleted at once.
+    """
+
+    # requests needed for every kind of operation
+    MKDIR_REQUESTS = 1
+    UPLOAD_REQUESTS = 2
+    DELETE_REQUESTS = 1
+
+    def __init__(self, changes: Iterable):
+        self.mkdirs = []
+        self.uploads = []
+        self.updates = []
+        self.deletes = []
+        removed_dir = None
+        for change in changes:
+            if change.kind == REMOVED:
+                if (removed_dir is not None
+                        and change.path[:len(removed_dir)] == removed_dir):
+                    continue
+                if change.remote.type == "dir":
+                    removed_dir = change.path
+                self.deletes.append(Action(change.path, None, change.remote))
+            elif change.kind == ADDED:
+                action = Action(change.path, change.local, None)
+                if change.local.type == "dir":
+                    self.mkdirs.append(action)
+                else:
+                    self.uploads.append(action)
+            else:
+                self.updates.append(
+                    Action(change.path, change.local, change.remote))
+
+    def __bool__(self):
+        return bool(self.mkdirs or self.uploads or self.updates
+                    or self.deletes)
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(a.local.size for a in self.uploads + self.updates)
+
+    @property
+    def total_requests(self) -> int:
+        return (
+            len(self.mkdirs) * self.MKDIR_REQUESTS
+            + len(self.uploads + self.updates) * self.UPLOAD_REQUESTS
+            + len(self.deletes) * self.DELETE_REQUESTS
+        )
@@ -1,15 +1,27 @@
-import errno
-import os
+import posixpath
+import time
+from collections import Counter
 
-from pathlib import PurePath, Path, PurePosixPath
+from pathlib import PurePath, Path
+from typing import TYPE_CHECKING
 from wrappers._base_wrapper import BaseWrapper
+from cloudbackup.exceptions import ApiResponseException
 from cloudbackup.file_objects import YaDiskFile
 from cloudbackup.yadisk import YaDisk
 from wrappers.defaults import (
     YADISK_SORT_KEYS,
     LIST_NEXT_PAGE_MSG,
+    COPY_FAILED_MSG,
+    OPERATION_POLL_INTERVAL,
 )
-from wrappers.cli_msgs import YadiskDLMessage, ULMessage
+from wrappers.cli_msgs import YadiskDLMessage
+from wrappers.disk_usage import DiskUsage
+from wrappers.stages import Stages
+
+if TYPE_CHECKING:
+    # codecs and journal are imported by commands which use them
+    from cloudbackup.compression import Codec
+    from cloudbackup.journal import Journal
 
 
 class YaDiskWrapper(BaseWrapper):
@@ -17,19 +29,163 @@ class YaDiskWrapper(BaseWrapper):
     Implements CLI interface to YandexDisk API.
     """
 
+    _CHECKSUM_FIELDS = ("size", "md5")
+
     def __init__(self):
         super().__init__(YaDisk())
 
+    @staticmethod
+    def _strip_disk_prefix(path: str) -> str:
+        """
+        Converts 'disk:/path/foo' and '/path/foo/' paths to '/path/foo'.
+        """
+        if path.startswith("disk:"):
+            path = path[len("disk:"):]
+        return posixpath.normpath("/" + path.lstrip("/"))
+
+    def _iter_files(
+            self,
+            sort: str = "name",
+            extra_fields: tuple = (),
+            limit: int = 1000
+    ):
+        """
+        Yields all files on storage (excluding directories) page by page,
+        so listing of whole disk never holds more than one page of file
+        objects.
+        """
+        offset = 0
+        while True:
+            files = self._storage.list_files(
+                sort=sort,
+                limit=limit,
+                offset=offset,
+                extra_fields=extra_fields
+            )
+            yield from files
+            if len(files) < limit:
+                break
+            offset += limit
+
+    def _iter_dir(
+            self,
+            path: str,
+            sort: str = "name",
+            limit: int = 1000,
+            extra_fields: tuple = ()
+    ):
+        """
+        Yields content of directory located at `path` page by page.
+        """
+        offset = 0
+        while True:
+            files = self._storage.lsdir(
+                path,
+                limit=limit,
+                offset=offset,
+                sort=sort,
+                extra_fields=extra_fields
+            )
+            yield from files
+            if len(files) < limit:
+                break
+            offset += limit
+
+    def _list_dir(self, path):
+        return self._iter_dir(
+            path, extra_fields=("size", "modified", "md5"))
+
+    def _normalize_destination(self, destination):
+        """
+        The same folder may be passed with or without `disk:` prefix and
+        trailing slash, while catalogs and journals are keyed by it.
+        """
+        if destination.startswith("disk:"):
+            destination = destination[len("disk:"):]
+        return "disk:" + posixpath.normpath("/" + destination.lstrip("/"))
+
+    def _make_dir(self, parent, name: str):
+        path = posixpath.join(parent, name)
+        self._storage.mkdir(path)
+        return path
+
+    def _upload_destination(self, parent, name: str):
+        return posixpath.join(parent, name)
+
+    def _uploaded_id(self, parent, name: str):
+        return posixpath.join(parent, name)
+
+    def _discard_upload(self, destination, name: str) -> None:
+        self._storage.remove(destination, True)
+
+    def _copy_remote(self, file_id, parent, name: str):
+        """
+        Big files are copied by YandexDisk in background, then operation
+        is polled until it completes.
+        """
+        path = posixpath.join(parent, name)
+        link = self._storage.copy(file_id, path)
+        if link is None:
+            return path
+        while True:
+            status = self._storage.operation_status(link)
+            if status != "in-progress":
+                break
+            time.sleep(OPERATION_POLL_INTERVAL)
+        if status == "failed":
+            raise ApiResponseException(None, COPY_FAILED_MSG.format(name))
+        return path
+
+    def _get_replace_link(self, local_path: Path, remote_file) -> str:
+        return self._storage.get_upload_link(
+            local_path, remote_file.id, overwrite=True)
+
+    def _open_stream(self, path, byte_range=None):
+        return self._storage.download_stream(
+            self._storage.get_download_link(path), byte_range=byte_range)
+
+    def _disk_usage(self, path):
+        """
+        Folders are restored from paths of listed files, so empty
+        folders are not reported, except the target folder itself.
+        """
+        top = "/" if path is None else self._strip_disk_prefix(path)
+        usage = DiskUsage("/", "disk:/")
+        if top != "/" and self._storage.get_file(path).type == "dir":
+            _add_folder(usage, top)
+        for file in self._iter_files(extra_fields=("size",)):
+            parent = posixpath.dirname(self._strip_disk_prefix(file.id))
+            if top != "/" and not (parent + "/").startswith(top + "/"):
+                continue
+            usage.add_file(parent, file.size)
+            _add_folder(usage, parent)
+        return usage, top
+
     def lsdir(
             self,
             path: str,
-            order_key: str
+            order_key: str,
+            top: int = None
     ) -> None:
         """
         Prints content of `path`. Prints all files
         excluding directories if path is None.
         Otherwise prints files page by page.
+
+        If `top` is provided prints only `top` first files without asking.
+        YandexDisk sorts listings by every supported key, so listing
+        stops as soon as `top` files are received.
         """
+        if top is not None:
+            limit = min(top, 1000)
+            if path is None:
+                files = self._iter_files(
+                    sort=YADISK_SORT_KEYS[order_key], limit=limit)
+            else:
+                files = self._iter_dir(
+                    path, sort=YADISK_SORT_KEYS[order_key], limit=limit)
+            self._print_top(files, top)
+            return
         offset = 0
         while True:
             if path is None:
@@ -71,7 +227,11 @@ class YaDiskWrapper(BaseWrapper):
     def upload(
             self,
             local_file: Path,
-            destination: str
+            destination: str,
+            journal: "Journal" = None,
+            dedup: bool = False,
+            compression: "Codec" = None,
+            cipher=None
     ) -> None:
         """
         Upload file located at `filename` to `destination`. Prints absolute
@@ -79,41 +239,86 @@ class YaDiskWrapper(BaseWrapper):
         """
         if not local_file.name:
             local_file = local_file.resolve()
-        if destination.startswith("disk:/"):
-            normalized_dest = destination
-        else:
-            normalized_dest = "disk:" + destination
-        print(ULMessage(local_file).str_value())
-        normalized_dest = str(PurePosixPath(normalized_dest, local_file.name))
-        if local_file.is_file():
-            self._put_file(
-                local_path=local_file,
-                destination=normalized_dest
-            )
-        elif local_file.is_dir():
-            self._storage.mkdir(normalized_dest)
-            for child in local_file.iterdir():
-                self.upload(child, normalized_dest)
-        else:
-            raise FileNotFoundError(
-                errno.ENOENT, os.strerror(errno.ENOENT), local_file)
+        self._upload(
+            local_file,
+            self._normalize_destination(destination),
+            journal,
+            dedup,
+            compression,
+            cipher
+        )
 
     def download(
             self, file: YaDiskFile,
             local_destination: Path,
-            ov: bool = False
-    ) -> None:
+            ov: bool = False,
+            journal: "Journal" = None,
+            cipher=None
+    ) -> Counter:
         """
-        Download file on remote to local_destination.
+        Download file on remote to local_destination. If journal of
+        interrupted download is passed partially written file is
+        downloaded again.
+
+        md5 of file is computed while it's received and compared with md5
+        of remote file, corrupted file is downloaded again. Directories
+        are zipped by YandexDisk on the fly and have no checksum. File
+        stored compressed or encrypted is decompressed and decrypted by
+        `cipher` on the way.
+
+        Returns:
+            Counter of verified, retried and unverified files.
         """
+        summary = Counter()
+        from cloudbackup.journal import Journal
         p = PurePath(file.id)
+        name, decode = p.name, None
+        if file.type == "file":
+            name = Stages.local_name(p.name)
+            decode = Stages(cipher=cipher).decoder(p.name)
         if local_destination is None:
-            dl_path = PurePath(p.name)
+            dl_path = PurePath(name)
         else:
-            dl_path = PurePath(local_destination, p.name)
+            dl_path = PurePath(local_destination, name)
         if file.type == "dir":
             dl_path = dl_path.with_suffix(".zip")
         dl_path = Path(dl_path)
-        print(YadiskDLMessage(dl_path, file.type, file.id, ov).str_value())
-        download_link = self._storage.get_download_link(file.id)
-        dl_path.write_bytes(self._storage.download(download_link))
+        if journal is None:
+            journal = Journal()
+        if not journal.planned:
+            journal.clear()
+            journal.add(
+                file.type, file.id, p.name, target=dl_path,
+                checksum=file.md5 if file.type == "file" else None
+            )
+            journal.set_planned()
+        journal.resume()
+        for item in journal.pending():
+            if item.attempts:
+                dl_path.unlink(missing_ok=True)
+            print(YadiskDLMessage(
+                dl_path, file.type, file.id, ov).str_value())
+            journal.start(item.id)
+            self._receive_file(
+                lambda: self._storage.download_stream(
+                    self._storage.get_download_link(file.id)),
+                dl_path,
+                item.checksum,
+                summary,
+                decode
+            )
+            journal.finish(item.id)
+        return summary
+
+
+def _add_folder(usage: DiskUsage, folder: str) -> None:
+    """
+    Registers folder and its ancestors which aren't registered yet.
+    """
+    while folder != "/" and not usage.has_folder(folder):
+        usage.add_folder(
+            folder,
+            posixpath.dirname(folder),
+            posixpath.basename(folder)
+        )
+        folder = posixpath.dirname(folder)